@@ -0,0 +1,210 @@
+"""
+Course detail merge benchmark: pandas merge path vs CourseRecord dict join.
+
+The pandas path is the one crawl_course used before CourseRecord: details
+collected into a DataFrame, `pd.merge`d with the CSV DataFrame, converted
+back with `to_dict(orient="records")` and cleaned row by row. Both paths
+start from the same CSV DataFrame and parsed detail dicts, and must build
+identical documents.
+
+    python -m benchmarks.course_records --courses 10000 --repeat 3
+
+Reports CPU time (best of --repeat) and peak traced memory per path.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import pandas as pd
+
+# Importing the utils package loads the crawler config; no database is used.
+os.environ.setdefault("DB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "thu_course_benchmark")
+
+from utils.course_record import CourseRecord, normalize_basic_info  # noqa: E402
+
+TERM = {"academic_year": 115, "academic_semester": 1}
+
+
+def build_inputs(courses: int, seed: int) -> tuple[pd.DataFrame, list[dict]]:
+    """Return a CSV-like course info DataFrame and parsed detail dicts."""
+    rng = random.Random(seed)
+    info_rows = []
+    details = []
+    for index in range(courses):
+        code = f"{index:04d}" if courses <= 10000 else f"{index:06d}"
+        info_rows.append(
+            {
+                **TERM,
+                "course_code": code,
+                "course_name": f"課程{index}",
+                "department_code": f"D{index % 40:02d}",
+                "department_name": f"系所{index % 40}",
+                "course_type": rng.choice(["必修", "選修"]),
+                "credits_1": rng.randint(0, 4),
+                "credits_2": rng.choice([rng.randint(0, 4), math.nan]),
+            }
+        )
+        # Some courses have no detail page (fetch failed / not modified).
+        if rng.random() < 0.1:
+            continue
+        details.append(
+            {
+                **TERM,
+                "course_code": code,
+                "is_closed": rng.random() < 0.05,
+                "teachers": [f"教師{rng.randint(0, 999)}" for _ in range(rng.randint(1, 3))],
+                "grading_items": [
+                    {
+                        "method": f"評量{item}",
+                        "percentage": str(rng.choice([10, 20, 30, 40])),
+                        "description": "說明" * rng.randint(1, 20),
+                    }
+                    for item in range(rng.randint(1, 5))
+                ],
+                "selection_records": [
+                    {"stage": stage, "enrolled": rng.randint(0, 80), "limit": 80}
+                    for stage in range(rng.randint(0, 4))
+                ],
+                "teaching_goal": "目標" * rng.randint(5, 100),
+                "course_description": "內容" * rng.randint(5, 200),
+                "basic_info": {
+                    "class_time": rng.choice(["一/3,4", "無資料", ""]),
+                    "target_class": "資工系",
+                    "target_grade": rng.choice(["1", "未定"]),
+                    "enrollment_notes": "",
+                },
+            }
+        )
+    return pd.DataFrame(info_rows), details
+
+
+def legacy_build_document(row: dict) -> dict:
+    """The per-row cleanup the courses collection used before CourseRecord."""
+    raw_grading = row.get("grading_items")
+    grading_items = []
+    if isinstance(raw_grading, list):
+        for item in raw_grading:
+            percentage = item.get("percentage", "")
+            if str(percentage).isdigit():
+                percentage = int(percentage)
+            grading_items.append(
+                {
+                    "method": item.get("method", ""),
+                    "percentage": percentage,
+                    "description": item.get("description", ""),
+                }
+            )
+
+    raw_teachers = row.get("teachers")
+    teachers = raw_teachers if isinstance(raw_teachers, list) else []
+    raw_selection = row.get("selection_records")
+    selection_records = raw_selection if isinstance(raw_selection, list) else []
+    basic_info = normalize_basic_info(row.get("basic_info"))
+
+    def clean_nan(val, default):
+        if val is None:
+            return default
+        if isinstance(val, float) and math.isnan(val):
+            return default
+        return val
+
+    document = row.copy()
+    document["academic_year"] = int(row["academic_year"])
+    document["academic_semester"] = int(row["academic_semester"])
+    document["grading_items"] = grading_items
+    document["teachers"] = teachers
+    document.pop("selection_records", None)
+    document["latest_selection"] = selection_records[-1] if selection_records else None
+    document["basic_info"] = basic_info
+    document["is_closed"] = clean_nan(row.get("is_closed"), False)
+    document["teaching_goal"] = clean_nan(row.get("teaching_goal"), "")
+    document["course_description"] = clean_nan(row.get("course_description"), "")
+    return document
+
+
+def pandas_path(info_df: pd.DataFrame, details: list[dict]) -> list[dict]:
+    detail_df = pd.DataFrame(details)
+    merged = pd.merge(
+        info_df,
+        detail_df,
+        on=["academic_year", "academic_semester", "course_code"],
+        how="left",
+    )
+    return [legacy_build_document(row) for row in merged.to_dict(orient="records")]
+
+
+def record_path(info_df: pd.DataFrame, details: list[dict]) -> list[dict]:
+    info_records = {
+        row["course_code"]: CourseRecord.from_row(row)
+        for row in info_df.to_dict(orient="records")
+    }
+    merged = {
+        detail["course_code"]: info_records[detail["course_code"]].with_detail(detail)
+        for detail in details
+    }
+    return [
+        (merged.get(code) or record).to_document()
+        for code, record in info_records.items()
+    ]
+
+
+def measure(
+    path: Callable[[pd.DataFrame, list[dict]], list[dict]],
+    info_df: pd.DataFrame,
+    details: list[dict],
+    repeat: int,
+) -> tuple[float, float, list[dict]]:
+    """Return (best CPU seconds, peak traced MiB, documents)."""
+    best = math.inf
+    documents: list[dict] = []
+    for _ in range(repeat):
+        started = time.process_time()
+        documents = path(info_df, details)
+        best = min(best, time.process_time() - started)
+
+    documents = []
+    tracemalloc.start()
+    documents = path(info_df, details)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024, documents
+
+
+def canonical(documents: list[dict]) -> list[str]:
+    def encode(document: dict) -> str:
+        # NaN != NaN, so compare the serialized documents.
+        return json.dumps(document, sort_keys=True, ensure_ascii=False, default=str)
+
+    return sorted(encode(document) for document in documents)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Course detail merge benchmark")
+    parser.add_argument("--courses", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    info_df, details = build_inputs(args.courses, args.seed)
+    results: dict[str, Any] = {}
+    for name, path in (("pandas merge", pandas_path), ("CourseRecord", record_path)):
+        results[name] = measure(path, info_df, details, args.repeat)
+
+    print(f"{'path':<14} {'CPU s':>8} {'peak MiB':>9}")
+    for name, (cpu, peak, _) in results.items():
+        print(f"{name:<14} {cpu:>8.3f} {peak:>9.1f}")
+
+    if canonical(results["pandas merge"][2]) != canonical(results["CourseRecord"][2]):
+        raise SystemExit("Documents differ between the two paths")
+    print(f"{len(results['CourseRecord'][2])} identical documents")
+
+
+if __name__ == "__main__":
+    main()
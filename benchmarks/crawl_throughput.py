@@ -0,0 +1,277 @@
+"""
+End-to-end crawler throughput benchmark against the local mock site.
+
+Starts `benchmarks.mock_site` in a subprocess, then runs crawl_schedule,
+crawl_departments and crawl_course in this process against it, the same
+way main.py does. With `--storage mongo` (default) results go to a
+dedicated MongoDB database (dropped at start) on the configured DB_URI, so
+a reachable MongoDB is required; `--storage memory` or `--storage file`
+(files in a temporary directory) run without one.
+
+    python -m benchmarks.crawl_throughput --terms 114-1,114-2,115-1 \\
+        --courses-per-term 10000 --latency-ms 60
+
+Crawler settings (CONCURRENCY_LIMIT, PARSE_WORKERS, HTML_PARSER_BACKEND, ...)
+are read from the environment as usual. MAX_REQUESTS_PER_SECOND defaults
+to 0 here so the crawl is not capped at the production politeness limit.
+
+Reported per stage: wall time, detail pages/sec, CPU time (this process
+plus parse workers) and summed storage write time; plus peak RSS.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from benchmarks.mock_site import add_site_arguments
+
+
+@dataclass
+class StageResult:
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    write_seconds: float = 0.0
+    requests: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def detail_pages(self) -> int:
+        return sum(
+            count
+            for key, count in self.requests.items()
+            if key in ("course_detail 200", "course_detail 304")
+        )
+
+
+class WriteTimer:
+    """Accumulates time spent in wrapped storage write methods."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+
+    def wrap(self, module: Any, name: str) -> None:
+        original: Callable[..., Any] = getattr(module, name)
+
+        if inspect.iscoroutinefunction(original):
+
+            async def timed_async(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.seconds += time.perf_counter() - started
+
+            setattr(module, name, timed_async)
+            return
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - started
+
+        setattr(module, name, timed)
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def fetch_site_stats(base_url: str) -> dict[str, int]:
+    with urllib.request.urlopen(f"{base_url}/__stats", timeout=10) as response:
+        return json.load(response)
+
+
+def wait_for_site(base_url: str, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Mock site exited during startup")
+        try:
+            fetch_site_stats(base_url)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Mock site did not start within {timeout:.0f}s")
+
+
+def start_site(args: argparse.Namespace, site_args: list[str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_site", "--port", str(args.port), *site_args],
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def configure_environment(args: argparse.Namespace, base_url: str, work_dir: str) -> None:
+    """Point the crawler config at the mock site; must run before importing it."""
+    os.environ["BASE_URL"] = base_url
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ["STORAGE_DIR"] = os.path.join(work_dir, "storage")
+    os.environ["DB_ENV"] = "prod"
+    os.environ["ACADEMIC_TERMS"] = args.terms
+    os.environ["ACADEMIC_YEAR"], os.environ["ACADEMIC_SEMESTER"] = (
+        args.terms.split(",")[-1].strip().split("-", maxsplit=1)
+    )
+    os.environ["REFRESH_ALL_TERMS"] = "true"
+    os.environ["CHECKPOINT_PATH"] = os.path.join(work_dir, "checkpoint.jsonl")
+    os.environ["PAGE_CACHE_DIR"] = os.path.join(work_dir, "pages")
+    os.environ["OPEN_DATA_CACHE_DIR"] = os.path.join(work_dir, "open_data")
+    os.environ.setdefault("PAGE_CACHE_BACKEND", "none")
+    os.environ.setdefault("MAX_REQUESTS_PER_SECOND", "0")
+
+
+async def run_stage(
+    name: str,
+    stage: Callable[[], Awaitable[Any]],
+    base_url: str,
+    write_timer: WriteTimer,
+) -> StageResult:
+    before_stats = fetch_site_stats(base_url)
+    before_writes = write_timer.seconds
+    before_cpu = cpu_seconds()
+    started = time.perf_counter()
+
+    await stage()
+
+    result = StageResult(name=name)
+    result.wall_seconds = time.perf_counter() - started
+    result.cpu_seconds = cpu_seconds() - before_cpu
+    result.write_seconds = write_timer.seconds - before_writes
+    after_stats = fetch_site_stats(base_url)
+    result.requests = {
+        key: count - before_stats.get(key, 0)
+        for key, count in after_stats.items()
+        if count - before_stats.get(key, 0)
+    }
+    return result
+
+
+async def run_benchmark(args: argparse.Namespace, base_url: str) -> list[StageResult]:
+    import crawl_course
+    import crawl_departments
+    import crawl_schedule
+    from utils.http_client import close_http_client
+    from utils.parse_pool import close_parse_pool
+    from utils.storage import close_storage, get_storage
+
+    async def crawl_course_stage() -> bool:
+        try:
+            return await crawl_course.main()
+        finally:
+            # Reap the parse workers so their CPU time counts for this stage.
+            close_parse_pool()
+
+    if args.storage == "mongo":
+        import db
+
+        db.get_client().drop_database(args.db_name)
+
+    write_timer = WriteTimer()
+    storage = get_storage()
+    for name in (
+        "prepare_courses",
+        "save_course_batch",
+        "touch_course_generation",
+        "delete_stale_courses",
+        "save_department_categories",
+        "save_departments",
+        "save_course_schedule",
+    ):
+        write_timer.wrap(storage, name)
+
+    stages: list[tuple[str, Callable[[], Awaitable[Any]]]] = [
+        ("crawl_schedule", crawl_schedule.main),
+        ("crawl_departments", crawl_departments.main),
+        ("crawl_course", crawl_course_stage),
+    ]
+    results = []
+    try:
+        for name, stage in stages:
+            if args.stages and name not in args.stages:
+                continue
+            results.append(await run_stage(name, stage, base_url, write_timer))
+    finally:
+        await close_http_client()
+        await close_storage()
+    return results
+
+
+def print_report(results: list[StageResult]) -> None:
+    print()
+    print(
+        f"{'stage':<18} {'wall s':>8} {'pages':>7} {'pages/s':>8} "
+        f"{'CPU s':>8} {'write s':>8}  responses"
+    )
+    for result in results:
+        pages_per_second = (
+            result.detail_pages / result.wall_seconds if result.wall_seconds else 0.0
+        )
+        responses = ", ".join(
+            f"{key}: {count}" for key, count in sorted(result.requests.items())
+        )
+        print(
+            f"{result.name:<18} {result.wall_seconds:>8.2f} {result.detail_pages:>7} "
+            f"{pages_per_second:>8.1f} {result.cpu_seconds:>8.2f} "
+            f"{result.write_seconds:>8.2f}  {responses}"
+        )
+
+    # ru_maxrss is reported in KiB on Linux.
+    own_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"\npeak RSS: {own_rss:.0f} MiB (largest parse worker: {child_rss:.0f} MiB)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Crawler throughput benchmark")
+    add_site_arguments(parser)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db-name", default="thu_course_benchmark")
+    parser.add_argument("--storage", choices=["mongo", "file", "memory"], default="mongo")
+    parser.add_argument(
+        "--stages",
+        nargs="*",
+        choices=["crawl_schedule", "crawl_departments", "crawl_course"],
+        help="stages to run (default: all)",
+    )
+    args = parser.parse_args()
+
+    site_args = [
+        "--terms", args.terms,
+        "--courses-per-term", str(args.courses_per_term),
+        "--seed", str(args.seed),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate),
+        "--max-rps", str(args.max_rps),
+    ]
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.TemporaryDirectory(prefix="thu-crawler-bench-") as work_dir:
+        configure_environment(args, base_url, work_dir)
+        server = start_site(args, site_args)
+        try:
+            wait_for_site(base_url, server)
+            results = asyncio.run(run_benchmark(args, base_url))
+            print_report(results)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
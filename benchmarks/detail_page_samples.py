@@ -0,0 +1,140 @@
+"""
+Save a sample of live course detail pages for the parser parity check.
+
+Scans the courses of a term (from its open-data CSV), parses each page with
+the reference extractors and keeps the first pages that show each trait the
+single-pass parser has to get right, plus a few ordinary pages:
+
+    closed          the course was closed (停開)
+    no_teacher      no 授課教師 links
+    empty_grading   an empty 評分方式 table
+
+    python -m benchmarks.detail_page_samples 114-1 \\
+        --out benchmarks/fixtures/detail_pages/real
+
+Pages are saved as `{year}-{semester}-{code}.html` next to a samples.json
+that records why each one was kept. Exits with status 1 when a trait was
+not found within --max-scan courses, so a sample is never silently missing
+a case. Then check parity with
+
+    python -m utils.course_detail_parser benchmarks/fixtures/detail_pages
+
+Needs network access to BASE_URL; no database is used.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+# Only the HTTP client and the open-data cache are used.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from config import config  # noqa: E402
+from utils.course_detail_parser import parse_course_detail_page_reference  # noqa: E402
+from utils.dataframe_utils import process_course_info_df  # noqa: E402
+from utils.http_client import close_http_client, get_http_client  # noqa: E402
+from utils.open_data import get_course_csv  # noqa: E402
+
+TRAITS: dict[str, Callable[[dict[str, Any]], bool]] = {
+    "closed": lambda detail: bool(detail["is_closed"]),
+    "no_teacher": lambda detail: not detail["teachers"],
+    "empty_grading": lambda detail: not detail["grading_items"],
+}
+
+
+async def fetch_page(
+    year: str, semester: str, code: str, slots: asyncio.Semaphore
+) -> tuple[str, bytes, dict[str, Any]] | None:
+    async with slots:
+        try:
+            body, encoding = await get_http_client().fetch_bytes(
+                f"{config.base_url}/view/{year}/{semester}/{code}/"
+            )
+        except Exception as e:
+            print(f"skip {code}: {e}", file=sys.stderr)
+            return None
+    return code, body, parse_course_detail_page_reference(
+        body, encoding, year, semester, code
+    )
+
+
+async def collect_samples(
+    year: str, semester: str, ordinary: int, max_scan: int
+) -> tuple[dict[str, bytes], dict[str, list[str]]]:
+    """Return ({code: page body}, {code: traits}) of the kept pages."""
+    course_csv = await get_course_csv(year, semester)
+    codes = process_course_info_df(course_csv.df)["course_code"].dropna().tolist()
+    slots = asyncio.Semaphore(config.concurrency_limit)
+
+    pages: dict[str, bytes] = {}
+    kept: dict[str, list[str]] = {}
+    missing = set(TRAITS)
+    batch_size = config.concurrency_limit * 4
+    for start in range(0, min(len(codes), max_scan), batch_size):
+        batch = codes[start : min(start + batch_size, max_scan)]
+        results = await asyncio.gather(
+            *(fetch_page(year, semester, code, slots) for code in batch)
+        )
+        for result in results:
+            if result is None:
+                continue
+            code, body, detail = result
+            traits = [name for name, test in TRAITS.items() if test(detail)]
+            if set(traits) & missing:
+                missing -= set(traits)
+            elif traits or sum(not kept_traits for kept_traits in kept.values()) >= ordinary:
+                continue
+            pages[code] = body
+            kept[code] = traits
+        ordinary_kept = sum(not traits for traits in kept.values())
+        if not missing and ordinary_kept >= ordinary:
+            break
+    return pages, kept
+
+
+async def run(args: argparse.Namespace) -> bool:
+    year, _, semester = args.term.partition("-")
+    try:
+        pages, kept = await collect_samples(year, semester, args.ordinary, args.max_scan)
+    finally:
+        await close_http_client()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for code, body in pages.items():
+        (args.out / f"{year}-{semester}-{code}.html").write_bytes(body)
+    manifest_path = args.out / "samples.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    manifest.update(
+        {f"{year}-{semester}-{code}": traits for code, traits in kept.items()}
+    )
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n")
+
+    found = {trait for traits in kept.values() for trait in traits}
+    missing = [trait for trait in TRAITS if trait not in found]
+    print(f"saved {len(pages)} pages to {args.out}")
+    if missing:
+        print(f"no page found for: {', '.join(missing)}", file=sys.stderr)
+    return not missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Save live detail pages for parity checks")
+    parser.add_argument("term", help="academic term, e.g. 114-1")
+    parser.add_argument(
+        "--out", type=Path, default=Path("benchmarks/fixtures/detail_pages/real")
+    )
+    parser.add_argument("--ordinary", type=int, default=3, help="pages without a trait")
+    parser.add_argument(
+        "--max-scan", type=int, default=2000, help="courses to look at at most"
+    )
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
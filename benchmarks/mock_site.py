@@ -0,0 +1,482 @@
+"""
+Local stand-in for course.thu.edu.tw backed by a synthetic corpus.
+
+Serves the endpoints the crawlers use:
+
+    /opendatadownload/list/{year}/{semester}/   open-data course CSV
+    /view/{year}/{semester}/{course_code}/      course detail pages
+    /view-dept/{year}/{semester}/               college navigation
+    /api/course-list                            DataTables course API
+    /index/{year}/{semester}                    course selection schedule
+
+Pages are generated deterministically from the seed on request, so the
+corpus scales to tens of thousands of courses without holding pages in
+memory. Latency, throttling (429) and server errors can be injected.
+
+    python -m benchmarks.mock_site --terms 113-1,113-2,114-1,114-2,115-1 \\
+        --courses-per-term 10000 --latency-ms 80 --error-rate 0.01
+
+Then point the crawlers at it with BASE_URL=http://127.0.0.1:8765.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from aiohttp import web
+
+MAX_COURSES_PER_TERM = 10000  # course codes are four digits
+
+COLLEGE_NAMES = [
+    "文學院",
+    "理學院",
+    "工學院",
+    "管理學院",
+    "社會科學院",
+    "農業暨永續科技學院",
+    "創意設計暨藝術學院",
+    "法律學院",
+    "國際學院",
+    "通識教育中心",
+]
+COURSE_WORDS = [
+    "程式設計", "微積分", "經濟學", "統計學", "資料結構", "演算法", "會計學",
+    "英文", "中國文學", "社會學", "心理學", "設計思考", "機器學習", "作業系統",
+    "行銷管理", "生態學", "民法", "國際關係", "建築設計", "音樂欣賞",
+]
+SURNAMES = "王李張劉陳楊黃趙吳周徐孫馬朱胡郭何林高羅"
+GIVEN_NAMES = "志明怡君淑芬家豪雅婷俊傑冠宇宗翰美玲建宏"
+WEEKDAYS = "一二三四五"
+
+
+@dataclass(frozen=True)
+class Department:
+    code: str
+    name: str
+    college_code: str
+
+
+@dataclass(frozen=True)
+class Course:
+    code: str
+    name: str
+    department: Department
+    course_type: str
+    credits: int
+
+
+class SiteCorpus:
+    """Deterministic synthetic courses, departments and pages."""
+
+    def __init__(
+        self,
+        terms: list[tuple[str, str]],
+        courses_per_term: int,
+        departments_per_college: int = 6,
+        seed: int = 0,
+    ) -> None:
+        if not 1 <= courses_per_term <= MAX_COURSES_PER_TERM:
+            raise ValueError(
+                f"courses_per_term must be in 1..{MAX_COURSES_PER_TERM}, "
+                f"got: {courses_per_term}"
+            )
+        self.terms = terms
+        self.courses_per_term = courses_per_term
+        self.seed = seed
+        self.colleges = [
+            (f"C{index + 1:02d}", name) for index, name in enumerate(COLLEGE_NAMES)
+        ]
+        self.departments = [
+            Department(
+                code=f"{(college_index + 1) * 100 + dept_index:03d}",
+                name=f"{college_name[:2]}第{dept_index + 1}學系",
+                college_code=college_code,
+            )
+            for college_index, (college_code, college_name) in enumerate(self.colleges)
+            for dept_index in range(departments_per_college)
+        ]
+
+    @property
+    def total_courses(self) -> int:
+        return len(self.terms) * self.courses_per_term
+
+    def _random(self, *key: Any) -> random.Random:
+        return random.Random("|".join(str(part) for part in (self.seed, *key)))
+
+    def has_term(self, year: str, semester: str) -> bool:
+        return (year, semester) in self.terms
+
+    def course(self, year: str, semester: str, code: str) -> Course:
+        rng = self._random(year, semester, code)
+        return Course(
+            code=code,
+            name=f"{rng.choice(COURSE_WORDS)}（{rng.choice('一二三')}）",
+            department=self.departments[int(code) % len(self.departments)],
+            course_type=rng.choice(["必修", "選修", "選修"]),
+            credits=rng.choice([0, 1, 2, 2, 3, 3, 3]),
+        )
+
+    def course_codes(self, year: str, semester: str) -> list[str]:
+        return [f"{index:04d}" for index in range(self.courses_per_term)]
+
+    def course_csv(self, year: str, semester: str) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(
+            ["學年", "學期", "選課代碼", "課程名稱", "開課系所代碼", "開課系所名稱",
+             "必選修", "學分1", "學分2"]
+        )
+        for code in self.course_codes(year, semester):
+            course = self.course(year, semester, code)
+            writer.writerow(
+                [year, semester, code, course.name, course.department.code,
+                 course.department.name, course.course_type, course.credits,
+                 course.credits]
+            )
+        return buffer.getvalue().encode("utf-8-sig")
+
+    def detail_page(self, year: str, semester: str, code: str) -> bytes:
+        course = self.course(year, semester, code)
+        rng = self._random("page", year, semester, code)
+
+        teachers = [
+            rng.choice(SURNAMES) + "".join(rng.sample(GIVEN_NAMES, 2))
+            for _ in range(rng.randint(1, 3))
+        ]
+        teacher_links = "".join(
+            f'<a href="/teacher/{hashlib.md5(name.encode()).hexdigest()[:8]}">{name}</a>'
+            for name in teachers
+        )
+        is_closed = rng.random() < 0.03
+        closed_notice = (
+            '<div class="warning closable">本課程已於 2025-09-01 停開</div>'
+            if is_closed
+            else ""
+        )
+        class_time = (
+            f"{rng.choice(WEEKDAYS)}/{rng.randint(1, 8)},{rng.randint(1, 8)} "
+            f"ST{rng.randint(100, 399)}"
+        )
+        grading_rows = "".join(
+            f"<tr><td>{item}</td><td>{weight}%</td><td>依課堂表現評分</td></tr>"
+            for item, weight in zip(
+                ["期中考", "期末考", "作業", "出席"], [30, 30, 30, 10]
+            )
+            if rng.random() < 0.9
+        )
+        selection_rows = ",\n".join(
+            f"['2025-08-{day:02d} 09:00', {rng.randint(0, 80)}, "
+            f"{rng.randint(-5, 40)}, {rng.randint(0, 120)}]"
+            for day in range(1, rng.randint(2, 20))
+        )
+        nav_links = "".join(
+            f'<li class="nav-item"><a class="nav-link" href="/view-dept/{year}/{semester}/'
+            f'{department.code}/">{department.name}</a></li>'
+            for department in self.departments
+        )
+        description = "本課程介紹" + "、".join(rng.sample(COURSE_WORDS, 5)) + "。" * 3
+
+        page = f"""<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><title>{course.name} - 東海大學課程資訊網</title>
+<script src="https://www.gstatic.com/charts/loader.js"></script></head>
+<body><nav class="navbar"><ul class="navbar-nav">{nav_links}</ul></nav>
+<div id="content" class="container">
+{closed_notice}
+<div id="course-hero"><h1>{course.name}</h1><p>{course.code} {course.department.name}</p>
+<span class="badge bg-primary">{course.course_type}</span>
+<span class="badge bg-secondary">{course.credits} 學分</span>{'<span class="badge">停開</span>' if is_closed else ''}</div>
+<div class="row">
+<div class="card"><div class="card-header"><h6 class="card-title">授課教師</h6></div>
+<div class="card-body">授課教師 {teacher_links}</div></div>
+<div class="card"><div class="card-header"><h6 class="card-title">上課時間</h6></div>
+<div class="card-body">上課時間 {class_time}</div></div>
+<div class="card"><div class="card-header"><h6 class="card-title">修課班級</h6></div>
+<div class="card-body">修課班級 {course.department.name} · {course.department.name[:2]}{rng.randint(1, 4)}A · {rng.randint(1, 4)}年級</div></div>
+<div class="card"><div class="card-header"><h6 class="card-title">課程資訊</h6></div>
+<div class="card-body">課程資訊 {rng.choice(['無資料', '限本系', '限大一', '開放外系選修'])}</div></div>
+</div>
+<div class="accordion" id="courseDetailsAccordion">
+<div class="accordion-item"><h2 class="accordion-header"><button class="accordion-button">教育目標</button></h2>
+<div class="accordion-collapse"><div class="accordion-body">培養學生{rng.choice(COURSE_WORDS)}之能力。</div></div></div>
+<div class="accordion-item"><h2 class="accordion-header"><button class="accordion-button">課程概述</button></h2>
+<div class="accordion-collapse"><div class="accordion-body">{description}</div></div></div>
+<div class="accordion-item"><h2 class="accordion-header"><button class="accordion-button">評分方式</button></h2>
+<div class="accordion-collapse"><div class="accordion-body"><table class="table">
+<tr><th>評分項目</th><th>比例</th><th>說明</th></tr>{grading_rows}</table></div></div></div>
+</div></div>
+<footer class="footer">{'東海大學 407224 臺中市西屯區臺灣大道四段1727號 ' * 20}</footer>
+<script>google.charts.setOnLoadCallback(function() {{
+var data = google.visualization.arrayToDataTable([
+['日期', '選上', '餘額', '登記'],
+{selection_rows}
+]);
+}});</script>
+</body></html>"""
+        return page.encode("utf-8")
+
+    def department_index_page(self, year: str, semester: str) -> bytes:
+        links = "".join(
+            f'<a class="list-group-item d-flex" href="/view-dept/{year}/{semester}/{code}/">'
+            f'<span class="flex-fill">{name}</span><span class="badge">{code}</span></a>'
+            for code, name in self.colleges
+        )
+        return (
+            f'<html><body><div id="dept-nav-colleges" class="list-group">{links}</div>'
+            "</body></html>"
+        ).encode("utf-8")
+
+    def course_list(
+        self, year: str, semester: str, college_code: str, start: int, length: int, draw: int
+    ) -> dict[str, Any]:
+        rows = []
+        for code in self.course_codes(year, semester):
+            course = self.course(year, semester, code)
+            if course.department.college_code != college_code:
+                continue
+            department = course.department
+            rows.append(
+                [
+                    code,
+                    course.name,
+                    course.course_type,
+                    course.credits,
+                    "",
+                    "",
+                    f'<a href="/view-dept/{year}/{semester}/{department.code}/">'
+                    f"{department.name}</a>",
+                ]
+            )
+        return {
+            "draw": draw,
+            "recordsTotal": len(rows),
+            "recordsFiltered": len(rows),
+            "data": rows[start : start + length],
+        }
+
+    def schedule_page(self, year: str, semester: str) -> bytes:
+        base_year = int(year) + 1911
+        rows = "".join(
+            f"<tr><td>{stage}</td><td>已結束</td>"
+            f"<td>{base_year}/08/{day:02d} 09:00 ~ {base_year}/08/{day + 2:02d} 17:00</td>"
+            f"<td>{base_year}/08/{day + 3:02d}</td></tr>"
+            for day, stage in zip(range(1, 25, 5), ["第一階段", "第二階段", "第三階段", "加退選"])
+        )
+        return (
+            "<html><body><table class='table'>"
+            "<tr><th>選課階段</th><th>狀態</th><th>起迄時間</th><th>結果公布日</th></tr>"
+            f"{rows}</table></body></html>"
+        ).encode("utf-8")
+
+
+class FaultInjector:
+    """Adds latency, throttling and server errors to responses."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_rps: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.random = random.Random(seed)
+        self._tokens = max_rps
+        self._last_refill = time.monotonic()
+
+    def _take_token(self) -> bool:
+        if self.max_rps <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_rps, self._tokens + (now - self._last_refill) * self.max_rps
+        )
+        self._last_refill = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def apply(self) -> web.Response | None:
+        """Return an injected error response, or None to serve normally."""
+        if not self._take_token() or self.random.random() < self.throttle_rate:
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            return web.Response(status=self.random.choice([500, 502, 503]))
+        return None
+
+
+@lru_cache(maxsize=8)
+def _cached_csv(corpus: SiteCorpus, year: str, semester: str) -> bytes:
+    return corpus.course_csv(year, semester)
+
+
+def build_app(corpus: SiteCorpus, faults: FaultInjector) -> web.Application:
+    """Create the mock site application."""
+    stats: Counter[str] = Counter()
+
+    @web.middleware
+    async def fault_middleware(request: web.Request, handler) -> web.StreamResponse:
+        route = request.match_info.route.name or "other"
+        if route == "stats":
+            return await handler(request)
+        injected = await faults.apply()
+        if injected is not None:
+            stats[f"{route} {injected.status}"] += 1
+            return injected
+        response = await handler(request)
+        stats[f"{route} {response.status}"] += 1
+        return response
+
+    def require_term(request: web.Request) -> tuple[str, str]:
+        year = request.match_info["year"]
+        semester = request.match_info["semester"]
+        if not corpus.has_term(year, semester):
+            raise web.HTTPNotFound()
+        return year, semester
+
+    async def course_csv(request: web.Request) -> web.Response:
+        year, semester = require_term(request)
+        return web.Response(
+            body=_cached_csv(corpus, year, semester),
+            content_type="text/csv",
+            charset="utf-8",
+        )
+
+    async def course_detail(request: web.Request) -> web.Response:
+        year, semester = require_term(request)
+        code = request.match_info["course_code"]
+        if not code.isdigit() or int(code) >= corpus.courses_per_term:
+            raise web.HTTPNotFound()
+        body = corpus.detail_page(year, semester, code)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(
+            body=body, content_type="text/html", charset="utf-8", headers={"ETag": etag}
+        )
+
+    async def department_index(request: web.Request) -> web.Response:
+        year, semester = require_term(request)
+        return web.Response(
+            body=corpus.department_index_page(year, semester),
+            content_type="text/html",
+            charset="utf-8",
+        )
+
+    async def course_list(request: web.Request) -> web.Response:
+        query = request.query
+        year, semester = query.get("year", ""), query.get("term", "")
+        if not corpus.has_term(year, semester):
+            raise web.HTTPNotFound()
+        payload = corpus.course_list(
+            year,
+            semester,
+            query.get("college", ""),
+            int(query.get("start", 0)),
+            int(query.get("length", 10)),
+            int(query.get("draw", 1)),
+        )
+        return web.json_response(payload)
+
+    async def schedule(request: web.Request) -> web.Response:
+        year, semester = require_term(request)
+        return web.Response(
+            body=corpus.schedule_page(year, semester),
+            content_type="text/html",
+            charset="utf-8",
+        )
+
+    async def stats_handler(request: web.Request) -> web.Response:
+        return web.json_response(dict(stats))
+
+    app = web.Application(middlewares=[fault_middleware])
+    app.router.add_get(
+        "/opendatadownload/list/{year}/{semester}/", course_csv, name="course_csv"
+    )
+    app.router.add_get(
+        "/view/{year}/{semester}/{course_code}/", course_detail, name="course_detail"
+    )
+    app.router.add_get(
+        "/view-dept/{year}/{semester}/", department_index, name="department_index"
+    )
+    app.router.add_get("/api/course-list", course_list, name="course_list")
+    app.router.add_get("/index/{year}/{semester}", schedule, name="schedule")
+    app.router.add_get("/__stats", stats_handler, name="stats")
+    return app
+
+
+def parse_terms(raw_terms: str) -> list[tuple[str, str]]:
+    terms = []
+    for raw_term in raw_terms.split(","):
+        year, semester = raw_term.strip().split("-", maxsplit=1)
+        terms.append((year, semester))
+    return terms
+
+
+def add_site_arguments(parser: argparse.ArgumentParser) -> None:
+    """Corpus and fault options, shared with the throughput benchmark."""
+    parser.add_argument("--terms", default="115-1", help="e.g. 114-1,114-2,115-1")
+    parser.add_argument("--courses-per-term", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 5xx")
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="share of random 429s"
+    )
+    parser.add_argument(
+        "--max-rps", type=float, default=0.0, help="answer 429 above this rate (0 = off)"
+    )
+
+
+def build_site(args: argparse.Namespace) -> web.Application:
+    corpus = SiteCorpus(parse_terms(args.terms), args.courses_per_term, seed=args.seed)
+    faults = FaultInjector(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        max_rps=args.max_rps,
+        seed=args.seed,
+    )
+    return build_app(corpus, faults)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock course.thu.edu.tw server")
+    add_site_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    app = build_site(args)
+    print(
+        json.dumps(
+            {"terms": args.terms, "courses_per_term": args.courses_per_term,
+             "url": f"http://{args.host}:{args.port}"}
+        ),
+        flush=True,
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
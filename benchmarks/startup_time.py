@@ -0,0 +1,211 @@
+"""
+Cold-start import budget for the crawler entry points.
+
+Imports each target in a fresh interpreter with `python -X importtime`,
+takes the median cumulative import time over `--repeat` runs and exits
+with status 1 when a target goes over its budget or loads a module it is
+supposed to defer (e.g. `main` importing pandas before a stage starts).
+No network, MongoDB or .env settings are needed: importing a module must
+not load the config or connect.
+
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --scale 2 --top 15
+    python -m benchmarks.startup_time --budget main=120 --targets main config
+
+Budgets are in milliseconds and sized for a typical laptop; `--scale`
+multiplies all of them for slower CI runners.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass(frozen=True)
+class Target:
+    module: str
+    budget_ms: float
+    # Packages that must not be imported as a side effect of importing `module`.
+    deferred: tuple[str, ...] = ()
+
+
+TARGETS = [
+    Target("config", 30, ("dotenv", "pymongo", "pandas", "aiohttp")),
+    Target("utils", 5, ("pandas", "aiohttp", "config")),
+    Target("main", 150, ("pandas", "bs4", "pymongo", "aiohttp", "crawl_course")),
+    Target("utils.migrations", 350, ("pandas", "aiohttp")),
+    Target("db", 1000),
+    Target("crawl_schedule", 1200, ("pymongo",)),
+    Target("crawl_departments", 1200, ("pymongo",)),
+    Target("crawl_course", 1300, ("pymongo",)),
+]
+
+
+@dataclass
+class ImportProfile:
+    """One `-X importtime` run: microseconds per module."""
+
+    self_us: dict[str, int] = field(default_factory=dict)
+    cumulative_us: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class TargetResult:
+    target: Target
+    budget_ms: float
+    median_ms: float = 0.0
+    loaded_deferred: list[str] = field(default_factory=list)
+    heaviest: list[tuple[str, int]] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and not self.loaded_deferred and self.median_ms <= self.budget_ms
+
+
+def parse_importtime(stderr: str) -> ImportProfile:
+    """Parse lines like `import time:   512 |   1024 |   package.module`."""
+    profile = ImportProfile()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2].strip()
+        profile.self_us[name] = int(parts[0])
+        profile.cumulative_us[name] = int(parts[1])
+    return profile
+
+
+def profile_import(module: str) -> ImportProfile:
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("PYTHONPROFILEIMPORTTIME", "PYTHONDONTWRITEBYTECODE")
+    }
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        last_line = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+        raise RuntimeError(f"import {module} failed: {last_line}")
+    return parse_importtime(completed.stderr)
+
+
+def measure(target: Target, budget_ms: float, repeat: int, top: int) -> TargetResult:
+    result = TargetResult(target, budget_ms)
+    try:
+        # Warm-up run writes the .pyc files, so every measured run reads bytecode.
+        profile_import(target.module)
+        profiles = [profile_import(target.module) for _ in range(repeat)]
+    except RuntimeError as e:
+        result.error = str(e)
+        return result
+
+    result.median_ms = (
+        statistics.median(p.cumulative_us.get(target.module, 0) for p in profiles) / 1000
+    )
+    loaded = profiles[0].self_us
+    result.loaded_deferred = [
+        package
+        for package in target.deferred
+        if any(name == package or name.startswith(f"{package}.") for name in loaded)
+    ]
+    result.heaviest = sorted(
+        ((name, us) for name, us in loaded.items() if name != target.module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return result
+
+
+def parse_budget(raw: str) -> tuple[str, float]:
+    module, separator, budget = raw.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected MODULE=MS, got: {raw}")
+    try:
+        return module, float(budget)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"budget must be a number, got: {budget}") from exc
+
+
+def print_report(results: list[TargetResult], top: int) -> None:
+    print(f"{'module':<20} {'median ms':>10} {'budget ms':>10}  status")
+    for result in results:
+        if result.error:
+            status = f"ERROR {result.error}"
+        elif result.loaded_deferred:
+            status = f"FAIL imports {', '.join(result.loaded_deferred)}"
+        elif result.median_ms > result.budget_ms:
+            status = "FAIL over budget"
+        else:
+            status = "ok"
+        print(
+            f"{result.target.module:<20} {result.median_ms:>10.1f} "
+            f"{result.budget_ms:>10.0f}  {status}"
+        )
+
+    if top:
+        for result in results:
+            if result.heaviest and not result.ok:
+                print(f"\nheaviest imports (self time) under {result.target.module}:")
+                for name, us in result.heaviest:
+                    print(f"  {us / 1000:>8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entry point import-time budget")
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=[target.module for target in TARGETS],
+        metavar="MODULE",
+        help="modules to check (default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="measured runs per module")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply every budget by this factor"
+    )
+    parser.add_argument(
+        "--budget",
+        type=parse_budget,
+        action="append",
+        default=[],
+        metavar="MODULE=MS",
+        help="override one module's budget",
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="heaviest imports to list for failing modules"
+    )
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    overrides = dict(args.budget)
+    results = [
+        measure(
+            target,
+            overrides.get(target.module, target.budget_ms * args.scale),
+            args.repeat,
+            args.top,
+        )
+        for target in TARGETS
+        if not args.targets or target.module in args.targets
+    ]
+    print_report(results, args.top)
+    if not all(result.ok for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Course term cleanup benchmark: client-side reference vs aggregation pipeline.
+
+Seeds a collection with legacy documents (string / padded / float terms)
+plus logical duplicates, then times `cleanup_course_term_documents_reference`
+and `cleanup_course_term_documents` on identical copies and checks that both
+leave the same documents behind. Requires a reachable MongoDB; the benchmark
+database is dropped at start and at exit.
+
+    python -m benchmarks.term_cleanup --uri mongodb://localhost:27017 \\
+        --documents 500000 --duplicate-rate 0.2
+"""
+
+import argparse
+import os
+import random
+import time
+from typing import Any, Callable
+
+from pymongo import MongoClient
+
+
+def seed_documents(total: int, duplicate_rate: float, legacy_rate: float, seed: int):
+    """Yield course documents; about `duplicate_rate` of them repeat an earlier course."""
+    rng = random.Random(seed)
+    terms = [(year, semester) for year in range(105, 116) for semester in (1, 2)]
+    seen: list[tuple[int, int, str]] = []
+
+    def legacy(value: int) -> Any:
+        return rng.choice([str(value), f" {value} ", float(value)])
+
+    for index in range(total):
+        if seen and rng.random() < duplicate_rate:
+            year, semester, code = rng.choice(seen)
+        else:
+            year, semester = terms[index % len(terms)]
+            code = f"{index // len(terms):06d}"
+            seen.append((year, semester, code))
+
+        is_legacy = rng.random() < legacy_rate
+        yield {
+            "academic_year": legacy(year) if is_legacy else year,
+            "academic_semester": legacy(semester) if is_legacy else semester,
+            "course_code": code,
+            "course_name": f"Course {code}",
+            "credits_1": rng.randint(0, 4),
+        }
+
+
+def seed_collection(collection, args: argparse.Namespace) -> None:
+    batch: list[dict] = []
+    for document in seed_documents(
+        args.documents, args.duplicate_rate, args.legacy_rate, args.seed
+    ):
+        batch.append(document)
+        if len(batch) >= 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def snapshot(collection) -> list[tuple]:
+    return sorted(
+        (str(doc["_id"]), repr(doc["academic_year"]), repr(doc["academic_semester"]))
+        for doc in collection.find(
+            {}, {"_id": 1, "academic_year": 1, "academic_semester": 1}
+        )
+    )
+
+
+def timed(name: str, cleanup: Callable[[Any], Any], collection) -> float:
+    started = time.perf_counter()
+    cleanup(collection)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {elapsed:>8.2f}s  {collection.estimated_document_count()} documents left")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Course term cleanup benchmark")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="thu_course_cleanup_benchmark")
+    parser.add_argument("--documents", type=int, default=500000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    parser.add_argument("--legacy-rate", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # utils.migrations loads the crawler config, which requires these.
+    os.environ.setdefault("DB_URI", args.uri)
+    os.environ.setdefault("DB_NAME", args.db_name)
+    from utils.migrations import (
+        cleanup_course_term_documents,
+        cleanup_course_term_documents_reference,
+    )
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.db_name)
+    database = client[args.db_name]
+    try:
+        print(f"Seeding {args.documents} documents...")
+        seed_collection(database.reference, args)
+        database.reference.aggregate([{"$out": "pipeline"}])
+
+        reference_seconds = timed(
+            "reference", cleanup_course_term_documents_reference, database.reference
+        )
+        pipeline_seconds = timed(
+            "pipeline",
+            lambda collection: cleanup_course_term_documents(
+                collection, batch_size=args.batch_size
+            ),
+            database.pipeline,
+        )
+        print(f"speedup      {reference_seconds / pipeline_seconds:>8.1f}x")
+
+        if snapshot(database.reference) != snapshot(database.pipeline):
+            raise SystemExit("Final states differ between reference and pipeline")
+        print("Final states match")
+    finally:
+        client.drop_database(args.db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
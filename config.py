@@ -3,16 +3,27 @@ Centralized configuration module for the THU Course Crawler.
 
 This module loads and validates all environment variables in one place,
 providing type-safe access with proper defaults.
+
+Loading is deferred: `from config import config` is cheap, and the .env
+file is read and validated the first time a setting is accessed (or
+`get_config()` is called).
 """
 
+import importlib.util
 import os
+import threading
 from dataclasses import dataclass
-from typing import Literal
+from typing import Any, Literal, Optional
+
+# Modules the optional HTML_PARSER_BACKEND choices import when parsing.
+PARSER_BACKEND_MODULES = {"lxml": "lxml", "selectolax": "selectolax.lexbor"}
 
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:  # a missing parent package of a dotted name
+        return False
 
 
 @dataclass
@@ -32,14 +43,71 @@ class Config:
 
     # Development Configuration
     dev_data_limit: int = 10
-    concurrency_limit: int = 3
+    concurrency_limit: int = 16
+    concurrency_initial: int = 3
+    max_requests_per_second: float = 20.0
+    latency_target_ms: int = 1500
+    detail_max_retries: int = 3
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_pause: float = 30.0
+    parse_workers: int = 0
+    write_batch_size: int = 200
+    write_flush_interval: float = 10.0
+    pipeline_queue_size: int = 100
+    html_parser_backend: Literal["html.parser", "lxml", "selectolax"] = "html.parser"
+    term_concurrency: int = 2
+
+    # HTTP Client Configuration
+    base_url: str = "https://course.thu.edu.tw"
+    http_pool_size: int = 32
+    http_keepalive_timeout: float = 30.0
+    http_dns_cache_ttl: int = 300
+    http_timeout: float = 30.0
+    http_connect_timeout: float = 10.0
+
+    # Crawler Cache Configuration
+    page_cache_backend: Literal["none", "disk", "mongo"] = "mongo"
+    page_cache_dir: str = ".cache/course_pages"
+    checkpoint_path: str = ".cache/crawl_checkpoint.jsonl"
+    open_data_cache_dir: str = ".cache/open_data"
+    open_data_cache_ttl: float = 600.0
+
+    # MongoDB Write Configuration
+    bulk_write_chunk_size: int = 500
+    bulk_write_workers: int = 4
+    bulk_write_max_retries: int = 3
+    course_changes_ttl_days: int = 30
+
+    # Storage Configuration
+    storage_backend: Literal["mongo", "file", "memory"] = "mongo"
+    storage_dir: str = "data"
+    storage_file_format: Literal["parquet", "jsonl"] = "jsonl"
+
+    # Daemon Configuration (main.py --daemon)
+    daemon_active_interval: float = 300.0
+    daemon_idle_interval: float = 21600.0
+    daemon_warmup_lead: float = 20.0
 
     def __post_init__(self):
         """Validate configuration after initialization."""
-        if not self.db_name:
-            raise ValueError("DB_NAME must be set in .env file")
-        if not self.db_uri:
-            raise ValueError("DB_URI must be set in .env file")
+        if self.storage_backend not in ("mongo", "file", "memory"):
+            raise ValueError(
+                "STORAGE_BACKEND must be 'mongo', 'file' or 'memory', "
+                f"got: {self.storage_backend}"
+            )
+        if self.storage_file_format not in ("parquet", "jsonl"):
+            raise ValueError(
+                "STORAGE_FILE_FORMAT must be 'parquet' or 'jsonl', "
+                f"got: {self.storage_file_format}"
+            )
+        # The database is only required by the mongo storage backend.
+        if self.storage_backend == "mongo":
+            if not self.db_name:
+                raise ValueError("DB_NAME must be set in .env file")
+            if not self.db_uri:
+                raise ValueError("DB_URI must be set in .env file")
 
         # Validate db_env
         if self.db_env not in ("dev", "prod"):
@@ -48,6 +116,107 @@ class Config:
             raise ValueError(
                 f"CONCURRENCY_LIMIT must be a positive integer, got: {self.concurrency_limit}"
             )
+        if self.concurrency_initial < 1:
+            raise ValueError(
+                "CONCURRENCY_INITIAL must be a positive integer, "
+                f"got: {self.concurrency_initial}"
+            )
+        if self.max_requests_per_second < 0:
+            raise ValueError(
+                "MAX_REQUESTS_PER_SECOND must be zero (unlimited) or positive, "
+                f"got: {self.max_requests_per_second}"
+            )
+        if self.latency_target_ms < 1:
+            raise ValueError(
+                f"LATENCY_TARGET_MS must be a positive integer, got: {self.latency_target_ms}"
+            )
+        if self.detail_max_retries < 0:
+            raise ValueError(
+                f"DETAIL_MAX_RETRIES must not be negative, got: {self.detail_max_retries}"
+            )
+        if not 0 < self.circuit_breaker_error_rate <= 1:
+            raise ValueError(
+                "CIRCUIT_BREAKER_ERROR_RATE must be in (0, 1], "
+                f"got: {self.circuit_breaker_error_rate}"
+            )
+        if self.parse_workers < 0:
+            raise ValueError(
+                f"PARSE_WORKERS must not be negative, got: {self.parse_workers}"
+            )
+        if self.write_batch_size < 1:
+            raise ValueError(
+                f"WRITE_BATCH_SIZE must be a positive integer, got: {self.write_batch_size}"
+            )
+        if self.write_flush_interval <= 0:
+            raise ValueError(
+                f"WRITE_FLUSH_INTERVAL must be positive, got: {self.write_flush_interval}"
+            )
+        if self.pipeline_queue_size < 1:
+            raise ValueError(
+                "PIPELINE_QUEUE_SIZE must be a positive integer, "
+                f"got: {self.pipeline_queue_size}"
+            )
+        if self.html_parser_backend not in ("html.parser", "lxml", "selectolax"):
+            raise ValueError(
+                "HTML_PARSER_BACKEND must be 'html.parser', 'lxml' or 'selectolax', "
+                f"got: {self.html_parser_backend}"
+            )
+        backend_module = PARSER_BACKEND_MODULES.get(self.html_parser_backend)
+        if backend_module and not _module_available(backend_module):
+            raise ValueError(
+                f"HTML_PARSER_BACKEND={self.html_parser_backend} needs the "
+                f"{self.html_parser_backend} package (uv add {self.html_parser_backend})"
+            )
+        self.base_url = self.base_url.rstrip("/")
+        if not self.base_url.startswith(("http://", "https://")):
+            raise ValueError(f"BASE_URL must be an http(s) URL, got: {self.base_url}")
+        if self.term_concurrency < 1:
+            raise ValueError(
+                f"TERM_CONCURRENCY must be a positive integer, got: {self.term_concurrency}"
+            )
+        if self.http_pool_size < self.concurrency_limit:
+            raise ValueError(
+                "HTTP_POOL_SIZE must be at least CONCURRENCY_LIMIT "
+                f"({self.concurrency_limit}), got: {self.http_pool_size}"
+            )
+        if self.http_timeout <= 0 or self.http_connect_timeout <= 0:
+            raise ValueError(
+                "HTTP_TIMEOUT and HTTP_CONNECT_TIMEOUT must be positive, got: "
+                f"{self.http_timeout}, {self.http_connect_timeout}"
+            )
+        if self.page_cache_backend not in ("none", "disk", "mongo"):
+            raise ValueError(
+                "PAGE_CACHE_BACKEND must be 'none', 'disk' or 'mongo', "
+                f"got: {self.page_cache_backend}"
+            )
+        if self.open_data_cache_ttl < 0:
+            raise ValueError(
+                f"OPEN_DATA_CACHE_TTL must not be negative, got: {self.open_data_cache_ttl}"
+            )
+        if self.bulk_write_chunk_size < 1 or self.bulk_write_workers < 1:
+            raise ValueError(
+                "BULK_WRITE_CHUNK_SIZE and BULK_WRITE_WORKERS must be positive integers, "
+                f"got: {self.bulk_write_chunk_size}, {self.bulk_write_workers}"
+            )
+        if self.bulk_write_max_retries < 0:
+            raise ValueError(
+                "BULK_WRITE_MAX_RETRIES must not be negative, "
+                f"got: {self.bulk_write_max_retries}"
+            )
+        if self.course_changes_ttl_days < 1:
+            raise ValueError(
+                "COURSE_CHANGES_TTL_DAYS must be a positive integer, "
+                f"got: {self.course_changes_ttl_days}"
+            )
+        if self.daemon_active_interval <= 0 or self.daemon_idle_interval <= 0:
+            raise ValueError(
+                "DAEMON_ACTIVE_INTERVAL and DAEMON_IDLE_INTERVAL must be positive, "
+                f"got: {self.daemon_active_interval}, {self.daemon_idle_interval}"
+            )
+        if self.daemon_warmup_lead < 0:
+            raise ValueError(
+                f"DAEMON_WARMUP_LEAD must not be negative, got: {self.daemon_warmup_lead}"
+            )
         if not self.academic_terms:
             self.academic_terms = ((self.academic_year, self.academic_semester),)
 
@@ -84,6 +253,11 @@ def load_config() -> Config:
     Raises:
         ValueError: If required environment variables are missing
     """
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
     academic_year = os.getenv("ACADEMIC_YEAR", "115")
     academic_semester = os.getenv("ACADEMIC_SEMESTER", "1")
     academic_terms = parse_academic_terms(
@@ -99,7 +273,44 @@ def load_config() -> Config:
         academic_terms=academic_terms,
         refresh_all_terms=parse_bool(os.getenv("REFRESH_ALL_TERMS", "false")),
         dev_data_limit=int(os.getenv("DEV_DATA_LIMIT", "10")),
-        concurrency_limit=int(os.getenv("CONCURRENCY_LIMIT", "3")),
+        concurrency_limit=int(os.getenv("CONCURRENCY_LIMIT", "16")),
+        concurrency_initial=int(os.getenv("CONCURRENCY_INITIAL", "3")),
+        max_requests_per_second=float(os.getenv("MAX_REQUESTS_PER_SECOND", "20")),
+        latency_target_ms=int(os.getenv("LATENCY_TARGET_MS", "1500")),
+        detail_max_retries=int(os.getenv("DETAIL_MAX_RETRIES", "3")),
+        retry_base_delay=float(os.getenv("RETRY_BASE_DELAY", "1")),
+        retry_max_delay=float(os.getenv("RETRY_MAX_DELAY", "30")),
+        circuit_breaker_error_rate=float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5")),
+        circuit_breaker_pause=float(os.getenv("CIRCUIT_BREAKER_PAUSE", "30")),
+        parse_workers=int(
+            os.getenv("PARSE_WORKERS", "") or min(4, os.cpu_count() or 1)
+        ),
+        write_batch_size=int(os.getenv("WRITE_BATCH_SIZE", "200")),
+        write_flush_interval=float(os.getenv("WRITE_FLUSH_INTERVAL", "10")),
+        pipeline_queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", "100")),
+        html_parser_backend=os.getenv("HTML_PARSER_BACKEND", "html.parser"),  # type: ignore
+        term_concurrency=int(os.getenv("TERM_CONCURRENCY", "2")),
+        base_url=os.getenv("BASE_URL", "https://course.thu.edu.tw"),
+        http_pool_size=int(os.getenv("HTTP_POOL_SIZE", "32")),
+        http_keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")),
+        http_dns_cache_ttl=int(os.getenv("HTTP_DNS_CACHE_TTL", "300")),
+        http_timeout=float(os.getenv("HTTP_TIMEOUT", "30")),
+        http_connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+        page_cache_backend=os.getenv("PAGE_CACHE_BACKEND", "mongo"),  # type: ignore
+        page_cache_dir=os.getenv("PAGE_CACHE_DIR", ".cache/course_pages"),
+        checkpoint_path=os.getenv("CHECKPOINT_PATH", ".cache/crawl_checkpoint.jsonl"),
+        open_data_cache_dir=os.getenv("OPEN_DATA_CACHE_DIR", ".cache/open_data"),
+        open_data_cache_ttl=float(os.getenv("OPEN_DATA_CACHE_TTL", "600")),
+        bulk_write_chunk_size=int(os.getenv("BULK_WRITE_CHUNK_SIZE", "500")),
+        bulk_write_workers=int(os.getenv("BULK_WRITE_WORKERS", "4")),
+        bulk_write_max_retries=int(os.getenv("BULK_WRITE_MAX_RETRIES", "3")),
+        course_changes_ttl_days=int(os.getenv("COURSE_CHANGES_TTL_DAYS", "30")),
+        storage_backend=os.getenv("STORAGE_BACKEND", "mongo"),  # type: ignore
+        storage_dir=os.getenv("STORAGE_DIR", "data"),
+        storage_file_format=os.getenv("STORAGE_FILE_FORMAT", "jsonl"),  # type: ignore
+        daemon_active_interval=float(os.getenv("DAEMON_ACTIVE_INTERVAL", "300")),
+        daemon_idle_interval=float(os.getenv("DAEMON_IDLE_INTERVAL", "21600")),
+        daemon_warmup_lead=float(os.getenv("DAEMON_WARMUP_LEAD", "20")),
     )
 
 
@@ -136,5 +347,32 @@ def parse_academic_terms(
     return tuple(terms) or ((fallback_year, fallback_semester),)
 
 
-# Global configuration instance
-config = load_config()
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    """Return the process-wide Config, loading it on first use."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+
+class _LazyConfig:
+    """Forwards attribute access to `get_config()`."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_config(), name, value)
+
+    def __repr__(self) -> str:
+        return repr(get_config())
+
+
+# Global configuration instance, loaded on first attribute access
+config: Config = _LazyConfig()  # type: ignore[assignment]
@@ -1,18 +1,36 @@
+import argparse
 import asyncio
-import io
-import re
-from typing import Any, Dict, List, Optional
+import signal
+import sys
+import time
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
 
 import aiohttp
 import pandas as pd
-from bs4 import BeautifulSoup
-from bs4.element import Tag
 
 from config import config
-from db import course_term_exists, save_merged_courses_to_db
+from utils.checkpoint import CheckpointJournal
+from utils.concurrency import AdaptiveConcurrencyController, Outcome, classify_status
+from utils.course_detail_parser import parse_course_detail_page
+from utils.course_record import CourseRecord, CourseWriteCounts, new_crawl_generation
 from utils.dataframe_utils import process_course_info_df
+from utils.http_client import close_http_client, get_http_client
+from utils.parse_pool import close_parse_pool, discard_parse_pool, get_parse_pool
+from utils.page_cache import (
+    DiskPageCache,
+    MongoPageCache,
+    PageCache,
+    PageValidators,
+    hash_page_body,
+)
+from utils.retry import CircuitBreaker, backoff_delay
+from utils.storage import close_storage, get_storage
 
 from utils.logger import setup_logger, get_logger
+from utils.open_data import CourseCsv, get_course_csv, mark_course_csv_saved
 
 # Ensure logger is set up when running as script or importing
 # Since this script is often run as a subprocess, we should set up logging here too if main check passes,
@@ -21,406 +39,812 @@ from utils.logger import setup_logger, get_logger
 setup_logger()
 logger = get_logger(__name__)
 
-BASE_URL = "https://course.thu.edu.tw"
-NO_DATA_VALUES = {"", "無資料", "無", "未定", "None", "none", "N/A", "n/a"}
+# Bump when the detail page extraction changes so cached pages are re-parsed.
+PAGE_PARSER_VERSION = 1
 
+# Returned by fetch_single_course_detail when the page has not changed.
+PAGE_UNCHANGED: Dict[str, Any] = {"unchanged": True}
 
-def clean_text(element: Optional[Tag]) -> str:
-    """Return compact visible text from a BeautifulSoup element."""
-    if not element:
-        return ""
-    return re.sub(r"\s+", " ", element.get_text(" ", strip=True)).strip()
 
+def build_page_cache() -> PageCache:
+    """Create the detail page revalidation cache selected by PAGE_CACHE_BACKEND."""
+    if config.page_cache_backend == "disk":
+        return DiskPageCache(config.page_cache_dir, PAGE_PARSER_VERSION)
+    if config.page_cache_backend == "mongo":
+        if config.storage_backend != "mongo":
+            logger.warning(
+                f"[crawl_course] PAGE_CACHE_BACKEND=mongo needs STORAGE_BACKEND=mongo; "
+                f"using the disk cache in {config.page_cache_dir}"
+            )
+            return DiskPageCache(config.page_cache_dir, PAGE_PARSER_VERSION)
+        from db import get_page_cache_collection
 
-def text_after_label(text: str, label: str) -> str:
-    return re.sub(r"\s+", " ", text.replace(label, "", 1)).strip()
-
-
-def extract_card_value(soup: BeautifulSoup, label: str) -> str:
-    for card in soup.select(".card"):
-        heading = card.select_one("h6.card-title")
-        if heading and label in heading.get_text(strip=True):
-            return text_after_label(clean_text(card.select_one(".card-body")), label)
-    return ""
-
-
-def normalize_source_value(value: str) -> str:
-    value = re.sub(r"\s+", " ", value).strip()
-    return "" if value in NO_DATA_VALUES else value
-
+        return MongoPageCache(get_page_cache_collection(), PAGE_PARSER_VERSION)
+    return PageCache(PAGE_PARSER_VERSION)
 
-def split_target_class_and_grade(target_class: str) -> tuple[str, str]:
-    target_class = normalize_source_value(target_class)
-    if not target_class:
-        return "", ""
 
-    parts = [
-        normalize_source_value(part)
-        for part in re.split(r"\s*[·‧•]\s*", target_class)
-        if normalize_source_value(part)
-    ]
-    if len(parts) < 2:
-        return target_class, ""
-
-    grade_pattern = re.compile(r"(?:\d+|[一二三四五六七八九十]+)年級(?:以上|以下)?")
-    grade_parts = [part for part in parts if grade_pattern.search(part)]
-    if not grade_parts:
-        return target_class, ""
-
-    target_grade = grade_parts[-1]
-    class_parts = [part for part in parts if part != target_grade]
-    return " · ".join(class_parts), target_grade
-
-
-def extract_teachers(soup: BeautifulSoup) -> list[str]:
-    for card in soup.select(".card"):
-        heading = card.select_one("h6.card-title")
-        if not heading or "授課教師" not in heading.get_text(strip=True):
-            continue
-        teachers = [
-            clean_text(anchor)
-            for anchor in card.find_all("a")
-            if clean_text(anchor)
-        ]
-        if teachers:
-            return teachers
-        body_text = extract_card_value(soup, "授課教師")
-        return [name.strip() for name in re.split(r"[/、,，]", body_text) if name.strip()]
-    return []
-
-
-def extract_hero_basic_info(soup: BeautifulSoup) -> dict[str, str]:
-    basic_info: dict[str, str] = {}
-
-    hero = soup.select_one("#course-hero")
-    if hero:
-        for badge in hero.select(".badge"):
-            badge_text = clean_text(badge)
-            if "必修" in badge_text or "選修" in badge_text:
-                basic_info["course_type"] = badge_text
-            elif "學分" in badge_text:
-                basic_info["credits"] = badge_text.replace("學分", "").strip()
-
-    class_time = normalize_source_value(extract_card_value(soup, "上課時間"))
-    target_class, target_grade = split_target_class_and_grade(
-        extract_card_value(soup, "修課班級")
+async def load_term_course_info(
+    academic_year: str, academic_semester: str
+) -> tuple[pd.DataFrame, Optional[CourseCsv]]:
+    """
+    Fetch and normalize the open-data course CSV of one term. Also returns
+    the CourseCsv it came from (None when it could not be loaded), whose
+    `changed` flag tells whether the CSV differs from the last saved crawl.
+    """
+    term_label = f"{academic_year}-{academic_semester}"
+    logger.info(f"[crawl_course] fetching course basic info for {term_label}...")
+    course_csv = await fetch_course_info(academic_year, academic_semester)
+    if course_csv is None or course_csv.table.empty:
+        return pd.DataFrame(), course_csv
+
+    course_info_df = course_csv.df
+
+    course_info_df = process_course_info_df(course_info_df)
+    # The open-data CSV can contain malformed rows with blank term cells.
+    # The requested endpoint is the source of truth for the whole response.
+    course_info_df["academic_year"] = int(academic_year)
+    course_info_df["academic_semester"] = int(academic_semester)
+    course_info_df = course_info_df.dropna(subset=["course_code"])
+    logger.info(
+        f"[crawl_course] Done! Fetched {len(course_info_df)} courses for {term_label}"
     )
-    enrollment_notes = normalize_source_value(extract_card_value(soup, "課程資訊"))
-
-    if class_time:
-        basic_info["class_time"] = class_time
-    if target_class:
-        basic_info["target_class"] = target_class
-    if target_grade:
-        basic_info["target_grade"] = target_grade
-    if enrollment_notes:
-        basic_info["enrollment_notes"] = enrollment_notes
-
-    return basic_info
-
-
-def extract_accordion_section(soup: BeautifulSoup, label: str) -> str:
-    accordion = soup.select_one("#courseDetailsAccordion")
-    if not accordion:
-        return ""
-
-    for item in accordion.select(".accordion-item"):
-        button = item.select_one(".accordion-button")
-        if not button or label not in clean_text(button):
-            continue
-        body = item.select_one(".accordion-body")
-        return clean_text(body)
-    return ""
-
-
-def extract_grading_items(soup: BeautifulSoup) -> list[dict[str, str]]:
-    grading_items: list[dict[str, str]] = []
-    accordion = soup.select_one("#courseDetailsAccordion")
-    if not accordion:
-        return grading_items
-
-    grading_item = None
-    for item in accordion.select(".accordion-item"):
-        button = item.select_one(".accordion-button")
-        if button and "評分方式" in clean_text(button):
-            grading_item = item
-            break
-
-    if not grading_item:
-        return grading_items
-
-    for row in grading_item.select("tr"):
-        cols = [clean_text(col) for col in row.find_all(["td", "th"])]
-        cols = [col for col in cols if col]
-        if len(cols) >= 2 and not any("評分" in col for col in cols[:1]):
-            grading_items.append(
-                {
-                    "method": cols[0],
-                    "percentage": cols[1],
-                    "description": cols[2] if len(cols) > 2 else "",
-                }
-            )
-
-    return grading_items
-
-
-def extract_selection_records(soup: BeautifulSoup) -> list[dict[str, Any]]:
-    selection_records: list[dict[str, Any]] = []
-    scripts = soup.find_all("script")
-    for script in scripts:
-        if not isinstance(script, Tag):
-            continue
-        script_text = script.get_text()
-        if "google.visualization.arrayToDataTable" not in script_text:
-            continue
-        pattern = r"google\.visualization\.arrayToDataTable\(\s*\[\s*([\s\S]*?)\s*\]\s*\)"
-        match = re.search(pattern, script_text, re.DOTALL)
-        if not match:
-            continue
-        row_pattern = r"\[\s*'([^']+)'\s*,\s*(-?\d+)\s*,\s*(-?\d+)\s*,\s*(-?\d+)\s*\]"
-        for date, enrolled, remaining, registered in re.findall(row_pattern, match.group(1)):
-            selection_records.append(
-                {
-                    "date": date,
-                    "enrolled": int(enrolled),
-                    "remaining": int(remaining),
-                    "registered": int(registered),
-                }
-            )
-        break
-    return selection_records
+    return course_info_df, course_csv
 
 
-async def crawl_term(academic_year: str, academic_semester: str) -> None:
-    """Fetch course info and details for one academic term."""
+async def crawl_term(
+    academic_year: str,
+    academic_semester: str,
+    journal: Optional[CheckpointJournal] = None,
+    stop_event: Optional[asyncio.Event] = None,
+    course_info: Optional[Awaitable[tuple[pd.DataFrame, Optional[CourseCsv]]]] = None,
+    budget: Optional["CrawlBudget"] = None,
+    priority: int = 0,
+    generation: Optional[int] = None,
+) -> bool:
+    """
+    Fetch course info and details for one academic term.
+
+    Courses recorded in `journal` are skipped, and newly written ones are
+    appended to it. Setting `stop_event` stops fetching; details already
+    fetched are still flushed. `course_info` may be a prefetch of
+    `load_term_course_info`; `budget` and `priority` are passed to
+    `fetch_course_details_concurrently`.
+
+    Every course of the term is stamped with the crawl `generation` (a new
+    one by default). Once the whole term is stamped, the term's pointer is
+    switched to it and courses of older generations are deleted as stale.
+    Returns whether the term finished.
+    """
     term_label = f"{academic_year}-{academic_semester}"
     logger.info(f"[crawl_course] Start crawling term {term_label}")
+    if generation is None:
+        generation = new_crawl_generation()
 
     try:
         # --- 1. 爬取課程基本資訊 ---
-        logger.info(f"[crawl_course] fetching course basic info for {term_label}...")
-        course_info_df = await fetch_course_info(academic_year, academic_semester)
+        if course_info is None:
+            course_info = load_term_course_info(academic_year, academic_semester)
+        course_info_df, course_csv = await course_info
 
         if course_info_df.empty:
             logger.error(
                 f"[crawl_course] Failed to fetch course info for {term_label}, skipping."
             )
-            return
-
-        course_info_df = process_course_info_df(course_info_df)
-        # The open-data CSV can contain malformed rows with blank term cells.
-        # The requested endpoint is the source of truth for the whole response.
-        course_info_df["academic_year"] = int(academic_year)
-        course_info_df["academic_semester"] = int(academic_semester)
-        course_info_df = course_info_df.dropna(subset=["course_code"])
-        # save_course_info_to_db(course_info_df)
-        logger.info(f"[crawl_course] Done! Fetched {len(course_info_df)} courses")
+            return False
 
-        # --- 2. 爬取課程詳細資訊 ---
+        # --- 2. 爬取課程詳細資訊，邊爬邊寫入 ---
         logger.info(f"[crawl_course] fetching course details for {term_label}...")
-        course_codes = course_info_df["course_code"].tolist()
+        info_rows = {
+            row["course_code"]: CourseRecord.from_row(row)
+            for row in course_info_df.to_dict(orient="records")
+        }
+        course_codes = list(info_rows)
 
         if config.db_env == "dev":
             course_codes = course_codes[:config.dev_data_limit]
             logger.warning(f"[DEV MODE] Fetching {config.dev_data_limit} course details")
 
-        # 呼叫並發爬蟲函式
-        course_detail_df = await fetch_course_details_concurrently(
-            academic_year, academic_semester, course_codes
-        )
+        done_codes = journal.completed_codes(term_label) if journal else set()
+        if done_codes:
+            course_codes = [code for code in course_codes if code not in done_codes]
+            logger.info(
+                f"[crawl_course] Resuming {term_label}: {len(done_codes)} courses "
+                f"already completed, {len(course_codes)} remaining"
+            )
 
-        # save_course_detail_to_db(course_detail_df)
-        logger.info(f"[crawl_course] Done! Fetched {len(course_detail_df)} courses")
+        storage = get_storage()
+        existing_hashes = await storage.get_term_content_hashes(
+            academic_year, academic_semester
+        )
+        existing_codes = set(existing_hashes)
+        page_cache = build_page_cache()
+        await asyncio.to_thread(
+            page_cache.load, academic_year, academic_semester, existing_codes
+        )
+        await storage.prepare_courses()
 
-        # --- 3. 資料整併 (Merge) ---
-        logger.info("[crawl_course] merging dataframes...")
-        merged_df = pd.merge(
-            course_info_df,
-            course_detail_df,
-            on=["academic_year", "academic_semester", "course_code"],
-            how="left",
+        writer = CourseBatchWriter(
+            info_rows, page_cache, existing_hashes, journal, term_label, generation
+        )
+        detail_queue: asyncio.Queue[Optional[Dict[str, Any]]] = asyncio.Queue(
+            maxsize=config.pipeline_queue_size
+        )
+        writer_task = asyncio.create_task(writer.run(detail_queue))
+        try:
+            fetch_result = await fetch_course_details_concurrently(
+                academic_year,
+                academic_semester,
+                course_codes,
+                page_cache,
+                detail_queue.put,
+                stop_event,
+                budget,
+                priority,
+            )
+        finally:
+            await detail_queue.put(None)
+            await writer_task
+
+        if stop_event is not None and stop_event.is_set():
+            logger.warning(
+                f"[crawl_course] Stopped {term_label} after saving "
+                f"{len(writer.written_codes)} courses; rerun with --resume to continue"
+            )
+            return False
+
+        # --- 3. 寫入沒有詳細資訊的課程並同步刪除 ---
+        # Keep the stored details of unchanged pages and of courses whose page
+        # could not be fetched instead of overwriting them with empty values.
+        skip_codes = (
+            fetch_result.unchanged_codes | (set(fetch_result.failures) & existing_codes)
+        ) & set(info_rows)
+        if course_csv is None or course_csv.changed:
+            # Their CSV columns may have changed even though the page did not.
+            await writer.write_stored_details(
+                academic_year, academic_semester, skip_codes - done_codes
+            )
+        await writer.write_info_only(
+            code
+            for code in info_rows
+            if code not in writer.written_codes
+            and code not in skip_codes
+            and code not in done_codes
         )
 
-        logger.info(f"[crawl_course] Done! Merged {len(merged_df)} courses")
-        save_merged_courses_to_db(merged_df)
+        # Courses kept as stored, and those written before a resume, still
+        # belong to this generation.
+        kept_codes = (skip_codes | done_codes) & set(info_rows) - writer.written_codes
+        await storage.touch_course_generation(
+            academic_year, academic_semester, kept_codes, generation
+        )
+        try:
+            # Validators refreshed on a 200 whose body matched the stored hash.
+            await asyncio.to_thread(page_cache.flush, kept_codes)
+        except Exception as e:
+            logger.warning(f"[crawl_course] Could not store page validators: {e}")
 
-        logger.info(f"[crawl_course] Done! Saved merged courses for {term_label}")
+        if writer.failed_batches:
+            logger.error(
+                f"[crawl_course] {writer.failed_batches} batches failed for {term_label}; "
+                "keeping the previous generation and skipping stale course cleanup"
+            )
+        else:
+            await storage.commit_term_generation(
+                academic_year, academic_semester, generation
+            )
+            await storage.delete_stale_courses(academic_year, academic_semester, generation)
+            if course_csv is not None:
+                await mark_course_csv_saved(course_csv)
+
+        if journal is not None:
+            journal.record_term_done(term_label)
+
+        counts = writer.counts
+        logger.info(
+            f"[crawl_course] Done! {term_label}: {counts.new} new, "
+            f"{counts.changed} changed, {counts.unchanged} unchanged documents "
+            f"({len(skip_codes)} skipped: page not modified or fetch failed)"
+        )
+        return True
 
     except Exception as e:
         logger.error(f"Course crawling failed for {term_label}: {e}")
         import traceback
 
         traceback.print_exc()
+        return False
+
+
+class CourseBatchWriter:
+    """
+    Joins fetched course details with their CSV records and flushes them to
+    MongoDB in batches bounded by WRITE_BATCH_SIZE rows or
+    WRITE_FLUSH_INTERVAL seconds, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        info_rows: Dict[str, CourseRecord],
+        page_cache: PageCache,
+        existing_hashes: Optional[Dict[str, str]] = None,
+        journal: Optional[CheckpointJournal] = None,
+        term_label: str = "",
+        generation: Optional[int] = None,
+    ) -> None:
+        self.info_rows = info_rows
+        self.page_cache = page_cache
+        self.existing_hashes = existing_hashes if existing_hashes is not None else {}
+        self.journal = journal
+        self.term_label = term_label
+        self.generation = generation
+        self.batch_size = config.write_batch_size
+        self.flush_interval = config.write_flush_interval
+        self.written_codes: set[str] = set()
+        self.counts = CourseWriteCounts()
+        self.failed_batches = 0
+        self._batch: List[CourseRecord] = []
+
+    async def run(self, queue: "asyncio.Queue[Optional[Dict[str, Any]]]") -> None:
+        """Consume details from `queue` until a None sentinel arrives."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while True:
+            try:
+                detail = await asyncio.wait_for(
+                    queue.get(), timeout=max(0.0, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                await self.flush()
+                deadline = loop.time() + self.flush_interval
+                continue
+
+            if detail is None:
+                break
+            info_row = self.info_rows.get(detail["course_code"])
+            if info_row is not None:
+                self._batch.append(info_row.with_detail(detail))
+            if len(self._batch) >= self.batch_size:
+                await self.flush()
+                deadline = loop.time() + self.flush_interval
+
+        await self.flush()
+
+    async def write_info_only(self, course_codes: Iterable[str]) -> None:
+        """Write CSV records of courses that have no fetched details."""
+        for code in course_codes:
+            self._batch.append(self.info_rows[code])
+            if len(self._batch) >= self.batch_size:
+                await self.flush()
+        await self.flush()
+
+    async def write_stored_details(
+        self, academic_year: str, academic_semester: str, course_codes: Iterable[str]
+    ) -> None:
+        """
+        Rejoin CSV records with the stored details of courses whose page was
+        not parsed this crawl; the content hash decides which ones are written.
+        """
+        documents = await get_storage().get_course_documents(
+            academic_year, academic_semester, course_codes
+        )
+        for code, document in documents.items():
+            self._batch.append(self.info_rows[code].with_stored_detail(document))
+            if len(self._batch) >= self.batch_size:
+                await self.flush()
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        codes = [record.course_code for record in batch]
+        counts = await get_storage().save_course_batch(
+            batch, self.existing_hashes, self.generation
+        )
+        if counts is not None:
+            self.counts.add(counts)
+            self.written_codes.update(codes)
+            if self.journal is not None:
+                self.journal.record_courses(self.term_label, codes)
+            try:
+                await asyncio.to_thread(self.page_cache.flush, codes)
+            except Exception as e:
+                logger.warning(f"[crawl_course] Could not store page validators: {e}")
+        else:
+            self.failed_batches += 1
+            self.page_cache.discard(codes)
+
+
+def install_shutdown_handlers(stop_event: asyncio.Event) -> None:
+    """
+    Set `stop_event` on the first SIGTERM / SIGINT so the crawl can flush its
+    results and journal. A second signal falls back to the default behavior.
+    """
+    loop = asyncio.get_running_loop()
+
+    def request_shutdown(signum: signal.Signals) -> None:
+        logger.warning(
+            f"[crawl_course] Received {signum.name}; flushing results before exit "
+            "(send again to force quit)"
+        )
+        stop_event.set()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(sig)
 
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_shutdown, sig)
+
+
+async def main(
+    resume: bool = False, stop_event: Optional[asyncio.Event] = None
+) -> bool:
+    """
+    獲取課程資訊和詳細資訊並整合為一張表
 
-async def main() -> None:
-    """獲取課程資訊和詳細資訊並整合為一張表"""
+    Up to TERM_CONCURRENCY terms fetch details at the same time under one
+    shared request budget. Every term's CSV is prefetched up front, and
+    newer terms get slots first. Returns whether every term finished;
+    False when the crawl was stopped.
+
+    A caller that handles SIGTERM / SIGINT itself (main.py --daemon) passes
+    its own `stop_event`; otherwise the crawl installs its own handlers.
+    """
     logger.info("[crawl_course] Start executing course crawler")
 
-    latest_term = max(
+    # Newest first: the list index is the scheduling priority.
+    terms = sorted(
         config.academic_terms,
         key=lambda term: (int(term[0]), int(term[1])),
+        reverse=True,
     )
+    latest_term = terms[0]
+
+    journal = CheckpointJournal(config.checkpoint_path)
+    journal.open(resume)
+    # A resumed crawl continues the interrupted generation.
+    generation = journal.generation if resume else None
+    if generation is None:
+        generation = new_crawl_generation()
+        journal.record_generation(generation)
+    logger.info(f"[crawl_course] Crawl generation {generation}")
+    own_signal_handlers = stop_event is None
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        install_shutdown_handlers(stop_event)
+    budget = CrawlBudget.from_config()
+    term_slots = asyncio.Semaphore(config.term_concurrency)
+
+    async def run_term(
+        academic_year: str,
+        academic_semester: str,
+        course_info: asyncio.Task[tuple[pd.DataFrame, Optional[CourseCsv]]],
+        priority: int,
+    ) -> bool:
+        async with term_slots:
+            if stop_event.is_set():
+                course_info.cancel()
+                return False
+            return await crawl_term(
+                academic_year,
+                academic_semester,
+                journal,
+                stop_event,
+                course_info,
+                budget,
+                priority,
+                generation,
+            )
 
-    for academic_year, academic_semester in config.academic_terms:
-        term_label = f"{academic_year}-{academic_semester}"
-        is_latest_term = (academic_year, academic_semester) == latest_term
+    try:
+        term_tasks = []
+        for academic_year, academic_semester in terms:
+            term_label = f"{academic_year}-{academic_semester}"
+            is_latest_term = (academic_year, academic_semester) == latest_term
 
-        if (
-            not config.refresh_all_terms
-            and not is_latest_term
-            and course_term_exists(academic_year, academic_semester)
-        ):
-            logger.info(
-                f"[crawl_course] Skipping historical term {term_label}; "
-                "already exists in DB. Set REFRESH_ALL_TERMS=true to recrawl it."
-            )
-            continue
+            if journal.is_term_finished(term_label):
+                logger.info(
+                    f"[crawl_course] Skipping term {term_label}; finished before resume."
+                )
+                continue
+
+            if (
+                not config.refresh_all_terms
+                and not is_latest_term
+                and await get_storage().course_term_exists(academic_year, academic_semester)
+            ):
+                logger.info(
+                    f"[crawl_course] Skipping historical term {term_label}; "
+                    "already exists in DB. Set REFRESH_ALL_TERMS=true to recrawl it."
+                )
+                continue
 
-        await crawl_term(academic_year, academic_semester)
+            course_info = asyncio.create_task(
+                load_term_course_info(academic_year, academic_semester)
+            )
+            # Tasks queue on the semaphore in creation order, newest term first.
+            term_tasks.append(
+                asyncio.create_task(
+                    run_term(
+                        academic_year,
+                        academic_semester,
+                        course_info,
+                        len(term_tasks),
+                    )
+                )
+            )
 
+        term_results = await asyncio.gather(*term_tasks)
+        if stop_event.is_set():
+            logger.warning("[crawl_course] Course crawling stopped; progress saved.")
+            return False
+    finally:
+        journal.close()
+        if own_signal_handlers:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+
+    if not all(term_results):
+        logger.error(
+            f"[crawl_course] {term_results.count(False)} of {len(term_results)} "
+            "terms failed"
+        )
+        return False
     logger.info("[crawl_course] Course crawling completed!")
+    return True
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl THU course info and details")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the checkpoint journal instead of starting over",
+    )
+    return parser.parse_args()
 
 
-async def fetch_course_info(academic_year: str, academic_semester: str) -> pd.DataFrame:
-    """獲取課程基本資訊 (使用 aiohttp)"""
-    url = f"https://course.thu.edu.tw/opendatadownload/list/{academic_year}/{academic_semester}/"
+async def fetch_course_info(
+    academic_year: str, academic_semester: str
+) -> Optional[CourseCsv]:
+    """獲取課程基本資訊 (shared open-data CSV cache); None when it cannot be loaded"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                text = await response.text()
-                df = pd.read_csv(
-                    io.StringIO(text),
-                    dtype={"選課代碼": str, "開課系所代碼": str},
-                    on_bad_lines="skip",
-                )
-                return df
+        return await get_course_csv(academic_year, academic_semester)
     except Exception as e:
         logger.error(f"Error fetching course info: {e}")
-        return pd.DataFrame()
+        return None
+
+
+class CourseDetailFetchError(Exception):
+    """A course detail page could not be fetched or parsed."""
+
+    def __init__(self, reason: str, retryable: bool) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retryable = retryable
+
+
+@dataclass
+class CrawlBudget:
+    """Request budget and parse pool shared by every term of one crawl."""
+
+    controller: AdaptiveConcurrencyController
+    breaker: CircuitBreaker
+    parse_executor: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls) -> "CrawlBudget":
+        return cls(
+            controller=AdaptiveConcurrencyController(
+                max_limit=config.concurrency_limit,
+                initial_limit=config.concurrency_initial,
+                max_requests_per_second=config.max_requests_per_second,
+                latency_target=config.latency_target_ms / 1000,
+                name="crawl_course",
+            ),
+            breaker=CircuitBreaker(
+                error_threshold=config.circuit_breaker_error_rate,
+                pause=config.circuit_breaker_pause,
+                name="crawl_course",
+            ),
+            # Shared with later crawls in this process; see utils.parse_pool.
+            parse_executor=get_parse_pool(),
+        )
+
+
+@dataclass
+class CourseDetailFetchResult:
+    """Outcome of fetching the detail pages of one term."""
+
+    succeeded: int = 0
+    unchanged_codes: set[str] = field(default_factory=set)
+    failures: dict[str, str] = field(default_factory=dict)
 
 
 async def fetch_single_course_detail(
     session: aiohttp.ClientSession,
-    semaphore: asyncio.Semaphore,
+    controller: AdaptiveConcurrencyController,
     academic_year: str,
     academic_semester: str,
     course_code: str,
-) -> Optional[Dict[str, Any]]:
+    page_cache: Optional[PageCache] = None,
+    parse_executor: Optional[Executor] = None,
+    priority: int = 0,
+) -> Dict[str, Any]:
     """
     爬取「單一」課程詳細資訊的邏輯
-    """
-    url = f"{BASE_URL}/view/{academic_year}/{academic_semester}/{course_code}/"
 
-    async with semaphore:
-        try:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    # 失敗時可以 print，但建議使用 logging 避免干擾進度條
-                    # print(f"Failed to fetch {course_code}, status: {response.status}")
-                    return None
-                html = await response.text()
-
-            soup = BeautifulSoup(html, "html.parser")
-
-            page_text = clean_text(soup.select_one("#content")) or clean_text(soup.body)
-            closed_notice = soup.find(class_="warning closable")
-            hero_text = clean_text(soup.select_one("#course-hero"))
-            is_closed = bool(
-                closed_notice
-                or "本課程已於" in page_text
-                or "停開" in hero_text
+    With a page cache, a conditional request is sent and PAGE_UNCHANGED is
+    returned without parsing when the page matches the cached validators.
+    Parsing runs in `parse_executor` when given, otherwise on the event loop.
+    Raises CourseDetailFetchError when the page cannot be fetched or parsed.
+    """
+    url = f"{config.base_url}/view/{academic_year}/{academic_semester}/{course_code}/"
+    cached = page_cache.get(course_code) if page_cache else None
+    headers: Dict[str, str] = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+
+    await controller.acquire(priority)
+    started = time.monotonic()
+    outcome: Optional[Outcome] = "error"
+    try:
+        async with session.get(url, headers=headers) as response:
+            outcome = classify_status(response.status)
+            if response.status == 304 and cached:
+                return PAGE_UNCHANGED
+            if response.status != 200:
+                raise CourseDetailFetchError(
+                    f"HTTP {response.status}",
+                    retryable=response.status == 429 or response.status >= 500,
+                )
+            body = await response.read()
+            encoding = response.get_encoding()
+            validators = PageValidators(
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", ""),
+                body_hash=hash_page_body(body),
             )
+    except CourseDetailFetchError:
+        raise
+    except asyncio.CancelledError:
+        # Stopped by shutdown; says nothing about the server's health.
+        outcome = None
+        raise
+    except asyncio.TimeoutError as e:
+        outcome = "timeout"
+        raise CourseDetailFetchError("timeout", retryable=True) from e
+    except Exception as e:
+        outcome = "error"
+        raise CourseDetailFetchError(
+            f"{type(e).__name__}: {e}", retryable=True
+        ) from e
+    finally:
+        if outcome is None:
+            controller.release_cancelled()
+        else:
+            controller.release(time.monotonic() - started, outcome)
+
+    if cached and cached.body_hash == validators.body_hash:
+        # Same body under new validators: keep them so the next crawl gets a 304.
+        if page_cache:
+            page_cache.put(course_code, validators)
+        return PAGE_UNCHANGED
 
-            teaching_goal = extract_accordion_section(soup, "教育目標")
-            course_description = extract_accordion_section(soup, "課程概述")
-            if not course_description:
-                course_description = extract_accordion_section(soup, "課程描述")
-
-            return {
-                "academic_year": int(academic_year),
-                "academic_semester": int(academic_semester),
-                "course_code": course_code,
-                "is_closed": is_closed,
-                "teachers": extract_teachers(soup),
-                "grading_items": extract_grading_items(soup),
-                "selection_records": extract_selection_records(soup),
-                "teaching_goal": teaching_goal,
-                "course_description": course_description,
-                "basic_info": extract_hero_basic_info(soup),
-            }
+    try:
+        if parse_executor is not None:
+            detail = await asyncio.get_running_loop().run_in_executor(
+                parse_executor,
+                parse_course_detail_page,
+                body,
+                encoding,
+                academic_year,
+                academic_semester,
+                course_code,
+                config.html_parser_backend,
+            )
+        else:
+            detail = parse_course_detail_page(
+                body,
+                encoding,
+                academic_year,
+                academic_semester,
+                course_code,
+                config.html_parser_backend,
+            )
+    except BrokenProcessPool:
+        # A crashed worker breaks the whole pool; parse on the event loop instead.
+        discard_parse_pool(parse_executor)
+        detail = parse_course_detail_page(
+            body,
+            encoding,
+            academic_year,
+            academic_semester,
+            course_code,
+            config.html_parser_backend,
+        )
+    except Exception as e:
+        raise CourseDetailFetchError(
+            f"parse error: {type(e).__name__}: {e}", retryable=False
+        ) from e
 
-        except Exception as e:
-            # 使用 print 會破壞進度條，實務上建議收集錯誤最後顯示，或寫入 log 檔
-            # print(f"Error processing {course_code}: {e}")
-            return None
+    if page_cache:
+        page_cache.put(course_code, validators)
+    return detail
 
 
 async def fetch_course_details_concurrently(
-    academic_year: str, academic_semester: str, course_codes: List[str]
-) -> pd.DataFrame:
+    academic_year: str,
+    academic_semester: str,
+    course_codes: List[str],
+    page_cache: Optional[PageCache] = None,
+    on_detail: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    stop_event: Optional[asyncio.Event] = None,
+    budget: Optional["CrawlBudget"] = None,
+    priority: int = 0,
+) -> CourseDetailFetchResult:
     """
     管理所有並發任務的函式，並以一般 log 顯示進度
+
+    Each parsed detail is handed to `on_detail` as soon as it is ready; with a
+    bounded queue's `put` this applies backpressure to the fetch workers.
+    Setting `stop_event` cancels the remaining fetches.
+
+    Every code is fetched once in a first pass. Retryable failures are
+    re-enqueued at a lower priority with jittered exponential backoff, so
+    retries only run after the first pass has drained. A circuit breaker
+    pauses all workers while the error rate is too high.
+
+    Terms crawled at the same time share one `budget`; their requests get
+    concurrency slots in `priority` order (lower first). Without a budget,
+    a private one is created for this call.
     """
-    concurrency_limit = config.concurrency_limit
-    semaphore = asyncio.Semaphore(concurrency_limit)
+    if budget is None:
+        budget = CrawlBudget.from_config()
+    controller = budget.controller
+    breaker = budget.breaker
+    parse_executor = budget.parse_executor
+    term_label = f"{academic_year}-{academic_semester}"
     total = len(course_codes)
     completed = 0
     succeeded = 0
-    failed = 0
+    retried = 0
+    unchanged_codes: set[str] = set()
+    failures: dict[str, str] = {}
     progress_log_interval = 100
 
     logger.info(
-        f"[crawl_course] Fetching {total} course details "
-        f"(concurrency: {concurrency_limit})"
+        f"[crawl_course] Fetching {total} course details for {term_label} "
+        f"(concurrency: {controller.current_limit}, ceiling: {controller.max_limit}, "
+        f"parse workers: {config.parse_workers or 'event loop'})"
     )
 
-    async with aiohttp.ClientSession() as session:
-        async def worker(code: str):
-            nonlocal completed, succeeded, failed
-
-            result = await fetch_single_course_detail(
-                session, semaphore, academic_year, academic_semester, code
+    # Items are (attempt, not_before, sequence, course_code): first-pass items
+    # (attempt 0) always sort ahead of retries.
+    queue: asyncio.PriorityQueue[tuple[int, float, int, str]] = asyncio.PriorityQueue()
+    for sequence, code in enumerate(course_codes):
+        queue.put_nowait((0, 0.0, sequence, code))
+
+    session = get_http_client().session
+
+    async def worker() -> None:
+        nonlocal completed, succeeded, retried
+
+        while True:
+            attempt, not_before, sequence, code = await queue.get()
+            try:
+                delay = not_before - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await breaker.wait_if_open()
+
+                try:
+                    result = await fetch_single_course_detail(
+                        session,
+                        controller,
+                        academic_year,
+                        academic_semester,
+                        code,
+                        page_cache,
+                        parse_executor,
+                        priority,
+                    )
+                except CourseDetailFetchError as e:
+                    if e.retryable:
+                        breaker.record(False)
+                    if e.retryable and attempt < config.detail_max_retries:
+                        retried += 1
+                        queue.put_nowait(
+                            (
+                                attempt + 1,
+                                time.monotonic()
+                                + backoff_delay(
+                                    attempt + 1,
+                                    config.retry_base_delay,
+                                    config.retry_max_delay,
+                                ),
+                                sequence,
+                                code,
+                            )
+                        )
+                        continue
+                    failures[code] = (
+                        f"{e.reason} (after {attempt + 1} attempts)"
+                        if attempt
+                        else e.reason
+                    )
+                else:
+                    breaker.record(True)
+                    if result is PAGE_UNCHANGED:
+                        unchanged_codes.add(code)
+                    else:
+                        succeeded += 1
+                        if on_detail is not None:
+                            await on_detail(result)
+
+                completed += 1
+                if completed == total or completed % progress_log_interval == 0:
+                    logger.info(
+                        f"[crawl_course] {term_label} detail progress: {completed}/{total} "
+                        f"(success: {succeeded}, unchanged: {len(unchanged_codes)}, "
+                        f"failed: {len(failures)}, retries: {retried}, "
+                        f"concurrency: {controller.current_limit})"
+                    )
+            finally:
+                queue.task_done()
+
+    # Twice the ceiling, so a slot freed while one worker parses can go to
+    # another request of this term instead of a lower-priority term.
+    workers = [
+        asyncio.create_task(worker()) for _ in range(controller.max_limit * 2)
+    ]
+    waiters = [asyncio.create_task(queue.join())]
+    if stop_event is not None:
+        waiters.append(asyncio.create_task(stop_event.wait()))
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        if stop_event is not None and stop_event.is_set():
+            logger.warning(
+                f"[crawl_course] Stopping {term_label} with "
+                f"{total - completed} course details pending"
             )
-            completed += 1
-            if result is None:
-                failed += 1
-            else:
-                succeeded += 1
-
-            if completed == total or completed % progress_log_interval == 0:
-                logger.info(
-                    f"[crawl_course] Course detail progress: {completed}/{total} "
-                    f"(success: {succeeded}, failed: {failed})"
-                )
-
-            return result
-
-        tasks = [worker(code) for code in course_codes]
-        results = await asyncio.gather(*tasks)
+    finally:
+        for task in [*workers, *waiters]:
+            task.cancel()
+        await asyncio.gather(*workers, *waiters, return_exceptions=True)
 
-    # 過濾掉失敗的 (None) 結果
-    valid_results = [r for r in results if r is not None]
     logger.info(
-        f"[crawl_course] Course detail fetch completed: {len(valid_results)}/{total} "
-        f"succeeded, {failed} failed"
+        f"[crawl_course] {term_label} detail fetch completed: {succeeded}/{total} "
+        f"succeeded, {len(unchanged_codes)} unchanged, {len(failures)} failed, "
+        f"{retried} retries, {breaker.trips} circuit breaker trips"
     )
+    if failures:
+        logger.warning(
+            f"[crawl_course] {len(failures)} course details failed permanently "
+            f"for {term_label}:"
+        )
+        for code, reason in sorted(failures.items()):
+            logger.warning(f"[crawl_course]   {code}: {reason}")
 
-    columns = [
-        "academic_year",
-        "academic_semester",
-        "course_code",
-        "is_closed",
-        "teachers",
-        "grading_items",
-        "selection_records",
-        "teaching_goal",
-        "course_description",
-        "basic_info",
-    ]
-    return pd.DataFrame(valid_results, columns=columns)
+    return CourseDetailFetchResult(
+        succeeded=succeeded,
+        unchanged_codes=unchanged_codes,
+        failures=failures,
+    )
+
+
+async def run_standalone(resume: bool) -> bool:
+    try:
+        return await main(resume=resume)
+    finally:
+        close_parse_pool()
+        await close_http_client()
+        await close_storage()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if not asyncio.run(run_standalone(args.resume)):
+        sys.exit(1)
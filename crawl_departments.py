@@ -1,20 +1,35 @@
-import io
+import asyncio
+import html
 import logging
 import re
+import sys
+import time
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 
 from config import config
-from db import save_department_categories_to_db, save_departments_to_db
-
+from utils.http_client import HttpClient, close_http_client, get_http_client
 from utils.logger import setup_logger, get_logger
+from utils.open_data import get_course_csv
+from utils.storage import close_storage, get_storage
 
 setup_logger()
 logger = get_logger(__name__)
 
-BASE_URL = "https://course.thu.edu.tw"
+# Rows requested per /api/course-list page.
+COURSE_LIST_PAGE_SIZE = 500
+
+# Links in the memo column of /api/course-list rows; the href may be double-,
+# single- or unquoted.
+LINK_RE = re.compile(
+    r"""<a\b[^>]*?(?<![\w-])href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))[^>]*>(.*?)</a>""",
+    re.IGNORECASE | re.DOTALL,
+)
+# The department code ends at a query string or fragment: /view-dept/115/1/350/?tab=1
+DEPT_HREF_RE = re.compile(r"/view-dept/(\d+)/(\d+)/([^/?#]+)")
+TAG_RE = re.compile(r"<[^>]+>")
+WHITESPACE_RE = re.compile(r"\s+")
 
 
 def get_department_term() -> tuple[str, str]:
@@ -34,100 +49,183 @@ def extract_dept_code(href: str | None) -> str:
     return href.strip("/").split("/")[-1]
 
 
-def fetch_course_info_df(
-    session: requests.Session, academic_year: str, academic_semester: str
+def extract_department_links(
+    memo_html: str, academic_year: str, academic_semester: str
+) -> list[tuple[str, str]]:
+    """Return (department_code, department_name) of the term's /view-dept/ links."""
+    links = []
+    for double_quoted, single_quoted, unquoted, inner_html in LINK_RE.findall(memo_html):
+        href = html.unescape(double_quoted or single_quoted or unquoted)
+        match = DEPT_HREF_RE.search(href)
+        if not match:
+            continue
+        year, semester, dept_code = match.groups()
+        if year != academic_year or semester != academic_semester:
+            continue
+        dept_name = WHITESPACE_RE.sub(" ", html.unescape(TAG_RE.sub(" ", inner_html))).strip()
+        if dept_code and dept_name:
+            links.append((dept_code, dept_name))
+    return links
+
+
+async def fetch_course_info_df(
+    academic_year: str, academic_semester: str, slots: asyncio.Semaphore
 ) -> pd.DataFrame:
-    url = f"{BASE_URL}/opendatadownload/list/{academic_year}/{academic_semester}/"
-    response = session.get(url, timeout=30)
-    response.raise_for_status()
-    return pd.read_csv(
-        io.StringIO(response.text),
-        dtype={"選課代碼": str, "開課系所代碼": str},
-        on_bad_lines="skip",
-    )
+    """
+    The term's open-data CSV, downloaded under `slots`. Returns an empty
+    frame when it cannot be loaded, so the college pages fetched alongside
+    it are kept.
+    """
+    try:
+        async with slots:
+            return (await get_course_csv(academic_year, academic_semester)).df
+    except Exception as e:
+        logger.error(f"[fetch_dept_categories] Could not load the course info CSV: {e}")
+        return pd.DataFrame()
 
 
-def fetch_college_department_map(
-    session: requests.Session,
+async def fetch_course_list_page(
+    client: HttpClient,
     academic_year: str,
     academic_semester: str,
     category_code: str,
-) -> dict[str, str]:
-    """Read department links from the redesigned DataTables course API."""
-    try:
-        response = session.get(
-            f"{BASE_URL}/api/course-list",
+    start: int,
+    slots: asyncio.Semaphore,
+) -> dict:
+    """Fetch one page of the DataTables course API for a college."""
+    async with slots:
+        return await client.fetch_json(
+            f"{config.base_url}/api/course-list",
             params={
                 "year": academic_year,
                 "term": academic_semester,
                 "college": category_code,
-                "draw": 1,
-                "start": 0,
-                "length": 5000,
+                "draw": start // COURSE_LIST_PAGE_SIZE + 1,
+                "start": start,
+                "length": COURSE_LIST_PAGE_SIZE,
             },
-            timeout=30,
         )
-        response.raise_for_status()
-        payload = response.json()
+
+
+async def fetch_college_department_map(
+    client: HttpClient,
+    academic_year: str,
+    academic_semester: str,
+    category_code: str,
+    slots: asyncio.Semaphore | None = None,
+) -> dict[str, str]:
+    """
+    Read department links from the redesigned DataTables course API.
+
+    The first page tells how many rows the college has; the remaining pages
+    are fetched concurrently, bounded by `slots`. Departments on pages that
+    fail are missing from the result.
+    """
+    slots = slots or asyncio.Semaphore(config.concurrency_limit)
+    started = time.perf_counter()
+    try:
+        first_page = await fetch_course_list_page(
+            client, academic_year, academic_semester, category_code, 0, slots
+        )
     except Exception as e:
         logger.warning(
             f"[fetch_dept_categories] Could not fetch college API for {category_code}: {e}"
         )
         return {}
 
+    total = int(first_page.get("recordsFiltered", first_page.get("recordsTotal", 0)) or 0)
+    pages = [first_page]
+    results = await asyncio.gather(
+        *(
+            fetch_course_list_page(
+                client, academic_year, academic_semester, category_code, start, slots
+            )
+            for start in range(COURSE_LIST_PAGE_SIZE, total, COURSE_LIST_PAGE_SIZE)
+        ),
+        return_exceptions=True,
+    )
+    failed_pages = 0
+    for result in results:
+        if isinstance(result, BaseException):
+            failed_pages += 1
+            logger.warning(
+                f"[fetch_dept_categories] Could not fetch a course-list page for "
+                f"{category_code}: {result}"
+            )
+        else:
+            pages.append(result)
+
     dept_map: dict[str, str] = {}
-    for row in payload.get("data", []):
-        if not isinstance(row, list) or len(row) < 7:
-            continue
-        memo_soup = BeautifulSoup(str(row[6]), "html.parser")
-        for link in memo_soup.find_all("a", href=True):
-            href = link.get("href", "")
-            pattern = rf"/view-dept/{academic_year}/{academic_semester}/([^/]+)/?"
-            match = re.search(pattern, href)
-            if not match:
+    row_count = 0
+    for page in pages:
+        for row in page.get("data", []):
+            if not isinstance(row, list) or len(row) < 7:
                 continue
-            dept_code = match.group(1)
-            dept_name = clean_text(link)
-            if dept_code and dept_name:
+            row_count += 1
+            for dept_code, dept_name in extract_department_links(
+                str(row[6]), academic_year, academic_semester
+            ):
                 dept_map[dept_code] = dept_name
+
+    logger.info(
+        f"[fetch_dept_categories] College {category_code}: {len(dept_map)} departments "
+        f"from {row_count} rows in {len(pages)} pages "
+        f"({failed_pages} failed) in {time.perf_counter() - started:.2f}s"
+    )
     return dept_map
 
 
+async def main() -> bool:
+    """
+    獲取系所分類和系所資料
 
-def main() -> None:
-    """獲取系所分類和系所資料"""
+    Returns whether both the categories and the departments were fetched
+    and saved.
+    """
     logger.info("[crawl_departments] Starting departments crawler")
 
     try:
-        categories_df, departments_df = fetch_dept_categories()
+        categories_df, departments_df = await fetch_dept_categories()
 
         # 儲存到資料庫
         if not categories_df.empty:
-            save_department_categories_to_db(categories_df)
+            await get_storage().save_department_categories(categories_df)
 
         if not departments_df.empty:
-            save_departments_to_db(departments_df)
+            await get_storage().save_departments(departments_df)
+
+        if categories_df.empty or departments_df.empty:
+            logger.error(
+                "[crawl_departments] No "
+                f"{'department categories' if categories_df.empty else 'departments'} "
+                "fetched; keeping the stored ones"
+            )
+            return False
 
     except Exception as e:
         logger.error(f"[crawl_departments] Departments crawler failed: {e}")
+        return False
 
     logger.info("[crawl_departments] Departments crawler task completed")
+    return True
+
 
+async def fetch_dept_categories() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    獲取所有系所分類和系所資訊
 
-def fetch_dept_categories() -> tuple[pd.DataFrame, pd.DataFrame]:
-    """獲取所有系所分類和系所資訊"""
+    Departments come from the term's course CSV. When the CSV cannot be
+    loaded, the departments linked from the college pages are used instead.
+    """
     try:
         academic_year, academic_semester = get_department_term()
-        session = requests.Session()
-        response = session.get(
-            f"{BASE_URL}/view-dept/{academic_year}/{academic_semester}/",
-            timeout=30,
+        client = get_http_client()
+        index_html = await client.fetch_text(
+            f"{config.base_url}/view-dept/{academic_year}/{academic_semester}/"
         )
-        response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(index_html, "html.parser")
         categories_data = []
-        category_dept_lookup: dict[str, dict[str, str]] = {}
 
         dept_categories = soup.select("#dept-nav-colleges a[href]")
         logger.info(f"[fetch_dept_categories] Found {len(dept_categories)} categories")
@@ -146,26 +244,47 @@ def fetch_dept_categories() -> tuple[pd.DataFrame, pd.DataFrame]:
                 {
                     "category_code": category_code,
                     "category_name": category_name,
-                    "category_url": f"{BASE_URL}{category_href}",
+                    "category_url": f"{config.base_url}{category_href}",
                     "category_href": category_href,
                 }
             )
             logger.info(
                 f"[fetch_dept_categories] Found category: {category_name} (code: {category_code})"
             )
-            category_dept_lookup[category_code] = fetch_college_department_map(
-                session,
-                academic_year,
-                academic_semester,
-                category_code,
-            )
 
-        course_info_df = fetch_course_info_df(
-            session, academic_year, academic_semester
+        # Every college's pages and the course CSV share one request budget.
+        slots = asyncio.Semaphore(config.concurrency_limit)
+        started = time.perf_counter()
+        college_codes = [category["category_code"] for category in categories_data]
+        *dept_maps, course_info_df = await asyncio.gather(
+            *(
+                fetch_college_department_map(
+                    client, academic_year, academic_semester, category_code, slots
+                )
+                for category_code in college_codes
+            ),
+            fetch_course_info_df(academic_year, academic_semester, slots),
+        )
+        category_dept_lookup = dict(zip(college_codes, dept_maps))
+        logger.info(
+            f"[fetch_dept_categories] Fetched {len(college_codes)} colleges "
+            f"in {time.perf_counter() - started:.2f}s"
         )
+
         if course_info_df.empty:
-            logger.warning("[fetch_dept_categories] Course info CSV is empty")
-            return pd.DataFrame(categories_data), pd.DataFrame()
+            # Fall back to the departments linked from the college pages.
+            logger.warning(
+                "[fetch_dept_categories] Course info CSV is empty; using the "
+                "departments linked from the college pages"
+            )
+            course_info_df = pd.DataFrame(
+                [
+                    {"開課系所代碼": dept_code, "開課系所名稱": dept_name}
+                    for dept_map in category_dept_lookup.values()
+                    for dept_code, dept_name in dept_map.items()
+                ],
+                columns=["開課系所代碼", "開課系所名稱"],
+            )
 
         departments_source = (
             course_info_df[["開課系所代碼", "開課系所名稱"]]
@@ -205,7 +324,7 @@ def fetch_dept_categories() -> tuple[pd.DataFrame, pd.DataFrame]:
                     "category_name": category_name,
                     "department_code": department_code,
                     "department_name": department_name,
-                    "department_url": f"{BASE_URL}{department_href}",
+                    "department_url": f"{config.base_url}{department_href}",
                     "department_href": department_href,
                 }
             )
@@ -218,7 +337,7 @@ def fetch_dept_categories() -> tuple[pd.DataFrame, pd.DataFrame]:
                 {
                     "category_code": "uncategorized",
                     "category_name": "未分類",
-                    "category_url": f"{BASE_URL}{category_href}",
+                    "category_url": f"{config.base_url}{category_href}",
                     "category_href": category_href,
                 }
             )
@@ -261,5 +380,14 @@ def process_departments_df(departments_df: pd.DataFrame) -> pd.DataFrame:
     return departments_df
 
 
+async def run_standalone() -> bool:
+    try:
+        return await main()
+    finally:
+        await close_http_client()
+        await close_storage()
+
+
 if __name__ == "__main__":
-    main()
+    if not asyncio.run(run_standalone()):
+        sys.exit(1)
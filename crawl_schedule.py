@@ -1,13 +1,15 @@
+import asyncio
 import logging
+import sys
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 
 from config import config
-from db import save_course_schedule_to_db
 from utils.dataframe_utils import process_course_schedule_df
+from utils.http_client import close_http_client, get_http_client
+from utils.storage import close_storage, get_storage
 
 from utils.logger import setup_logger, get_logger
 
@@ -15,28 +17,37 @@ setup_logger()
 logger = get_logger(__name__)
 
 
-def main() -> None:
-    """獲取選課時間表"""
+async def main() -> bool:
+    """
+    獲取選課時間表
+
+    Returns whether the schedule was fetched and saved.
+    """
     logger.info("[crawl_schedule] Starting course schedule crawler")
 
     try:
-        course_schedule_df = fetch_course_selection_schedule()
+        course_schedule_df = await fetch_course_selection_schedule()
+        if course_schedule_df.empty:
+            logger.error(
+                "[crawl_schedule] No course schedule fetched; keeping the stored one"
+            )
+            return False
         course_schedule_df = process_course_schedule_df(course_schedule_df)
-        save_course_schedule_to_db(course_schedule_df)
+        await get_storage().save_course_schedule(course_schedule_df)
     except Exception as e:
         logger.error(f"[crawl_schedule] Course schedule crawler failed: {e}")
+        return False
 
     logger.info("[crawl_schedule] Course schedule crawler task completed")
+    return True
 
 
-def fetch_course_selection_schedule() -> pd.DataFrame:
+async def fetch_course_selection_schedule() -> pd.DataFrame:
     try:
-        response = requests.get(
-            f"https://course.thu.edu.tw/index/{config.academic_year}/{config.academic_semester}",
-            timeout=30,
+        html = await get_http_client().fetch_text(
+            f"{config.base_url}/index/{config.academic_year}/{config.academic_semester}"
         )
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
         table = None
         for candidate in soup.find_all("table"):
             headers = [
@@ -69,5 +80,14 @@ def fetch_course_selection_schedule() -> pd.DataFrame:
         return pd.DataFrame()
 
 
+async def run_standalone() -> bool:
+    try:
+        return await main()
+    finally:
+        await close_http_client()
+        await close_storage()
+
+
 if __name__ == "__main__":
-    main()
+    if not asyncio.run(run_standalone()):
+        sys.exit(1)
@@ -1,22 +1,125 @@
+import asyncio
 import logging
-import math
-from typing import Any
+import threading
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Iterable, Optional, TypeVar
 
 import pandas as pd
 import pymongo
-from pymongo import UpdateOne
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
 
 from config import config
 
+from utils.bulk_writer import bulk_write_chunked_async
+from utils.course_record import (
+    NON_CONTENT_FIELDS,
+    CourseRecord,
+    CourseWriteCounts,
+    compute_content_hash,
+    new_crawl_generation,
+    normalize_basic_info,
+)
 from utils.logger import get_logger
+from utils.migrations import (
+    COUNTERS_COLLECTION,
+    COURSE_CHANGES_COLLECTION,
+    ENROLLMENT_HISTORY_COLLECTION,
+    TERM_GENERATIONS_COLLECTION,
+    ensure_schema_current,
+    latest_enrollment_dates_pipeline,
+)
 
 logger = get_logger(__name__)
 
-myclient: pymongo.MongoClient[dict] = pymongo.MongoClient(config.db_uri)
+T = TypeVar("T")
 
-COURSE_TERM_INDEX = [("academic_year", 1), ("academic_semester", 1), ("course_code", 1)]
-COURSE_TERM_INDEX_NAME = "academic_term_course_code_unique"
-NO_DATA_VALUES = {"", "無資料", "無", "未定", "None", "none", "N/A", "n/a"}
+# Sync client: schema migrations and the page cache (run in worker threads).
+_client: Optional[pymongo.MongoClient[dict]] = None
+_client_lock = threading.Lock()
+
+# AsyncMongoClient instances are bound to the event loop they are used on.
+_async_clients: dict[asyncio.AbstractEventLoop, AsyncMongoClient] = {}
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+# Change-log sequence numbers are reserved and written under this lock, so
+# within one process entries become visible in seq order.
+_change_log_locks: dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+
+
+def get_client() -> pymongo.MongoClient[dict]:
+    """Return the sync client, creating it on first use rather than at import."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = pymongo.MongoClient(config.db_uri)
+    return _client
+
+
+def get_database():
+    """Return the sync database named by DB_NAME."""
+    assert config.db_name, "DB_NAME must be set in .env file"
+
+    return get_client()[config.db_name]
+
+
+def __getattr__(name: str) -> Any:
+    # `db.myclient` used to be created at import; keep it as a lazy alias.
+    if name == "myclient":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_async_client() -> AsyncMongoClient:
+    """Return the async client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncMongoClient(config.db_uri)
+        _async_clients[loop] = client
+    return client
+
+
+def get_async_database() -> AsyncDatabase:
+    assert config.db_name, "DB_NAME must be set in .env file"
+
+    return get_async_client()[config.db_name]
+
+
+def get_async_collection(base_name: str):
+    """Return an async collection, with the '_dev' suffix in dev mode."""
+    return get_async_database()[get_collection_name(base_name)]
+
+
+async def ping_async() -> None:
+    """Round-trip to the server so the async client's connection pool is open."""
+    await get_async_database().command("ping")
+
+
+async def close_async_client() -> None:
+    """Close the async client of the running event loop, if one was created."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def run_sync(coroutine: Awaitable[T]) -> T:
+    """
+    Run a persistence coroutine from synchronous code.
+
+    Coroutines run on one background event loop with its own async client,
+    so the sync wrappers below also work from threads and from code that is
+    itself called inside a running event loop.
+    """
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_sync_loop.run_forever, name="db-sync-loop", daemon=True
+            ).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _sync_loop).result()
 
 
 def get_collection_name(base_name: str) -> str:
@@ -41,266 +144,623 @@ def get_df_term_filter(df: pd.DataFrame) -> dict:
     }
 
 
-def parse_numeric_term(value: Any) -> int | None:
-    """Return a normalized academic term value when it is numeric."""
-    if value is None:
-        return None
-    if isinstance(value, bool):
-        return None
-    if isinstance(value, int):
-        return value
-    if isinstance(value, float):
-        if math.isfinite(value) and value.is_integer():
-            return int(value)
-        return None
-    raw_value = str(value).strip()
-    if not raw_value.isdigit():
-        try:
-            float_value = float(raw_value)
-        except ValueError:
-            return None
-        if math.isfinite(float_value) and float_value.is_integer():
-            return int(float_value)
-        return None
-    return int(raw_value)
+def ensure_course_term_index(collection) -> None:
+    """
+    Make sure the term-aware unique index and legacy term cleanup are in place.
 
+    Both are one-time schema migrations (see utils/migrations.py); after the
+    first call per process this is only an in-memory version check.
+    """
+    ensure_schema_current(collection.database)
 
-def cleanup_course_term_documents(collection) -> None:
+
+async def ensure_course_term_index_async() -> None:
+    """ensure_course_term_index for the async save functions."""
+    await asyncio.to_thread(ensure_schema_current, get_database())
+
+
+async def course_term_exists_async(
+    academic_year: str, academic_semester: str
+) -> bool:
+    """Return whether the merged courses collection already has this term."""
+    assert config.db_name, "DB_NAME must be set in .env file"
+
+    collection_name = get_collection_name("courses")
+    mydb = get_async_database()
+    collection = mydb[collection_name]
+
+    return (
+        await collection.count_documents(
+            {
+                "academic_year": int(academic_year),
+                "academic_semester": int(academic_semester),
+            },
+            limit=1,
+        )
+        > 0
+    )
+
+
+def course_term_exists(academic_year: str, academic_semester: str) -> bool:
+    """Sync wrapper of course_term_exists_async."""
+    return run_sync(course_term_exists_async(academic_year, academic_semester))
+
+
+async def get_term_content_hashes_async(
+    academic_year: str, academic_semester: str
+) -> dict[str, str]:
     """
-    Normalize legacy course term fields before enforcing the compound unique index.
+    Return {course_code: content_hash} for a term of the merged courses collection.
 
-    Older crawls may have stored academic_year / academic_semester as strings.
-    MongoDB treats "1" and 1 as different unique-index values, so repeated crawls
-    can create logical duplicates. Keep the newest document for each normalized
-    term/course identity and rewrite its term fields as integers.
+    Documents written before content hashes existed map to "".
     """
-    grouped_docs: dict[tuple[int, int, str], list[dict[str, Any]]] = {}
+    assert config.db_name, "DB_NAME must be set in .env file"
+
+    collection = get_async_collection("courses")
+    return {
+        doc["course_code"]: doc.get("content_hash", "")
+        async for doc in collection.find(
+            {
+                "academic_year": int(academic_year),
+                "academic_semester": int(academic_semester),
+            },
+            {"_id": 0, "course_code": 1, "content_hash": 1},
+        )
+        if "course_code" in doc
+    }
 
-    for doc in collection.find(
+
+def get_term_content_hashes(academic_year: str, academic_semester: str) -> dict[str, str]:
+    """Sync wrapper of get_term_content_hashes_async."""
+    return run_sync(get_term_content_hashes_async(academic_year, academic_semester))
+
+
+async def get_course_documents_async(
+    academic_year: str, academic_semester: str, course_codes: Iterable[str]
+) -> dict[str, dict]:
+    """Return {course_code: document} of the stored courses of a term among `course_codes`."""
+    assert config.db_name, "DB_NAME must be set in .env file"
+
+    codes = list(course_codes)
+    if not codes:
+        return {}
+    collection = get_async_collection("courses")
+    return {
+        doc["course_code"]: doc
+        async for doc in collection.find(
+            {
+                "academic_year": int(academic_year),
+                "academic_semester": int(academic_semester),
+                "course_code": {"$in": codes},
+            },
+            {"_id": 0},
+        )
+    }
+
+
+def get_page_cache_collection():
+    """Return the collection holding course detail page validators."""
+    return get_database()[get_collection_name("course_page_cache")]
+
+
+def get_courses_collection():
+    """Return the merged courses collection (courses or courses_dev)."""
+    return get_database()[get_collection_name("courses")]
+
+
+def prepare_courses_collection() -> None:
+    """Ensure schema migrations (term normalization, unique index) are applied."""
+    ensure_course_term_index(get_courses_collection())
+
+
+async def prepare_courses_collection_async() -> None:
+    await ensure_course_term_index_async()
+
+
+def get_term_generations_collection():
+    """Return the per-term committed generation pointers."""
+    return get_database()[get_collection_name(TERM_GENERATIONS_COLLECTION)]
+
+
+async def commit_term_generation_async(
+    academic_year: str, academic_semester: str, generation: int
+) -> None:
+    """
+    Point readers of the courses_current view at `generation` for a term.
+
+    Call after every course of the term was stamped with `generation`.
+    """
+    await get_async_collection(TERM_GENERATIONS_COLLECTION).update_one(
+        {"_id": f"{academic_year}-{academic_semester}"},
         {
-            "academic_year": {"$exists": True},
-            "academic_semester": {"$exists": True},
-            "course_code": {"$exists": True},
+            "$set": {
+                "academic_year": int(academic_year),
+                "academic_semester": int(academic_semester),
+                "generation": generation,
+                "committed_at": datetime.now(timezone.utc),
+            }
         },
-        {"_id": 1, "academic_year": 1, "academic_semester": 1, "course_code": 1},
-    ):
-        academic_year = parse_numeric_term(doc.get("academic_year"))
-        academic_semester = parse_numeric_term(doc.get("academic_semester"))
-        course_code = str(doc.get("course_code", "")).strip()
-        if academic_year is None or academic_semester is None or not course_code:
-            continue
+        upsert=True,
+    )
 
-        grouped_docs.setdefault(
-            (academic_year, academic_semester, course_code), []
-        ).append(doc)
 
-    normalized_count = 0
-    duplicate_count = 0
+def commit_term_generation(
+    academic_year: str, academic_semester: str, generation: int
+) -> None:
+    """Sync wrapper of commit_term_generation_async."""
+    run_sync(
+        commit_term_generation_async(academic_year, academic_semester, generation)
+    )
 
-    for (academic_year, academic_semester, _course_code), docs in grouped_docs.items():
-        canonical_docs = [
-            doc
-            for doc in docs
-            if doc.get("academic_year") == academic_year
-            and doc.get("academic_semester") == academic_semester
-        ]
-        keep_doc = max(canonical_docs or docs, key=lambda doc: str(doc["_id"]))
-        duplicate_ids = [doc["_id"] for doc in docs if doc["_id"] != keep_doc["_id"]]
 
-        if duplicate_ids:
-            delete_result = collection.delete_many({"_id": {"$in": duplicate_ids}})
-            duplicate_count += delete_result.deleted_count
+async def get_committed_generation_async(
+    academic_year: str, academic_semester: str
+) -> int | None:
+    """Return the generation readers currently see for a term, if any."""
+    pointer = await get_async_collection(TERM_GENERATIONS_COLLECTION).find_one(
+        {"_id": f"{academic_year}-{academic_semester}"}, {"generation": 1}
+    )
+    return pointer["generation"] if pointer else None
 
-        if (
-            keep_doc.get("academic_year") != academic_year
-            or keep_doc.get("academic_semester") != academic_semester
-        ):
-            collection.update_one(
-                {"_id": keep_doc["_id"]},
-                {
-                    "$set": {
-                        "academic_year": academic_year,
-                        "academic_semester": academic_semester,
-                    }
-                },
-            )
-            normalized_count += 1
 
-    if duplicate_count or normalized_count:
-        logger.info(
-            f"Normalized course term documents in {collection.name}: "
-            f"{normalized_count} updated, {duplicate_count} duplicates removed"
-        )
+def get_committed_generation(academic_year: str, academic_semester: str) -> int | None:
+    """Sync wrapper of get_committed_generation_async."""
+    return run_sync(get_committed_generation_async(academic_year, academic_semester))
 
 
-def ensure_course_term_index(collection) -> None:
-    """Replace legacy course_code uniqueness with term-aware uniqueness."""
-    cleanup_course_term_documents(collection)
+async def get_course_csv_hash_async(
+    academic_year: str, academic_semester: str
+) -> str | None:
+    """Return the hash of the open-data CSV a term's courses were last saved from."""
+    pointer = await get_async_collection(TERM_GENERATIONS_COLLECTION).find_one(
+        {"_id": f"{academic_year}-{academic_semester}"}, {"course_csv_hash": 1}
+    )
+    return pointer.get("course_csv_hash") if pointer else None
 
-    for index_name, index_info in collection.index_information().items():
-        if index_name == "_id_":
-            continue
-        if index_info.get("key") == [("course_code", 1)] and index_info.get("unique"):
-            logger.warning(
-                f"Dropping legacy unique index '{index_name}' before creating term-aware index."
-            )
-            collection.drop_index(index_name)
 
-    collection.create_index(
-        COURSE_TERM_INDEX,
-        unique=True,
-        name=COURSE_TERM_INDEX_NAME,
+async def save_course_csv_hash_async(
+    academic_year: str, academic_semester: str, content_hash: str
+) -> None:
+    """
+    Record on a term's generation pointer which open-data CSV its committed
+    courses were built from.
+    """
+    await get_async_collection(TERM_GENERATIONS_COLLECTION).update_one(
+        {"_id": f"{academic_year}-{academic_semester}"},
+        {
+            "$set": {
+                "academic_year": int(academic_year),
+                "academic_semester": int(academic_semester),
+                "course_csv_hash": content_hash,
+            }
+        },
+        upsert=True,
     )
 
 
-def normalize_no_data_value(value) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, float) and math.isnan(value):
-        return ""
-    value = str(value).strip()
-    return "" if value in NO_DATA_VALUES else value
+async def touch_course_generation_async(
+    academic_year: str,
+    academic_semester: str,
+    course_codes: Iterable[str],
+    generation: int,
+) -> int:
+    """
+    Stamp stored courses that this crawl kept without rewriting with
+    `generation`, so stale deletion does not remove them.
+    """
+    codes = list(course_codes)
+    if not codes:
+        return 0
+    result = await get_async_collection("courses").update_many(
+        {
+            "academic_year": int(academic_year),
+            "academic_semester": int(academic_semester),
+            "course_code": {"$in": codes},
+        },
+        {"$set": {"crawl_generation": generation}},
+    )
+    return result.matched_count
+
+
+def touch_course_generation(
+    academic_year: str,
+    academic_semester: str,
+    course_codes: Iterable[str],
+    generation: int,
+) -> int:
+    """Sync wrapper of touch_course_generation_async."""
+    return run_sync(
+        touch_course_generation_async(
+            academic_year, academic_semester, course_codes, generation
+        )
+    )
 
 
-def normalize_basic_info(raw_basic) -> dict:
-    if not isinstance(raw_basic, dict):
-        return {}
+def diff_course_documents(old: dict, new: dict) -> dict[str, dict[str, Any]]:
+    """Return {field: {"old": ..., "new": ...}} for content fields that differ."""
+    changes = {}
+    for key in old.keys() | new.keys():
+        if key in NON_CONTENT_FIELDS:
+            continue
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if old_value != new_value and not (
+            isinstance(old_value, float)
+            and isinstance(new_value, float)
+            and old_value != old_value
+            and new_value != new_value
+        ):
+            changes[key] = {"old": old_value, "new": new_value}
+    return changes
+
+
+def build_course_change(
+    course: dict, op: str, generation: int | None, changes: dict | None = None
+) -> dict:
+    """Build a course_changes entry; `seq` and `created_at` are set when logged."""
+    change = {
+        "academic_year": course["academic_year"],
+        "academic_semester": course["academic_semester"],
+        "course_code": course["course_code"],
+        "op": op,
+        "generation": generation,
+    }
+    if changes:
+        change["changes"] = changes
+    return change
 
-    basic_info = raw_basic.copy()
-    for key in ("class_time", "target_class", "target_grade", "enrollment_notes"):
-        basic_info[key] = normalize_no_data_value(basic_info.get(key))
 
-    return basic_info
+async def record_course_changes_async(changes: list[dict]) -> None:
+    """
+    Append entries to the course_changes log.
 
+    A block of sequence numbers is reserved from the `counters` collection
+    in one atomic $inc, so `seq` increases across runs and processes.
+    """
+    if not changes:
+        return
+    loop = asyncio.get_running_loop()
+    lock = _change_log_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        counter = await get_async_collection(COUNTERS_COLLECTION).find_one_and_update(
+            {"_id": COURSE_CHANGES_COLLECTION},
+            {"$inc": {"seq": len(changes)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        first_seq = counter["seq"] - len(changes) + 1
+        created_at = datetime.now(timezone.utc)
+        for offset, change in enumerate(changes):
+            change["seq"] = first_seq + offset
+            change["created_at"] = created_at
+        await get_async_collection(COURSE_CHANGES_COLLECTION).insert_many(
+            changes, ordered=True
+        )
 
-def course_term_exists(academic_year: str, academic_semester: str) -> bool:
-    """Return whether the merged courses collection already has this term."""
-    assert config.db_name, "DB_NAME must be set in .env file"
 
-    collection_name = get_collection_name("courses")
-    mydb = myclient[config.db_name]
-    collection = mydb[collection_name]
+async def get_course_changes_since_async(seq: int, limit: int = 1000) -> list[dict]:
+    """
+    Return course_changes entries with a sequence number above `seq`, oldest
+    first. Consumers pass the last `seq` they processed to sync incrementally.
+    """
+    cursor = (
+        get_async_collection(COURSE_CHANGES_COLLECTION)
+        .find({"seq": {"$gt": seq}}, {"_id": 0})
+        .sort("seq", 1)
+        .limit(limit)
+    )
+    return await cursor.to_list()
 
-    return (
-        collection.count_documents(
+
+def get_course_changes_since(seq: int, limit: int = 1000) -> list[dict]:
+    """Sync wrapper of get_course_changes_since_async."""
+    return run_sync(get_course_changes_since_async(seq, limit))
+
+
+async def save_enrollment_points_async(records: list[CourseRecord]) -> int:
+    """
+    Insert the enrollment points of `records` that are newer than the latest
+    point stored for each course. Returns the number of points inserted.
+
+    Points are inserted in course and date order with an ordered write, so
+    after a partial failure every course's stored points are still a prefix
+    of its history and the next save fills in the rest.
+    """
+    collection = get_async_collection(ENROLLMENT_HISTORY_COLLECTION)
+    by_term: dict[tuple[int, int], list[CourseRecord]] = {}
+    for record in records:
+        if record.selection_records:
+            by_term.setdefault(
+                (record.academic_year, record.academic_semester), []
+            ).append(record)
+
+    points: list[dict] = []
+    for (academic_year, academic_semester), term_records in by_term.items():
+        cursor = await collection.aggregate(
+            latest_enrollment_dates_pipeline(
+                academic_year,
+                academic_semester,
+                [record.course_code for record in term_records],
+            )
+        )
+        latest = {item["_id"]: item["latest"] async for item in cursor}
+        for record in term_records:
+            stored = latest.get(record.course_code)
+            if stored is not None and stored.tzinfo is None:
+                stored = stored.replace(tzinfo=timezone.utc)
+            points += [
+                point
+                for point in record.enrollment_points()
+                if stored is None or point["date"] > stored
+            ]
+
+    if points:
+        await collection.insert_many(points, ordered=True)
+    return len(points)
+
+
+async def get_enrollment_history_async(
+    academic_year: str, academic_semester: str, course_code: str
+) -> list[dict]:
+    """
+    Rebuild a course's enrollment history from enrollment_history, oldest
+    first, as {date, enrolled, remaining, registered} dicts.
+    """
+    cursor = (
+        get_async_collection(ENROLLMENT_HISTORY_COLLECTION)
+        .find(
             {
-                "academic_year": int(academic_year),
-                "academic_semester": int(academic_semester),
+                "course.academic_year": int(academic_year),
+                "course.academic_semester": int(academic_semester),
+                "course.course_code": course_code,
             },
-            limit=1,
+            {"_id": 0, "date": 1, "enrolled": 1, "remaining": 1, "registered": 1},
         )
-        > 0
+        .sort("date", 1)
+    )
+    return await cursor.to_list()
+
+
+def get_enrollment_history(
+    academic_year: str, academic_semester: str, course_code: str
+) -> list[dict]:
+    """Sync wrapper of get_enrollment_history_async."""
+    return run_sync(
+        get_enrollment_history_async(academic_year, academic_semester, course_code)
+    )
+
+
+async def save_merged_course_batch_async(
+    records: list[CourseRecord],
+    existing_hashes: dict[str, str] | None = None,
+    generation: int | None = None,
+) -> CourseWriteCounts | None:
+    """
+    Upsert one batch of merged course records into the courses collection.
+
+    Each document stores a `content_hash`. With `existing_hashes` (from
+    get_term_content_hashes), documents whose hash is unchanged are not
+    written; the dict is updated with the hashes written. With `generation`,
+    written documents get `crawl_generation` (and `created_generation` when
+    inserted) and unchanged ones have their `crawl_generation` bumped in the
+    same bulk write. New and changed courses are appended to the
+    course_changes log once written, and their enrollment points newer than
+    the stored ones go to enrollment_history. Returns the new / changed / unchanged
+    counts, or None when the batch failed.
+    """
+    counts = CourseWriteCounts()
+    if not records:
+        return counts
+    if existing_hashes is None:
+        existing_hashes = {}
+
+    try:
+        collection = get_async_collection("courses")
+        ops: list[Any] = []
+        written_hashes: dict[str, str] = {}
+        unchanged_by_term: dict[tuple[int, int], list[str]] = {}
+        inserted: list[dict] = []
+        changed_by_term: dict[tuple[int, int], dict[str, dict]] = {}
+        written_records: list[CourseRecord] = []
+        for record in records:
+            document = record.to_document()
+            content_hash = compute_content_hash(document)
+            previous_hash = existing_hashes.get(document["course_code"])
+            if previous_hash == content_hash:
+                counts.unchanged += 1
+                unchanged_by_term.setdefault(
+                    (document["academic_year"], document["academic_semester"]), []
+                ).append(document["course_code"])
+                continue
+            if previous_hash is None:
+                counts.new += 1
+                inserted.append(document)
+            else:
+                counts.changed += 1
+                changed_by_term.setdefault(
+                    (document["academic_year"], document["academic_semester"]), {}
+                )[document["course_code"]] = document
+
+            written_records.append(record)
+            document["content_hash"] = content_hash
+            written_hashes[document["course_code"]] = content_hash
+            update: dict[str, Any] = {"$set": document}
+            if generation is not None:
+                document["crawl_generation"] = generation
+                update["$setOnInsert"] = {"created_generation": generation}
+            ops.append(UpdateOne(record.term_filter(), update, upsert=True))
+
+        if generation is not None:
+            for (academic_year, academic_semester), codes in unchanged_by_term.items():
+                ops.append(
+                    UpdateMany(
+                        {
+                            "academic_year": academic_year,
+                            "academic_semester": academic_semester,
+                            "course_code": {"$in": codes},
+                        },
+                        {"$set": {"crawl_generation": generation}},
+                    )
+                )
+
+        # Stored versions of changed courses, read before they are overwritten.
+        previous_documents: list[dict] = []
+        for (academic_year, academic_semester), documents in changed_by_term.items():
+            previous_documents += await collection.find(
+                {
+                    "academic_year": academic_year,
+                    "academic_semester": academic_semester,
+                    "course_code": {"$in": list(documents)},
+                },
+                {"_id": 0},
+            ).to_list()
+
+        # Before the course write, so a batch that fails is crawled again on
+        # the next run and only its missing points are inserted.
+        point_count = await save_enrollment_points_async(written_records)
+        if point_count:
+            logger.info(f"Inserted {point_count} enrollment history points")
+
+        if ops:
+            write_counts = await bulk_write_chunked_async(collection, ops)
+            logger.info(f"Write {write_counts}")
+        existing_hashes.update(written_hashes)
+    except Exception as e:
+        logger.error(f"Error saving merged course batch to DB: {e}")
+        return None
+
+    changes = [build_course_change(document, "insert", generation) for document in inserted]
+    for previous in previous_documents:
+        document = changed_by_term[
+            (previous["academic_year"], previous["academic_semester"])
+        ][previous["course_code"]]
+        field_changes = diff_course_documents(previous, document)
+        if field_changes:
+            changes.append(
+                build_course_change(document, "update", generation, field_changes)
+            )
+    try:
+        await record_course_changes_async(changes)
+    except Exception as e:
+        # The courses are written; only downstream change notifications are lost.
+        logger.error(f"Error recording {len(changes)} course changes: {e}")
+    return counts
+
+
+def save_merged_course_batch(
+    records: list[CourseRecord],
+    existing_hashes: dict[str, str] | None = None,
+    generation: int | None = None,
+) -> CourseWriteCounts | None:
+    """Sync wrapper of save_merged_course_batch_async."""
+    return run_sync(
+        save_merged_course_batch_async(records, existing_hashes, generation)
     )
 
 
-def save_merged_courses_to_db(df: pd.DataFrame) -> None:
+async def delete_stale_courses_async(
+    academic_year: str, academic_semester: str, generation: int
+) -> int:
+    """
+    Delete courses of a term that the crawl of `generation` did not see,
+    i.e. that are no longer in the open-data CSV. Deleted courses are
+    appended to the course_changes log.
+    """
+    collection = get_async_collection("courses")
+    stale_filter = {
+        "academic_year": int(academic_year),
+        "academic_semester": int(academic_semester),
+        "crawl_generation": {"$ne": generation},
+    }
+    stale_courses = await collection.find(
+        stale_filter,
+        {"_id": 0, "academic_year": 1, "academic_semester": 1, "course_code": 1},
+    ).to_list()
+    if not stale_courses:
+        return 0
+
+    delete_result = await collection.delete_many(stale_filter)
+    logger.info(
+        f"Deleted {delete_result.deleted_count} stale documents from {collection.name}"
+    )
+    try:
+        await record_course_changes_async(
+            [build_course_change(course, "delete", generation) for course in stale_courses]
+        )
+    except Exception as e:
+        logger.error(f"Error recording {len(stale_courses)} course deletions: {e}")
+    return delete_result.deleted_count
+
+
+def delete_stale_courses(
+    academic_year: str, academic_semester: str, generation: int
+) -> int:
+    """Sync wrapper of delete_stale_courses_async."""
+    return run_sync(
+        delete_stale_courses_async(academic_year, academic_semester, generation)
+    )
+
+
+async def save_merged_courses_to_db_async(
+    df: pd.DataFrame, skip_codes: set[str] | None = None
+) -> bool:
     """
     將合併後的完整課程資料 (Info + Detail) 寫入 MongoDB
     資料表名稱預設為: courses (或 courses_dev)
+
+    `skip_codes` are kept in the term (not deleted as stale) but not rewritten,
+    e.g. courses whose detail page has not changed since the previous run.
+    Returns whether the save succeeded.
     """
     if df.empty:
         logger.error("Merged course DataFrame is empty")
-        return
+        return False
 
-    assert config.db_name, "DB_NAME must be set in .env file"
+    skip_codes = skip_codes or set()
 
     try:
         # 使用新的集合名稱，例如 'courses' 來存放完整的資料
         collection_name = get_collection_name("courses")
         logger.info(f"Saving merged courses to DB (collection: {collection_name})...")
 
-        mydb = myclient[config.db_name]
-        collection = mydb[collection_name]
-
-        ensure_course_term_index(collection)
+        await prepare_courses_collection_async()
 
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
         term_filter = get_df_term_filter(df)
-        current_codes = df["course_code"].tolist()
-        delete_result = collection.delete_many(
-            {**term_filter, "course_code": {"$nin": current_codes}}
-        )
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
+        academic_year = str(term_filter["academic_year"])
+        academic_semester = str(term_filter["academic_semester"])
+        generation = new_crawl_generation()
 
-        ops = []
         # 將 DataFrame 轉為 dict 列表，逐筆處理
-        records = df.to_dict(orient="records")
-
-        for row in records:
-            # 1. 處理 grading_items (巢狀結構清理)
-            raw_grading = row.get("grading_items")
-            grading_items = []
-            if isinstance(raw_grading, list):
-                for item in raw_grading:
-                    percentage = item.get("percentage", "")
-                    # 嘗試將百分比轉為數字，保留原始邏輯
-                    if str(percentage).isdigit():
-                        percentage = int(percentage)
-
-                    grading_items.append(
-                        {
-                            "method": item.get("method", ""),
-                            "percentage": percentage,
-                            "description": item.get("description", ""),
-                        }
-                    )
-
-            # 2. 處理 teachers (確保是 list)
-            raw_teachers = row.get("teachers")
-            teachers = raw_teachers if isinstance(raw_teachers, list) else []
-
-            # 3. 處理 selection_records
-            raw_selection = row.get("selection_records")
-            selection_records = raw_selection if isinstance(raw_selection, list) else []
-
-            # 4. 處理 basic_info (確保是 dict)
-            basic_info = normalize_basic_info(row.get("basic_info"))
-
-            # 5. 處理其他可能為 NaN 的欄位 (因為 Left Join 可能產生 NaN)
-            def clean_nan(val, default):
-                # 檢查是否為 float('nan') 或 None
-                if val is None:
-                    return default
-                if isinstance(val, float) and math.isnan(val):
-                    return default
-                return val
-
-            # 建構最終要寫入的 Document
-            # 先複製所有欄位，然後覆蓋掉處理過的複雜欄位
-            document = row.copy()
-            document["academic_year"] = int(row["academic_year"])
-            document["academic_semester"] = int(row["academic_semester"])
-
-            # 覆蓋處理過的欄位
-            document["grading_items"] = grading_items
-            document["teachers"] = teachers
-            document["selection_records"] = selection_records
-            document["basic_info"] = basic_info
-
-            # 清理其他關鍵欄位
-            document["is_closed"] = clean_nan(row.get("is_closed"), False)
-            document["teaching_goal"] = clean_nan(row.get("teaching_goal"), "")
-            document["course_description"] = clean_nan(
-                row.get("course_description"), ""
-            )
+        records = [
+            CourseRecord.from_row(row)
+            for row in df.to_dict(orient="records")
+            if row["course_code"] not in skip_codes
+        ]
+        existing_hashes = await get_term_content_hashes_async(
+            academic_year, academic_semester
+        )
+        counts = await save_merged_course_batch_async(
+            records, existing_hashes, generation
+        )
+        if counts is None:
+            return False
+        await touch_course_generation_async(
+            academic_year, academic_semester, skip_codes, generation
+        )
 
-            # 加入批次操作
-            ops.append(
-                UpdateOne(
-                    get_course_term_filter(row), {"$set": document}, upsert=True
-                )
-            )
+        # 切換讀取的 generation，再刪除不在目前資料中的舊資料 (Sync)
+        await commit_term_generation_async(academic_year, academic_semester, generation)
+        await delete_stale_courses_async(academic_year, academic_semester, generation)
 
-        # 執行批次寫入
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        logger.info(
+            f"Courses: {counts.new} new, {counts.changed} changed, "
+            f"{counts.unchanged + len(skip_codes)} unchanged"
+        )
 
         logger.info(
             f"Success saving merged courses to DB (collection: {collection_name})"
         )
+        return True
 
     except Exception as e:
         logger.error(f"Error saving merged courses to DB: {e}")
@@ -308,9 +768,45 @@ def save_merged_courses_to_db(df: pd.DataFrame) -> None:
         import traceback
 
         traceback.print_exc()
+        return False
 
 
-def save_course_schedule_to_db(df: pd.DataFrame) -> None:
+def save_merged_courses_to_db(
+    df: pd.DataFrame, skip_codes: set[str] | None = None
+) -> bool:
+    """Sync wrapper of save_merged_courses_to_db_async."""
+    return run_sync(save_merged_courses_to_db_async(df, skip_codes))
+
+
+async def replace_documents_async(
+    collection,
+    keyed_documents: Iterable[tuple[dict, dict]],
+    scope: Optional[dict] = None,
+) -> None:
+    """
+    Upsert `(filter, document)` pairs stamped with a new crawl generation,
+    then delete the documents in `scope` that this write did not stamp.
+
+    Deleting after the upserts means readers never see the table emptied
+    out between the two steps, and a failed write raises before anything is
+    deleted. The delete filter stays small however many rows are current.
+    """
+    generation = new_crawl_generation()
+    ops = [
+        UpdateOne(key, {"$set": {**document, "crawl_generation": generation}}, upsert=True)
+        for key, document in keyed_documents
+    ]
+    if ops:
+        write_counts = await bulk_write_chunked_async(collection, ops)
+        logger.info(f"Write {write_counts}")
+
+    delete_result = await collection.delete_many(
+        {**(scope or {}), "crawl_generation": {"$ne": generation}}
+    )
+    logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection.name}")
+
+
+async def save_course_schedule_to_db_async(df: pd.DataFrame) -> None:
     """
     將 course_schedule DataFrame 寫入 MongoDB 資料庫
     """
@@ -320,42 +816,46 @@ def save_course_schedule_to_db(df: pd.DataFrame) -> None:
     try:
         collection_name = get_collection_name("course_schedule")
         logger.info(f"Saving course schedule to DB (collection: {collection_name})...")
-        mydb = myclient[config.db_name]
+        mydb = get_async_database()
         collection = mydb[collection_name]
 
-        collection.create_index("id")
+        await collection.create_index("id")
 
         if df.empty:
             logger.warning("Course schedule DataFrame is empty, skipping save.")
             return
 
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
-        current_ids = df["id"].tolist()
-        delete_result = collection.delete_many({"id": {"$nin": current_ids}})
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
-
-        # 新增新資料
+        # 寫入新資料後刪除這次沒寫到的舊資料
         records = df.to_dict(orient="records")
-        ops = []
-        for record in records:
-            ops.append(
-                UpdateOne({"id": record["id"]}, {"$set": record}, upsert=True)
-            )
-
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        await replace_documents_async(
+            collection, (({"id": record["id"]}, record) for record in records)
+        )
 
         logger.info(
             f"Success saving course schedule to DB (collection: {collection_name})"
         )
     except Exception as e:
         logger.error(f"Error saving course schedule to DB: {e}")
+        raise
 
 
-def save_course_info_to_db(df: pd.DataFrame) -> None:
+def save_course_schedule_to_db(df: pd.DataFrame) -> None:
+    """Sync wrapper of save_course_schedule_to_db_async."""
+    run_sync(save_course_schedule_to_db_async(df))
+
+
+async def get_course_schedule_async() -> list[dict]:
+    """Return the stored course selection schedule in page order."""
+    cursor = get_async_collection("course_schedule").find({}, {"_id": 0}).sort("id", 1)
+    return await cursor.to_list()
+
+
+def get_course_schedule() -> list[dict]:
+    """Sync wrapper of get_course_schedule_async."""
+    return run_sync(get_course_schedule_async())
+
+
+async def save_course_info_to_db_async(df: pd.DataFrame) -> None:
     """
     將 course_info DataFrame 寫入 MongoDB 資料庫
     """
@@ -369,39 +869,32 @@ def save_course_info_to_db(df: pd.DataFrame) -> None:
     try:
         collection_name = get_collection_name("course_info")
         logger.info(f"Saving course info to DB (collection: {collection_name})...")
-        mydb = myclient[config.db_name]
+        mydb = get_async_database()
         collection = mydb[collection_name]
-        ensure_course_term_index(collection)
-
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
-        term_filter = get_df_term_filter(df)
-        current_codes = df["course_code"].tolist()
-        delete_result = collection.delete_many(
-            {**term_filter, "course_code": {"$nin": current_codes}}
-        )
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
+        await ensure_course_term_index_async()
 
-        ops = []
         records = df.to_dict(orient="records")
-
         for record in records:
             record["academic_year"] = int(record["academic_year"])
             record["academic_semester"] = int(record["academic_semester"])
-            ops.append(
-                UpdateOne(get_course_term_filter(record), {"$set": record}, upsert=True)
-            )
 
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        # 寫入新資料後刪除這次沒寫到的舊資料
+        await replace_documents_async(
+            collection,
+            ((get_course_term_filter(record), record) for record in records),
+            get_df_term_filter(df),
+        )
         logger.info(f"Success saving course info to DB (collection: {collection_name})")
     except Exception as e:
         logger.error(f"Error saving course info to DB: {e}")
 
 
-def save_course_detail_to_db(df: pd.DataFrame) -> None:
+def save_course_info_to_db(df: pd.DataFrame) -> None:
+    """Sync wrapper of save_course_info_to_db_async."""
+    run_sync(save_course_info_to_db_async(df))
+
+
+async def save_course_detail_to_db_async(df: pd.DataFrame) -> None:
     """
     將 course_detail DataFrame（已包含巢狀結構）寫入 MongoDB 資料庫
     """
@@ -415,20 +908,12 @@ def save_course_detail_to_db(df: pd.DataFrame) -> None:
     try:
         collection_name = get_collection_name("course_detail")
         logger.info(f"Saving course detail to DB (collection: {collection_name})...")
-        mydb = myclient[config.db_name]
+        mydb = get_async_database()
         collection = mydb[collection_name]
 
-        ensure_course_term_index(collection)
+        await ensure_course_term_index_async()
 
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
-        term_filter = get_df_term_filter(df)
-        current_codes = df["course_code"].tolist()
-        delete_result = collection.delete_many(
-            {**term_filter, "course_code": {"$nin": current_codes}}
-        )
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
-
-        ops = []
+        documents = []
         records = df.to_dict(orient="records")
 
         for row in records:
@@ -472,19 +957,10 @@ def save_course_detail_to_db(df: pd.DataFrame) -> None:
                 "basic_info": normalize_basic_info(row.get("basic_info")),
             }
 
-            ops.append(
-                UpdateOne(
-                    get_course_term_filter(row),
-                    {"$set": document},
-                    upsert=True,
-                )
-            )
+            documents.append((get_course_term_filter(row), document))
 
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        # 寫入新資料後刪除這次沒寫到的舊資料
+        await replace_documents_async(collection, documents, get_df_term_filter(df))
 
         logger.info(
             f"Success saving course detail to DB (collection: {collection_name})"
@@ -493,7 +969,12 @@ def save_course_detail_to_db(df: pd.DataFrame) -> None:
         logger.error(f"Error saving course detail to DB: {e}")
 
 
-def save_department_categories_to_db(df: pd.DataFrame) -> None:
+def save_course_detail_to_db(df: pd.DataFrame) -> None:
+    """Sync wrapper of save_course_detail_to_db_async."""
+    run_sync(save_course_detail_to_db_async(df))
+
+
+async def save_department_categories_to_db_async(df: pd.DataFrame) -> None:
     """
     將 department_categories DataFrame 寫入 MongoDB 資料庫
     """
@@ -508,44 +989,27 @@ def save_department_categories_to_db(df: pd.DataFrame) -> None:
         logger.info(
             f"Saving department categories to DB (collection: {collection_name})..."
         )
-        mydb = myclient[config.db_name]
+        mydb = get_async_database()
         collection = mydb[collection_name]
 
         # 建立索引
         try:
-            collection.create_index("category_code", unique=True)
+            await collection.create_index("category_code", unique=True)
         except pymongo.errors.OperationFailure as e:
             if e.code == 86:  # IndexKeySpecsConflict
                 logger.warning(
                     f"Index conflict detected in {collection_name}. Dropping existing index 'category_code_1' and recreating."
                 )
-                collection.drop_index("category_code_1")
-                collection.create_index("category_code", unique=True)
+                await collection.drop_index("category_code_1")
+                await collection.create_index("category_code", unique=True)
             else:
                 raise e
 
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
-        current_codes = df["category_code"].tolist()
-        delete_result = collection.delete_many({"category_code": {"$nin": current_codes}})
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
-
-        ops = []
+        # 寫入新資料後刪除這次沒寫到的舊資料
         records = df.to_dict(orient="records")
-
-        for record in records:
-            ops.append(
-                UpdateOne(
-                    {"category_code": record["category_code"]},
-                    {"$set": record},
-                    upsert=True,
-                )
-            )
-
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        await replace_documents_async(
+            collection, (({"category_code": record["category_code"]}, record) for record in records)
+        )
 
         logger.info(
             f"Success saving department categories to DB (collection: {collection_name})"
@@ -555,9 +1019,15 @@ def save_department_categories_to_db(df: pd.DataFrame) -> None:
         import traceback
 
         traceback.print_exc()
+        raise
 
 
-def save_departments_to_db(df: pd.DataFrame) -> None:
+def save_department_categories_to_db(df: pd.DataFrame) -> None:
+    """Sync wrapper of save_department_categories_to_db_async."""
+    run_sync(save_department_categories_to_db_async(df))
+
+
+async def save_departments_to_db_async(df: pd.DataFrame) -> None:
     """
     將 departments DataFrame 寫入 MongoDB 資料庫
     """
@@ -570,45 +1040,28 @@ def save_departments_to_db(df: pd.DataFrame) -> None:
     try:
         collection_name = get_collection_name("departments")
         logger.info(f"Saving departments to DB (collection: {collection_name})...")
-        mydb = myclient[config.db_name]
+        mydb = get_async_database()
         collection = mydb[collection_name]
 
         # 建立索引
         try:
-            collection.create_index("department_code", unique=True)
+            await collection.create_index("department_code", unique=True)
         except pymongo.errors.OperationFailure as e:
             if e.code == 86:  # IndexKeySpecsConflict
                 logger.warning(
                     f"Index conflict detected in {collection_name}. Dropping existing index 'department_code_1' and recreating."
                 )
-                collection.drop_index("department_code_1")
-                collection.create_index("department_code", unique=True)
+                await collection.drop_index("department_code_1")
+                await collection.create_index("department_code", unique=True)
             else:
                 raise e
-        collection.create_index("category_code")  # 方便按分類查詢
-
-        # 1. 刪除不在目前資料中的舊資料 (Sync)
-        current_codes = df["department_code"].tolist()
-        delete_result = collection.delete_many({"department_code": {"$nin": current_codes}})
-        logger.info(f"Deleted {delete_result.deleted_count} stale documents from {collection_name}")
+        await collection.create_index("category_code")  # 方便按分類查詢
 
-        ops = []
+        # 寫入新資料後刪除這次沒寫到的舊資料
         records = df.to_dict(orient="records")
-
-        for record in records:
-            ops.append(
-                UpdateOne(
-                    {"department_code": record["department_code"]},
-                    {"$set": record},
-                    upsert=True,
-                )
-            )
-
-        if ops:
-            result = collection.bulk_write(ops)
-            logger.info(
-                f"Write Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_count}"
-            )
+        await replace_documents_async(
+            collection, (({"department_code": record["department_code"]}, record) for record in records)
+        )
 
         logger.info(f"Success saving departments to DB (collection: {collection_name})")
     except Exception as e:
@@ -616,3 +1069,9 @@ def save_departments_to_db(df: pd.DataFrame) -> None:
         import traceback
 
         traceback.print_exc()
+        raise
+
+
+def save_departments_to_db(df: pd.DataFrame) -> None:
+    """Sync wrapper of save_departments_to_db_async."""
+    run_sync(save_departments_to_db_async(df))
@@ -1,64 +1,264 @@
+import argparse
+import asyncio
+import importlib
+import signal
 import sys
-import subprocess
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from config import get_config
+from utils.pipeline import Stage, run_stages
+from utils.selection_schedule import (
+    SelectionWindow,
+    next_wake,
+    now_in_taipei,
+    open_window,
+    parse_selection_windows,
+)
 from utils.logger import setup_logger, get_logger
 
 setup_logger()
 logger = get_logger(__name__)
 
 
-def main() -> None:
-    """主函數 - 執行所有爬蟲任務"""
-    logger.info("[main] Starting crawling tasks")
+def crawler_main(module_name: str, **kwargs: Any) -> Callable[[], Awaitable[Any]]:
+    """
+    Run `module_name.main(**kwargs)`, importing the crawler only when its
+    stage starts.
 
-    try:
-        # --- 1. 執行選課時間表爬蟲 ---
-        logger.info("[main] 1. Executing crawl_schedule.py...")
-        result_schedule = subprocess.run(
-            [sys.executable, "crawl_schedule.py"],
-            capture_output=False,
-            text=True,
-        )
+    Stages left out by --only / --skip never pay for pandas, bs4 and the
+    parser modules. The import runs in a worker thread so it does not stall
+    stages that are already crawling.
+    """
 
-        if result_schedule.returncode == 0:
-            logger.info("[main] 1. Done")
-        else:
-            logger.error(f"Schedule crawling failed: {result_schedule.stderr}")
-            return
-
-        # --- 2. 執行系所爬蟲 ---
-        logger.info("[main] 2. Executing crawl_departments.py...")
-        result_departments = subprocess.run(
-            [sys.executable, "crawl_departments.py"],
-            capture_output=False,
-            text=True,
-        )
+    async def run() -> Any:
+        module = await asyncio.to_thread(importlib.import_module, module_name)
+        return await module.main(**kwargs)
 
-        if result_departments.returncode == 0:
-            logger.info("[main] 2. Done")
-        else:
-            logger.error(f"Departments crawling failed: {result_departments.stderr}")
-            return
-
-        # --- 3. 執行課程爬蟲（資訊+詳細資訊） ---
-        logger.info("[main] 3. Executing crawl_course.py...")
-        result_course = subprocess.run(
-            [sys.executable, "crawl_course.py"],
-            capture_output=False,
-            text=True,
-        )
+    return run
+
+
+def build_stages(stop_event: Optional[asyncio.Event] = None) -> list[Stage]:
+    """
+    The crawler stages. With `stop_event`, the course crawl stops when it is
+    set instead of handling signals itself.
+    """
+    course_kwargs = {} if stop_event is None else {"stop_event": stop_event}
+    # The schedule, department and course crawls do not read each other's
+    # results, so they run concurrently. crawl_departments and crawl_course
+    # share the term CSV download through utils.open_data.
+    return [
+        Stage("crawl_schedule", crawler_main("crawl_schedule")),
+        Stage("crawl_departments", crawler_main("crawl_departments")),
+        Stage("crawl_course", crawler_main("crawl_course", **course_kwargs)),
+    ]
+
+
+STAGES = build_stages()
+
+# Refreshed on every daemon poll while a selection window is open.
+ACTIVE_STAGES = ("crawl_schedule", "crawl_course")
 
-        if result_course.returncode == 0:
-            logger.info("[main] 3. Done")
-        else:
-            logger.error(f"Course crawling failed: {result_course.stderr}")
-            return
+
+async def close_resources() -> None:
+    from utils.http_client import close_http_client
+    from utils.parse_pool import close_parse_pool
+    from utils.storage import close_storage
+
+    close_parse_pool()
+    await close_http_client()
+    await close_storage()
+
+
+async def main(
+    only: Optional[Iterable[str]] = None, skip: Optional[Iterable[str]] = None
+) -> bool:
+    """
+    主函數 - 執行所有爬蟲任務
+
+    The crawlers run as stages of one dependency graph in this process and
+    share one pooled HTTP client. Returns whether every selected stage
+    succeeded.
+    """
+    # Fail on a bad .env before any stage starts.
+    get_config()
+    logger.info("[main] Starting crawling tasks")
+
+    try:
+        if not await run_cycle(STAGES, only, skip):
+            return False
 
         logger.info("[main] All crawling tasks completed.")
+        return True
 
     except Exception as e:
         logger.error(f"爬蟲任務執行失敗: {e}")
         raise
+    finally:
+        await close_resources()
+
+
+async def run_cycle(
+    stages: list[Stage],
+    only: Optional[Iterable[str]] = None,
+    skip: Optional[Iterable[str]] = None,
+) -> bool:
+    results = await run_stages(stages, only, skip)
+    failed = [result.name for result in results.values() if result.status != "ok"]
+    if failed:
+        logger.error(f"[main] Stages did not finish: {', '.join(failed)}")
+    return not failed
+
+
+async def run_daemon() -> None:
+    """
+    常駐模式 - 依選課時間表排程爬蟲
+
+    Runs a full sync at start and every DAEMON_IDLE_INTERVAL seconds. While
+    a selection window of the stored course_schedule is open, the schedule
+    and courses are refreshed every DAEMON_ACTIVE_INTERVAL seconds.
+    Connections are warmed DAEMON_WARMUP_LEAD seconds before a window opens.
+    The HTTP client, storage clients, parse workers and imported crawlers
+    stay resident between cycles. SIGTERM / SIGINT stop it after the running
+    crawl has flushed its results.
+    """
+    config = get_config()
+    active_interval = timedelta(seconds=config.daemon_active_interval)
+    idle_interval = timedelta(seconds=config.daemon_idle_interval)
+    warmup_lead = timedelta(seconds=config.daemon_warmup_lead)
+
+    stop_event = asyncio.Event()
+    install_stop_handlers(stop_event)
+    stages = build_stages(stop_event)
+    next_full_sync = now_in_taipei()
+    logger.info("[daemon] Starting schedule-aware crawler daemon")
+
+    try:
+        while not stop_event.is_set():
+            started = now_in_taipei()
+            window = open_window(await load_selection_windows(), started, active_interval)
+            if started >= next_full_sync:
+                logger.info("[daemon] Running full sync")
+                succeeded = await run_cycle(stages)
+                # Retry a failed full sync at the active pace, not hours later.
+                next_full_sync = (
+                    started + idle_interval
+                    if succeeded
+                    else now_in_taipei() + active_interval
+                )
+            elif window is not None:
+                logger.info(
+                    f"[daemon] {window.stage} open until {window.end:%Y-%m-%d %H:%M}; "
+                    "refreshing enrollment"
+                )
+                await run_cycle(stages, only=ACTIVE_STAGES)
+            if stop_event.is_set():
+                break
+
+            # Read again: the cycle may have saved a new schedule.
+            wake = next_wake(
+                await load_selection_windows(),
+                now_in_taipei(),
+                next_full_sync,
+                active_interval,
+            )
+            if wake.opening is not None:
+                logger.info(
+                    f"[daemon] {wake.opening.stage} opens at {wake.at:%Y-%m-%d %H:%M}"
+                )
+                if not await sleep_until(wake.at - warmup_lead, stop_event):
+                    break
+                await warm_up()
+            else:
+                logger.info(f"[daemon] Next cycle at {wake.at:%Y-%m-%d %H:%M:%S}")
+            if not await sleep_until(wake.at, stop_event):
+                break
+    finally:
+        await close_resources()
+    logger.info("[daemon] Stopped")
+
+
+def install_stop_handlers(stop_event: asyncio.Event) -> None:
+    """
+    Set `stop_event` on the first SIGTERM / SIGINT; a second signal falls
+    back to the default behavior.
+    """
+    loop = asyncio.get_running_loop()
+
+    def request_stop(signum: signal.Signals) -> None:
+        logger.warning(
+            f"[daemon] Received {signum.name}; stopping after the running crawl "
+            "flushes (send again to force quit)"
+        )
+        stop_event.set()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(sig)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_stop, sig)
+
+
+async def load_selection_windows() -> list[SelectionWindow]:
+    from utils.storage import get_storage
+
+    try:
+        return parse_selection_windows(await get_storage().get_course_schedule())
+    except Exception as e:
+        logger.warning(f"[daemon] Could not read the course schedule: {e}")
+        return []
+
+
+async def sleep_until(moment: datetime, stop_event: asyncio.Event) -> bool:
+    """Sleep until `moment`; returns False when stopped first."""
+    delay = (moment - now_in_taipei()).total_seconds()
+    if delay > 0:
+        try:
+            await asyncio.wait_for(stop_event.wait(), delay)
+        except TimeoutError:
+            pass
+    return not stop_event.is_set()
+
+
+async def warm_up() -> None:
+    """Open the HTTP and storage connections so the first poll starts hot."""
+    from utils.http_client import get_http_client
+    from utils.storage import get_storage
+
+    config = get_config()
+    results = await asyncio.gather(
+        get_http_client().warm_up(f"{config.base_url}/"),
+        get_storage().warm_up(),
+        return_exceptions=True,
+    )
+    failed = False
+    for name, result in zip(("http", "storage"), results):
+        if isinstance(result, Exception):
+            failed = True
+            logger.warning(f"[daemon] Could not warm up {name} connections: {result}")
+    if not failed:
+        logger.info("[daemon] Connections warmed up")
 
 
 if __name__ == "__main__":
-    main()
+    stage_names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the THU course crawlers")
+    parser.add_argument(
+        "--only", nargs="+", choices=stage_names, metavar="STAGE",
+        help=f"run only these stages ({', '.join(stage_names)})",
+    )
+    parser.add_argument(
+        "--skip", nargs="+", choices=stage_names, metavar="STAGE",
+        help="skip these stages",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="stay resident and crawl around the stored course selection schedule",
+    )
+    args = parser.parse_args()
+    if args.daemon:
+        if args.only or args.skip:
+            parser.error("--daemon cannot be combined with --only / --skip")
+        asyncio.run(run_daemon())
+    elif not asyncio.run(main(args.only, args.skip)):
+        sys.exit(1)
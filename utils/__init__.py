@@ -1,3 +1,4 @@
 # Utils package for THU Course Crawler
-
-from . import course_utils, dataframe_utils
+#
+# Submodules are imported where they are used, so `import utils.logger`
+# does not pull in pandas and the HTTP client.
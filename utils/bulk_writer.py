@@ -0,0 +1,199 @@
+"""
+Chunked, unordered MongoDB bulk writes.
+
+Large operation lists are split into chunks of `chunk_size` and sent with
+`ordered=False` as concurrent tasks on the async client, so one failing
+document does not stop the rest and the server can apply a chunk's writes
+in any order. Chunks that hit a
+transient error (network errors, primary step-downs, retryable write
+errors) are retried with jittered exponential backoff.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from pymongo.errors import (
+    AutoReconnect,
+    BulkWriteError,
+    ConnectionFailure,
+    PyMongoError,
+)
+
+from config import config
+from utils.logger import get_logger
+from utils.retry import backoff_delay
+
+logger = get_logger(__name__)
+
+# Write errors worth retrying inside an unordered batch: shutdown / step-down
+# and write-conflict codes. Anything else (e.g. duplicate key, validation)
+# fails the same way on every attempt.
+TRANSIENT_WRITE_ERROR_CODES = {
+    91,  # ShutdownInProgress
+    112,  # WriteConflict
+    189,  # PrimarySteppedDown
+    10107,  # NotWritablePrimary
+    11600,  # InterruptedAtShutdown
+    11602,  # InterruptedDueToReplStateChange
+    13435,  # NotPrimaryNoSecondaryOk
+}
+
+
+@dataclass
+class BulkWriteCounts:
+    """Merged result counts of every chunk of a bulk write."""
+
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    inserted: int = 0
+    deleted: int = 0
+
+    def add_result(self, result: Any) -> None:
+        self.matched += result.matched_count
+        self.modified += result.modified_count
+        self.upserted += result.upserted_count
+        self.inserted += result.inserted_count
+        self.deleted += result.deleted_count
+
+    def add_details(self, details: dict) -> None:
+        """Add the counts of the writes that succeeded in a failed chunk."""
+        self.matched += details.get("nMatched", 0)
+        self.modified += details.get("nModified", 0)
+        self.upserted += details.get("nUpserted", 0)
+        self.inserted += details.get("nInserted", 0)
+        self.deleted += details.get("nRemoved", 0)
+
+    def merge(self, other: "BulkWriteCounts") -> None:
+        self.matched += other.matched
+        self.modified += other.modified
+        self.upserted += other.upserted
+        self.inserted += other.inserted
+        self.deleted += other.deleted
+
+    def __str__(self) -> str:
+        return (
+            f"Matched: {self.matched}, Modified: {self.modified}, "
+            f"Upserted: {self.upserted}"
+        )
+
+
+def is_transient_error(error: PyMongoError) -> bool:
+    """Whether retrying a chunk that raised `error` can succeed."""
+    if isinstance(error, BulkWriteError):
+        details = error.details or {}
+        write_errors = details.get("writeErrors", [])
+        if details.get("writeConcernErrors"):
+            return True
+        return bool(write_errors) and all(
+            item.get("code") in TRANSIENT_WRITE_ERROR_CODES for item in write_errors
+        )
+    if isinstance(error, (AutoReconnect, ConnectionFailure)):
+        return True
+    return error.has_error_label("RetryableWriteError")
+
+
+def _plan_retry(
+    error: PyMongoError,
+    pending: list[Any],
+    counts: BulkWriteCounts,
+    attempt: int,
+    max_retries: int,
+    label: str,
+) -> tuple[list[Any], float]:
+    """
+    Decide how to retry a failed chunk: return (operations to resend, delay),
+    or re-raise `error` when it is permanent or retries are exhausted.
+
+    On a partial BulkWriteError only the failed operations are resent;
+    unordered writes report them by index within the chunk. The counts of
+    the operations that went through are added to `counts`, unless the
+    whole chunk is resent after a write concern error, so a resent write is
+    only counted once.
+    """
+    retry = attempt <= max_retries and is_transient_error(error)
+    if isinstance(error, BulkWriteError):
+        details = error.details or {}
+        resend_all = bool(details.get("writeConcernErrors"))
+        if not retry or not resend_all:
+            counts.add_details(details)
+        if retry and not resend_all:
+            failed = {item["index"] for item in details.get("writeErrors", [])}
+            pending = [op for index, op in enumerate(pending) if index in failed]
+    if not retry:
+        raise error
+
+    delay = backoff_delay(attempt, config.retry_base_delay, config.retry_max_delay)
+    logger.warning(
+        f"[bulk_writer] {label}: transient error on {len(pending)} operations "
+        f"({error.__class__.__name__}); retry {attempt}/{max_retries} in {delay:.1f}s"
+    )
+    return pending, delay
+
+
+async def _write_chunk_async(
+    collection, ops: Sequence[Any], max_retries: int, label: str
+) -> BulkWriteCounts:
+    """Write one chunk, retrying transient failures."""
+    counts = BulkWriteCounts()
+    pending = list(ops)
+    attempt = 0
+    while True:
+        try:
+            counts.add_result(await collection.bulk_write(pending, ordered=False))
+            return counts
+        except PyMongoError as e:
+            attempt += 1
+            pending, delay = _plan_retry(e, pending, counts, attempt, max_retries, label)
+            await asyncio.sleep(delay)
+
+
+async def bulk_write_chunked_async(
+    collection,
+    ops: Sequence[Any],
+    chunk_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    max_retries: Optional[int] = None,
+) -> BulkWriteCounts:
+    """
+    Send `ops` as unordered bulk writes of at most `chunk_size` operations.
+
+    Up to `workers` chunks are in flight at once as tasks on the running
+    event loop. Every chunk is attempted even if another fails; the first
+    error is re-raised once all chunks are done. Defaults come from
+    BULK_WRITE_CHUNK_SIZE / BULK_WRITE_WORKERS / BULK_WRITE_MAX_RETRIES.
+    """
+    chunk_size = chunk_size or config.bulk_write_chunk_size
+    workers = workers or config.bulk_write_workers
+    max_retries = config.bulk_write_max_retries if max_retries is None else max_retries
+
+    counts = BulkWriteCounts()
+    if not ops:
+        return counts
+
+    chunks = [ops[start : start + chunk_size] for start in range(0, len(ops), chunk_size)]
+    label = collection.name
+    slots = asyncio.Semaphore(workers)
+
+    async def write(chunk: Sequence[Any]) -> BulkWriteCounts:
+        async with slots:
+            return await _write_chunk_async(collection, chunk, max_retries, label)
+
+    results = await asyncio.gather(
+        *(write(chunk) for chunk in chunks), return_exceptions=True
+    )
+    first_error: Optional[BaseException] = None
+    for result in results:
+        if isinstance(result, BaseException):
+            first_error = first_error or result
+        else:
+            counts.merge(result)
+
+    if first_error is not None:
+        logger.error(
+            f"[bulk_writer] {label}: {len(chunks)} chunks, at least one failed "
+            f"(completed chunks: {counts})"
+        )
+        raise first_error
+    return counts
@@ -0,0 +1,117 @@
+"""
+Append-only checkpoint journal for resumable course crawls.
+
+Each line is a JSON object. The first line records the crawl generation
+stamped on written courses, batch lines record course codes whose results
+were written to the database, and a term line marks a fully finished term:
+
+    {"generation": 1760000000000}
+    {"term": "115-1", "codes": ["0001", "0002"]}
+    {"term": "115-1", "done": true}
+
+A resumed run keeps the recorded generation, so courses written before the
+interruption are not treated as stale, and skips finished terms and courses
+that are already recorded.
+"""
+
+import json
+import os
+from typing import Iterable, Optional, TextIO
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CheckpointJournal:
+    """Records completed (term, course_code) results on local disk."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.completed: dict[str, set[str]] = {}
+        self.finished_terms: set[str] = set()
+        self.generation: Optional[int] = None
+        self._file: Optional[TextIO] = None
+
+    def open(self, resume: bool) -> None:
+        """
+        Open the journal for appending.
+
+        With `resume`, previous entries are loaded first; otherwise the
+        journal is truncated and the crawl starts from scratch.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume:
+            self._load()
+            logger.info(
+                f"[checkpoint] Resuming from {self.path}: "
+                f"{len(self.finished_terms)} finished terms, "
+                f"{sum(len(codes) for codes in self.completed.values())} completed courses"
+            )
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self) -> None:
+        try:
+            journal_file = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a hard kill; everything before it is valid.
+                    continue
+                if "generation" in entry:
+                    self.generation = entry["generation"]
+                    continue
+                term = entry.get("term")
+                if not term:
+                    continue
+                if entry.get("done"):
+                    self.finished_terms.add(term)
+                self.completed.setdefault(term, set()).update(entry.get("codes", ()))
+
+    def completed_codes(self, term: str) -> set[str]:
+        return self.completed.get(term, set())
+
+    def is_term_finished(self, term: str) -> bool:
+        return term in self.finished_terms
+
+    def record_courses(self, term: str, course_codes: Iterable[str]) -> None:
+        codes = list(course_codes)
+        if not codes:
+            return
+        self.completed.setdefault(term, set()).update(codes)
+        self._append({"term": term, "codes": codes})
+
+    def record_generation(self, generation: int) -> None:
+        self.generation = generation
+        self._append({"generation": generation})
+
+    def record_term_done(self, term: str) -> None:
+        self.finished_terms.add(term)
+        self._append({"term": term, "done": True})
+
+    def flush(self) -> None:
+        """Force journal entries to disk."""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def _append(self, entry: dict) -> None:
+        if self._file is None:
+            return
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.flush()
@@ -0,0 +1,196 @@
+"""
+Adaptive (AIMD) concurrency control for crawler HTTP requests.
+
+The controller raises the number of in-flight requests additively while the
+server answers quickly and without errors, and cuts it multiplicatively on
+throttling (429), server errors (5xx), timeouts or latency spikes. It also
+spaces request starts so the crawl never exceeds a requests-per-second cap.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from typing import Literal
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Outcome = Literal["ok", "throttled", "error", "timeout"]
+
+
+def classify_status(status: int) -> Outcome:
+    """Map an HTTP status to a controller outcome."""
+    if status == 429:
+        return "throttled"
+    if status >= 500:
+        return "error"
+    return "ok"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD limiter shared by all requests of a crawl.
+
+    Call `acquire` before sending a request and `release` with its latency and
+    outcome afterwards. The limit grows by `increase_step` after every
+    `window_size` healthy responses, and is multiplied by `decrease_factor` on
+    a bad response, at most once per `cooldown` seconds.
+
+    Waiting requests get free slots in `priority` order (lower first), FIFO
+    within the same priority.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: int = 3,
+        min_limit: int = 1,
+        max_requests_per_second: float = 0.0,
+        latency_target: float = 1.5,
+        latency_spike_factor: float = 3.0,
+        max_error_rate: float = 0.05,
+        window_size: int = 20,
+        increase_step: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown: float = 2.0,
+        name: str = "concurrency",
+    ) -> None:
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.max_requests_per_second = max_requests_per_second
+        self.latency_target = latency_target
+        self.latency_spike_factor = latency_spike_factor
+        self.max_error_rate = max_error_rate
+        self.window_size = window_size
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.name = name
+
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._waiter_sequence = itertools.count()
+        self._next_start = 0.0
+        self._latencies: deque[float] = deque(maxlen=window_size)
+        self._outcomes: deque[Outcome] = deque(maxlen=window_size)
+        self._samples_since_change = 0
+        self._last_decrease = 0.0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for a free slot and for the rate limit to allow a new request."""
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self._waiters, (priority, next(self._waiter_sequence), waiter)
+            )
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just before cancellation.
+                    self.in_flight -= 1
+                    self._wake_waiters()
+                raise
+
+        if self.max_requests_per_second > 0:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + 1 / self.max_requests_per_second
+            if start_at > now:
+                try:
+                    await asyncio.sleep(start_at - now)
+                except asyncio.CancelledError:
+                    self.in_flight -= 1
+                    self._wake_waiters()
+                    raise
+
+    def release(self, latency: float, outcome: Outcome) -> None:
+        """Record a finished request and adjust the limit."""
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        self._outcomes.append(outcome)
+        self._samples_since_change += 1
+
+        spike_threshold = self.latency_target * self.latency_spike_factor
+        if outcome != "ok":
+            self._decrease(f"{outcome} response")
+        elif latency > spike_threshold:
+            self._decrease(f"latency spike {latency:.2f}s > {spike_threshold:.2f}s")
+        elif self._samples_since_change >= self.window_size:
+            self._maybe_increase()
+
+        self._wake_waiters()
+
+    def release_cancelled(self) -> None:
+        """Free the slot of a request cancelled before it finished, without sampling it."""
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to waiting requests in priority order."""
+        while self._waiters and self.in_flight < self.current_limit:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _window_stats(self) -> tuple[float, float]:
+        p95 = percentile(list(self._latencies), 0.95)
+        errors = sum(1 for outcome in self._outcomes if outcome != "ok")
+        error_rate = errors / len(self._outcomes) if self._outcomes else 0.0
+        return p95, error_rate
+
+    def _maybe_increase(self) -> None:
+        p95, error_rate = self._window_stats()
+        self._samples_since_change = 0
+        if p95 > self.latency_target or error_rate > self.max_error_rate:
+            logger.info(
+                f"[{self.name}] Holding limit at {self.current_limit} "
+                f"(p95: {p95:.2f}s, error rate: {error_rate:.1%})"
+            )
+            return
+        if self.current_limit >= self.max_limit:
+            return
+
+        previous = self.current_limit
+        self.limit = min(self.max_limit, self.limit + self.increase_step)
+        logger.info(
+            f"[{self.name}] Increasing limit {previous} -> {self.current_limit} "
+            f"(p95: {p95:.2f}s, error rate: {error_rate:.1%})"
+        )
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._samples_since_change = 0
+
+        previous = self.current_limit
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        p95, error_rate = self._window_stats()
+        logger.warning(
+            f"[{self.name}] Decreasing limit {previous} -> {self.current_limit} "
+            f"after {reason} (p95: {p95:.2f}s, error rate: {error_rate:.1%})"
+        )
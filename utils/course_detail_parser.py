@@ -0,0 +1,620 @@
+"""
+Course detail page parsing.
+
+Everything in this module is pure: it takes raw page bytes and returns plain
+dicts, so it can run on the event loop or inside ProcessPoolExecutor workers.
+
+`parse_course_detail_page` walks the document once, builds a
+`DetailPageIndex` (label -> section text) and derives every field from it.
+The `extract_*` functions are the original per-field extractors; they are
+kept as the reference implementation that `check_parity` compares against.
+
+Run `python -m utils.course_detail_parser PAGE_DIR` to check parity over
+saved `*.html` pages; it exits with status 1 on a mismatch. The parser_parity
+workflow runs it for every backend over benchmarks/fixtures/detail_pages
+(live pages saved by benchmarks.detail_page_samples under real/, synthetic
+extra cases under mock/) and over a fresh sample of live pages.
+"""
+
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from bs4 import BeautifulSoup, ElementFilter
+from bs4.element import Tag
+
+NO_DATA_VALUES = {"", "無資料", "無", "未定", "None", "none", "N/A", "n/a"}
+PARSER_BACKENDS = ("html.parser", "lxml", "selectolax")
+
+WHITESPACE_RE = re.compile(r"\s+")
+TARGET_CLASS_SEPARATOR_RE = re.compile(r"\s*[·‧•]\s*")
+TARGET_GRADE_RE = re.compile(r"(?:\d+|[一二三四五六七八九十]+)年級(?:以上|以下)?")
+TEACHER_SEPARATOR_RE = re.compile(r"[/、,，]")
+SELECTION_TABLE_MARKER = "google.visualization.arrayToDataTable"
+SELECTION_TABLE_RE = re.compile(
+    r"google\.visualization\.arrayToDataTable\(\s*\[\s*([\s\S]*?)\s*\]\s*\)",
+    re.DOTALL,
+)
+SELECTION_ROW_RE = re.compile(
+    r"\[\s*'([^']+)'\s*,\s*(-?\d+)\s*,\s*(-?\d+)\s*,\s*(-?\d+)\s*\]"
+)
+
+
+def clean_text(element: Optional[Tag]) -> str:
+    """Return compact visible text from a BeautifulSoup element."""
+    if not element:
+        return ""
+    return WHITESPACE_RE.sub(" ", element.get_text(" ", strip=True)).strip()
+
+
+def text_after_label(text: str, label: str) -> str:
+    return WHITESPACE_RE.sub(" ", text.replace(label, "", 1)).strip()
+
+
+def extract_card_value(soup: BeautifulSoup, label: str) -> str:
+    for card in soup.select(".card"):
+        heading = card.select_one("h6.card-title")
+        if heading and label in heading.get_text(strip=True):
+            return text_after_label(clean_text(card.select_one(".card-body")), label)
+    return ""
+
+
+def normalize_source_value(value: str) -> str:
+    value = WHITESPACE_RE.sub(" ", value).strip()
+    return "" if value in NO_DATA_VALUES else value
+
+
+def split_target_class_and_grade(target_class: str) -> tuple[str, str]:
+    target_class = normalize_source_value(target_class)
+    if not target_class:
+        return "", ""
+
+    parts = [
+        normalize_source_value(part)
+        for part in TARGET_CLASS_SEPARATOR_RE.split(target_class)
+        if normalize_source_value(part)
+    ]
+    if len(parts) < 2:
+        return target_class, ""
+
+    grade_parts = [part for part in parts if TARGET_GRADE_RE.search(part)]
+    if not grade_parts:
+        return target_class, ""
+
+    target_grade = grade_parts[-1]
+    class_parts = [part for part in parts if part != target_grade]
+    return " · ".join(class_parts), target_grade
+
+
+def split_teacher_names(text: str) -> list[str]:
+    return [name.strip() for name in TEACHER_SEPARATOR_RE.split(text) if name.strip()]
+
+
+def extract_teachers(soup: BeautifulSoup) -> list[str]:
+    for card in soup.select(".card"):
+        heading = card.select_one("h6.card-title")
+        if not heading or "授課教師" not in heading.get_text(strip=True):
+            continue
+        teachers = [
+            clean_text(anchor)
+            for anchor in card.find_all("a")
+            if clean_text(anchor)
+        ]
+        if teachers:
+            return teachers
+        body_text = extract_card_value(soup, "授課教師")
+        return split_teacher_names(body_text)
+    return []
+
+
+def extract_hero_basic_info(soup: BeautifulSoup) -> dict[str, str]:
+    basic_info: dict[str, str] = {}
+
+    hero = soup.select_one("#course-hero")
+    if hero:
+        for badge in hero.select(".badge"):
+            badge_text = clean_text(badge)
+            if "必修" in badge_text or "選修" in badge_text:
+                basic_info["course_type"] = badge_text
+            elif "學分" in badge_text:
+                basic_info["credits"] = badge_text.replace("學分", "").strip()
+
+    class_time = normalize_source_value(extract_card_value(soup, "上課時間"))
+    target_class, target_grade = split_target_class_and_grade(
+        extract_card_value(soup, "修課班級")
+    )
+    enrollment_notes = normalize_source_value(extract_card_value(soup, "課程資訊"))
+
+    if class_time:
+        basic_info["class_time"] = class_time
+    if target_class:
+        basic_info["target_class"] = target_class
+    if target_grade:
+        basic_info["target_grade"] = target_grade
+    if enrollment_notes:
+        basic_info["enrollment_notes"] = enrollment_notes
+
+    return basic_info
+
+
+def extract_accordion_section(soup: BeautifulSoup, label: str) -> str:
+    accordion = soup.select_one("#courseDetailsAccordion")
+    if not accordion:
+        return ""
+
+    for item in accordion.select(".accordion-item"):
+        button = item.select_one(".accordion-button")
+        if not button or label not in clean_text(button):
+            continue
+        body = item.select_one(".accordion-body")
+        return clean_text(body)
+    return ""
+
+
+def extract_grading_items(soup: BeautifulSoup) -> list[dict[str, str]]:
+    grading_items: list[dict[str, str]] = []
+    accordion = soup.select_one("#courseDetailsAccordion")
+    if not accordion:
+        return grading_items
+
+    grading_item = None
+    for item in accordion.select(".accordion-item"):
+        button = item.select_one(".accordion-button")
+        if button and "評分方式" in clean_text(button):
+            grading_item = item
+            break
+
+    if not grading_item:
+        return grading_items
+
+    for row in grading_item.select("tr"):
+        cols = [clean_text(col) for col in row.find_all(["td", "th"])]
+        cols = [col for col in cols if col]
+        if len(cols) >= 2 and not any("評分" in col for col in cols[:1]):
+            grading_items.append(
+                {
+                    "method": cols[0],
+                    "percentage": cols[1],
+                    "description": cols[2] if len(cols) > 2 else "",
+                }
+            )
+
+    return grading_items
+
+
+def extract_selection_records(soup: BeautifulSoup) -> list[dict[str, Any]]:
+    selection_records: list[dict[str, Any]] = []
+    scripts = soup.find_all("script")
+    for script in scripts:
+        if not isinstance(script, Tag):
+            continue
+        script_text = script.get_text()
+        if SELECTION_TABLE_MARKER not in script_text:
+            continue
+        match = SELECTION_TABLE_RE.search(script_text)
+        if not match:
+            continue
+        selection_records = parse_selection_rows(match.group(1))
+        break
+    return selection_records
+
+
+def parse_selection_rows(table_text: str) -> list[dict[str, Any]]:
+    return [
+        {
+            "date": date,
+            "enrolled": int(enrolled),
+            "remaining": int(remaining),
+            "registered": int(registered),
+        }
+        for date, enrolled, remaining, registered in SELECTION_ROW_RE.findall(table_text)
+    ]
+
+
+def parse_course_detail_page_reference(
+    body: bytes,
+    encoding: str,
+    academic_year: str,
+    academic_semester: str,
+    course_code: str,
+) -> dict[str, Any]:
+    """Parse a detail page with the original per-field extractors."""
+    soup = BeautifulSoup(body.decode(encoding, errors="replace"), "html.parser")
+
+    page_text = clean_text(soup.select_one("#content")) or clean_text(soup.body)
+    closed_notice = soup.find(class_="warning closable")
+    hero_text = clean_text(soup.select_one("#course-hero"))
+    is_closed = bool(
+        closed_notice
+        or "本課程已於" in page_text
+        or "停開" in hero_text
+    )
+
+    teaching_goal = extract_accordion_section(soup, "教育目標")
+    course_description = extract_accordion_section(soup, "課程概述")
+    if not course_description:
+        course_description = extract_accordion_section(soup, "課程描述")
+
+    return {
+        "academic_year": int(academic_year),
+        "academic_semester": int(academic_semester),
+        "course_code": course_code,
+        "is_closed": is_closed,
+        "teachers": extract_teachers(soup),
+        "grading_items": extract_grading_items(soup),
+        "selection_records": extract_selection_records(soup),
+        "teaching_goal": teaching_goal,
+        "course_description": course_description,
+        "basic_info": extract_hero_basic_info(soup),
+    }
+
+
+@dataclass
+class CardSection:
+    heading: str
+    body_text: str
+    anchor_texts: list[str]
+
+
+@dataclass
+class AccordionSection:
+    button_text: Optional[str]
+    body_text: str
+    rows: list[list[str]] = field(default_factory=list)
+
+
+@dataclass
+class DetailPageIndex:
+    """Every piece of a detail page the derived fields need, as plain text."""
+
+    content_text: str = ""
+    hero_text: str = ""
+    hero_badges: list[str] = field(default_factory=list)
+    has_closed_notice: bool = False
+    cards: list[CardSection] = field(default_factory=list)
+    accordion: list[AccordionSection] = field(default_factory=list)
+    selection_scripts: list[str] = field(default_factory=list)
+
+    def card(self, label: str) -> Optional[CardSection]:
+        for card in self.cards:
+            if label in card.heading:
+                return card
+        return None
+
+    def card_value(self, label: str) -> str:
+        card = self.card(label)
+        return text_after_label(card.body_text, label) if card else ""
+
+    def accordion_item(self, label: str) -> Optional[AccordionSection]:
+        for item in self.accordion:
+            if item.button_text is not None and label in item.button_text:
+                return item
+        return None
+
+    def accordion_section(self, label: str) -> str:
+        item = self.accordion_item(label)
+        return item.body_text if item else ""
+
+
+# Only these subtrees are built when the page is parsed with BeautifulSoup.
+# Matching elements keep their whole subtree, so nested cards are included.
+_DETAIL_IDS = {"content", "course-hero", "courseDetailsAccordion"}
+_DETAIL_CLASSES = {"card", "warning"}
+
+
+class DetailPageStrainer(ElementFilter):
+    """Builds only the detail page subtrees the index reads."""
+
+    def allow_tag_creation(
+        self, nsprefix: Optional[str], name: str, attrs: Optional[dict[str, Any]]
+    ) -> bool:
+        attrs = attrs or {}
+        if name == "script" or attrs.get("id") in _DETAIL_IDS:
+            return True
+        classes = attrs.get("class") or ()
+        if isinstance(classes, str):
+            classes = classes.split()
+        return any(class_name in _DETAIL_CLASSES for class_name in classes)
+
+    def allow_string_creation(self, string: str) -> bool:
+        return False
+
+
+DETAIL_STRAINER = DetailPageStrainer()
+
+
+def _has_class(tag: Tag, class_name: str) -> bool:
+    return class_name in (tag.get("class") or ())
+
+
+def _is_closed_notice(tag: Tag) -> bool:
+    # Same rule as soup.find(class_="warning closable"): the whole class
+    # attribute must read "warning closable".
+    return " ".join(tag.get("class") or ()) == "warning closable"
+
+
+def _index_bs4_card(card: Tag) -> Optional[CardSection]:
+    heading = card.select_one("h6.card-title")
+    if not heading:
+        return None
+    return CardSection(
+        heading=heading.get_text(strip=True),
+        body_text=clean_text(card.select_one(".card-body")),
+        anchor_texts=[clean_text(anchor) for anchor in card.find_all("a")],
+    )
+
+
+def _index_bs4_accordion(accordion: Tag) -> list[AccordionSection]:
+    sections: list[AccordionSection] = []
+    grading_found = False
+    for item in accordion.select(".accordion-item"):
+        button = item.select_one(".accordion-button")
+        section = AccordionSection(
+            button_text=clean_text(button) if button else None,
+            body_text=clean_text(item.select_one(".accordion-body")),
+        )
+        if (
+            not grading_found
+            and section.button_text is not None
+            and "評分方式" in section.button_text
+        ):
+            grading_found = True
+            section.rows = [
+                [clean_text(col) for col in row.find_all(["td", "th"])]
+                for row in item.select("tr")
+            ]
+        sections.append(section)
+    return sections
+
+
+def build_bs4_index(html: str, parser: str = "html.parser") -> DetailPageIndex:
+    """Build the page index with BeautifulSoup in a single document walk."""
+    soup = BeautifulSoup(html, parser, parse_only=DETAIL_STRAINER)
+
+    content = hero = accordion = None
+    index = DetailPageIndex()
+    for tag in soup.find_all(True):
+        tag_id = tag.get("id")
+        if tag_id == "content" and content is None:
+            content = tag
+        elif tag_id == "course-hero" and hero is None:
+            hero = tag
+        elif tag_id == "courseDetailsAccordion" and accordion is None:
+            accordion = tag
+
+        if tag.name == "script":
+            script_text = tag.get_text()
+            if SELECTION_TABLE_MARKER in script_text:
+                index.selection_scripts.append(script_text)
+        if _has_class(tag, "card"):
+            card = _index_bs4_card(tag)
+            if card:
+                index.cards.append(card)
+        if not index.has_closed_notice and _is_closed_notice(tag):
+            index.has_closed_notice = True
+
+    index.content_text = clean_text(content)
+    if not index.content_text:
+        # Pages without #content fall back to the full <body> text, which the
+        # strained document does not contain.
+        full_soup = BeautifulSoup(html, parser)
+        index.content_text = clean_text(full_soup.body)
+    if hero:
+        index.hero_text = clean_text(hero)
+        index.hero_badges = [clean_text(badge) for badge in hero.select(".badge")]
+    if accordion:
+        index.accordion = _index_bs4_accordion(accordion)
+    return index
+
+
+def build_selectolax_index(html: str) -> DetailPageIndex:
+    """Build the page index with selectolax's lexbor engine."""
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    index = DetailPageIndex()
+
+    index.selection_scripts = [
+        text
+        for script in tree.css("script")
+        if SELECTION_TABLE_MARKER in (text := script.text(deep=True))
+    ]
+    # Script and style text is not visible text; BeautifulSoup skips it too.
+    tree.strip_tags(["script", "style"])
+
+    def node_text(node: Any) -> str:
+        if node is None:
+            return ""
+        return WHITESPACE_RE.sub(" ", node.text(separator=" ", strip=True)).strip()
+
+    index.content_text = node_text(tree.css_first("#content")) or node_text(tree.body)
+    index.has_closed_notice = any(
+        WHITESPACE_RE.sub(" ", node.attributes.get("class") or "").strip()
+        == "warning closable"
+        for node in tree.css(".warning.closable")
+    )
+
+    hero = tree.css_first("#course-hero")
+    if hero is not None:
+        index.hero_text = node_text(hero)
+        index.hero_badges = [node_text(badge) for badge in hero.css(".badge")]
+
+    for card in tree.css(".card"):
+        heading = card.css_first("h6.card-title")
+        if heading is None:
+            continue
+        index.cards.append(
+            CardSection(
+                heading=heading.text(separator="", strip=True),
+                body_text=node_text(card.css_first(".card-body")),
+                anchor_texts=[node_text(anchor) for anchor in card.css("a")],
+            )
+        )
+
+    accordion = tree.css_first("#courseDetailsAccordion")
+    grading_found = False
+    for item in accordion.css(".accordion-item") if accordion is not None else []:
+        button = item.css_first(".accordion-button")
+        section = AccordionSection(
+            button_text=node_text(button) if button is not None else None,
+            body_text=node_text(item.css_first(".accordion-body")),
+        )
+        if (
+            not grading_found
+            and section.button_text is not None
+            and "評分方式" in section.button_text
+        ):
+            grading_found = True
+            section.rows = [
+                [node_text(col) for col in row.css("td, th")]
+                for row in item.css("tr")
+            ]
+        index.accordion.append(section)
+    return index
+
+
+def build_detail_page_index(html: str, backend: str = "html.parser") -> DetailPageIndex:
+    if backend == "selectolax":
+        return build_selectolax_index(html)
+    if backend in ("html.parser", "lxml"):
+        return build_bs4_index(html, backend)
+    raise ValueError(f"Unknown HTML parser backend: {backend}")
+
+
+def derive_teachers(index: DetailPageIndex) -> list[str]:
+    card = index.card("授課教師")
+    if not card:
+        return []
+    teachers = [text for text in card.anchor_texts if text]
+    if teachers:
+        return teachers
+    return split_teacher_names(text_after_label(card.body_text, "授課教師"))
+
+
+def derive_hero_basic_info(index: DetailPageIndex) -> dict[str, str]:
+    basic_info: dict[str, str] = {}
+
+    for badge_text in index.hero_badges:
+        if "必修" in badge_text or "選修" in badge_text:
+            basic_info["course_type"] = badge_text
+        elif "學分" in badge_text:
+            basic_info["credits"] = badge_text.replace("學分", "").strip()
+
+    class_time = normalize_source_value(index.card_value("上課時間"))
+    target_class, target_grade = split_target_class_and_grade(
+        index.card_value("修課班級")
+    )
+    enrollment_notes = normalize_source_value(index.card_value("課程資訊"))
+
+    if class_time:
+        basic_info["class_time"] = class_time
+    if target_class:
+        basic_info["target_class"] = target_class
+    if target_grade:
+        basic_info["target_grade"] = target_grade
+    if enrollment_notes:
+        basic_info["enrollment_notes"] = enrollment_notes
+
+    return basic_info
+
+
+def derive_grading_items(index: DetailPageIndex) -> list[dict[str, str]]:
+    grading_items: list[dict[str, str]] = []
+    item = index.accordion_item("評分方式")
+    if not item:
+        return grading_items
+
+    for row in item.rows:
+        cols = [col for col in row if col]
+        if len(cols) >= 2 and not any("評分" in col for col in cols[:1]):
+            grading_items.append(
+                {
+                    "method": cols[0],
+                    "percentage": cols[1],
+                    "description": cols[2] if len(cols) > 2 else "",
+                }
+            )
+    return grading_items
+
+
+def derive_selection_records(index: DetailPageIndex) -> list[dict[str, Any]]:
+    for script_text in index.selection_scripts:
+        match = SELECTION_TABLE_RE.search(script_text)
+        if match:
+            return parse_selection_rows(match.group(1))
+    return []
+
+
+def parse_course_detail_page(
+    body: bytes,
+    encoding: str,
+    academic_year: str,
+    academic_semester: str,
+    course_code: str,
+    backend: str = "html.parser",
+) -> dict[str, Any]:
+    """Parse one `/view/{year}/{semester}/{code}/` page into a detail dict."""
+    index = build_detail_page_index(body.decode(encoding, errors="replace"), backend)
+
+    is_closed = bool(
+        index.has_closed_notice
+        or "本課程已於" in index.content_text
+        or "停開" in index.hero_text
+    )
+    course_description = index.accordion_section("課程概述")
+    if not course_description:
+        course_description = index.accordion_section("課程描述")
+
+    return {
+        "academic_year": int(academic_year),
+        "academic_semester": int(academic_semester),
+        "course_code": course_code,
+        "is_closed": is_closed,
+        "teachers": derive_teachers(index),
+        "grading_items": derive_grading_items(index),
+        "selection_records": derive_selection_records(index),
+        "teaching_goal": index.accordion_section("教育目標"),
+        "course_description": course_description,
+        "basic_info": derive_hero_basic_info(index),
+    }
+
+
+def check_parity(
+    page_paths: list[Path], backend: str = "html.parser"
+) -> dict[str, list[str]]:
+    """
+    Compare the single-pass parser with the reference extractors.
+
+    Returns the differing field names per page; an empty dict means parity.
+    """
+    mismatches: dict[str, list[str]] = {}
+    for path in page_paths:
+        body = path.read_bytes()
+        expected = parse_course_detail_page_reference(body, "utf-8", "0", "0", path.stem)
+        actual = parse_course_detail_page(body, "utf-8", "0", "0", path.stem, backend)
+        fields = [key for key in expected if expected[key] != actual.get(key)]
+        if fields:
+            mismatches[str(path)] = fields
+    return mismatches
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Check single-pass parser parity over saved detail pages"
+    )
+    arg_parser.add_argument(
+        "page_dir", type=Path, help="Directory of saved *.html pages, searched recursively"
+    )
+    arg_parser.add_argument("--backend", choices=PARSER_BACKENDS, default="html.parser")
+    args = arg_parser.parse_args()
+
+    pages = sorted(args.page_dir.rglob("*.html"))
+    if not pages:
+        sys.exit(f"No *.html pages found in {args.page_dir}")
+    result = check_parity(pages, args.backend)
+    print(json.dumps({"pages": len(pages), "mismatches": result}, ensure_ascii=False, indent=2))
+    sys.exit(1 if result else 0)
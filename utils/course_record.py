@@ -0,0 +1,297 @@
+"""
+Merged course record: one open-data CSV row joined with its detail page.
+
+Records are built once per course and normalized at construction, so the
+write path only has to call `to_document`. The crawler joins details to
+CSV rows through a {course_code: CourseRecord} dict instead of a DataFrame
+merge.
+
+The course document keeps only the latest enrollment snapshot
+(`latest_selection`); the full history goes to the enrollment_history
+time-series collection as `enrollment_points`.
+"""
+
+import hashlib
+import json
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+NO_DATA_VALUES = {"", "無資料", "無", "未定", "None", "none", "N/A", "n/a"}
+
+INFO_FIELDS = (
+    "course_name",
+    "department_code",
+    "department_name",
+    "course_type",
+    "credits_1",
+    "credits_2",
+)
+DETAIL_FIELDS = (
+    "is_closed",
+    "teachers",
+    "grading_items",
+    "selection_records",
+    "teaching_goal",
+    "course_description",
+    "basic_info",
+)
+KEY_FIELDS = ("academic_year", "academic_semester", "course_code")
+# Bookkeeping fields that are not part of a course's content.
+NON_CONTENT_FIELDS = ("_id", "content_hash", "crawl_generation", "created_generation")
+
+# Dates on the selection chart are Taiwan local time.
+SELECTION_TIMEZONE = timezone(timedelta(hours=8))
+SELECTION_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d",
+)
+
+
+def normalize_no_data_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    value = str(value).strip()
+    return "" if value in NO_DATA_VALUES else value
+
+
+def normalize_basic_info(raw_basic) -> dict:
+    if not isinstance(raw_basic, dict):
+        return {}
+
+    basic_info = raw_basic.copy()
+    for key in ("class_time", "target_class", "target_grade", "enrollment_notes"):
+        basic_info[key] = normalize_no_data_value(basic_info.get(key))
+
+    return basic_info
+
+
+def normalize_grading_items(raw_grading) -> List[Dict[str, Any]]:
+    if not isinstance(raw_grading, list):
+        return []
+
+    grading_items = []
+    for item in raw_grading:
+        percentage = item.get("percentage", "")
+        if str(percentage).isdigit():
+            percentage = int(percentage)
+        grading_items.append(
+            {
+                "method": item.get("method", ""),
+                "percentage": percentage,
+                "description": item.get("description", ""),
+            }
+        )
+    return grading_items
+
+
+def parse_selection_date(value) -> Optional[datetime]:
+    """Parse a selection chart date into an aware UTC datetime, or None."""
+    text = str(value).strip()
+    for date_format in SELECTION_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        return parsed.replace(tzinfo=SELECTION_TIMEZONE).astimezone(timezone.utc)
+    return None
+
+
+def new_crawl_generation() -> int:
+    """
+    Return a new crawl generation id.
+
+    Generations are millisecond timestamps, so a later crawl always has a
+    larger id than an earlier one.
+    """
+    return time.time_ns() // 1_000_000
+
+
+def compute_content_hash(document: dict) -> str:
+    """Return a stable hash of a course document's content."""
+    content = {
+        key: value
+        for key, value in document.items()
+        if key not in NON_CONTENT_FIELDS
+    }
+    encoded = json.dumps(
+        content,
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CourseWriteCounts:
+    """How the documents of a save compared with the stored ones."""
+
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+
+    def add(self, other: "CourseWriteCounts") -> None:
+        self.new += other.new
+        self.changed += other.changed
+        self.unchanged += other.unchanged
+
+
+def _missing(value) -> bool:
+    """None or a NaN left by pandas."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class CourseRecord:
+    """
+    One course of the merged courses collection.
+
+    CSV columns outside INFO_FIELDS are kept in `extra` and written as-is.
+    """
+
+    __slots__ = KEY_FIELDS + INFO_FIELDS + DETAIL_FIELDS + ("extra",)
+
+    academic_year: int
+    academic_semester: int
+    course_code: str
+    course_name: Any
+    department_code: Any
+    department_name: Any
+    course_type: Any
+    credits_1: Any
+    credits_2: Any
+    is_closed: Any
+    teachers: list
+    grading_items: List[Dict[str, Any]]
+    selection_records: list
+    teaching_goal: Any
+    course_description: Any
+    basic_info: dict
+    extra: Optional[Dict[str, Any]]
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "CourseRecord":
+        """
+        Build a record from a CSV row, optionally already merged with
+        detail fields. Missing detail fields get their empty values.
+        """
+        record = cls.__new__(cls)
+        record.academic_year = int(row["academic_year"])
+        record.academic_semester = int(row["academic_semester"])
+        record.course_code = row["course_code"]
+        for name in INFO_FIELDS:
+            setattr(record, name, row.get(name))
+
+        extra = {
+            key: value
+            for key, value in row.items()
+            if key not in KEY_FIELDS and key not in INFO_FIELDS and key not in DETAIL_FIELDS
+        }
+        record.extra = extra or None
+        record._set_detail(row)
+        return record
+
+    def with_detail(self, detail: Dict[str, Any]) -> "CourseRecord":
+        """Return a copy of this CSV record joined with parsed detail fields."""
+        record = CourseRecord.__new__(CourseRecord)
+        for name in KEY_FIELDS + INFO_FIELDS:
+            setattr(record, name, getattr(self, name))
+        record.extra = self.extra
+        record._set_detail(detail)
+        return record
+
+    def with_stored_detail(self, document: Dict[str, Any]) -> "CourseRecord":
+        """
+        Return a copy of this CSV record joined with the detail fields of a
+        stored course document, for courses whose detail page was not parsed
+        again. Only `latest_selection` is stored, so it stands in for the
+        selection records.
+        """
+        latest_selection = document.get("latest_selection")
+        record = self.with_detail(
+            {
+                **document,
+                "selection_records": [latest_selection] if latest_selection else [],
+            }
+        )
+        # Stored already normalized; normalizing again would fill in the keys
+        # of an empty basic_info and change the content hash.
+        basic_info = document.get("basic_info")
+        record.basic_info = basic_info if isinstance(basic_info, dict) else {}
+        return record
+
+    def _set_detail(self, detail: Dict[str, Any]) -> None:
+        is_closed = detail.get("is_closed")
+        self.is_closed = False if _missing(is_closed) else is_closed
+
+        teachers = detail.get("teachers")
+        self.teachers = teachers if isinstance(teachers, list) else []
+        self.grading_items = normalize_grading_items(detail.get("grading_items"))
+        selection_records = detail.get("selection_records")
+        self.selection_records = (
+            selection_records if isinstance(selection_records, list) else []
+        )
+
+        teaching_goal = detail.get("teaching_goal")
+        self.teaching_goal = "" if _missing(teaching_goal) else teaching_goal
+        course_description = detail.get("course_description")
+        self.course_description = "" if _missing(course_description) else course_description
+        self.basic_info = normalize_basic_info(detail.get("basic_info"))
+
+    def term_filter(self) -> Dict[str, Any]:
+        """The compound course identity filter used by course collections."""
+        return {
+            "academic_year": self.academic_year,
+            "academic_semester": self.academic_semester,
+            "course_code": self.course_code,
+        }
+
+    def to_document(self) -> Dict[str, Any]:
+        """
+        Return the MongoDB document for this course. `selection_records` is
+        reduced to its last entry, stored as `latest_selection`.
+        """
+        document = dict(self.extra) if self.extra else {}
+        for name in CourseRecord.__slots__[:-1]:
+            if name == "selection_records":
+                document["latest_selection"] = (
+                    self.selection_records[-1] if self.selection_records else None
+                )
+                continue
+            document[name] = getattr(self, name)
+        return document
+
+    def enrollment_points(self) -> List[Dict[str, Any]]:
+        """
+        Return the selection records as enrollment_history documents, oldest
+        first. Records with an unparseable date are left out.
+        """
+        course = {
+            "academic_year": self.academic_year,
+            "academic_semester": self.academic_semester,
+            "course_code": self.course_code,
+        }
+        points = []
+        for item in self.selection_records:
+            date = parse_selection_date(item.get("date"))
+            if date is None:
+                continue
+            points.append(
+                {
+                    "date": date,
+                    "course": course,
+                    "enrolled": item.get("enrolled"),
+                    "remaining": item.get("remaining"),
+                    "registered": item.get("registered"),
+                }
+            )
+        points.sort(key=lambda point: point["date"])
+        return points
@@ -0,0 +1,171 @@
+"""
+Shared pooled HTTP client for all crawlers.
+
+One aiohttp session with a tuned connection pool (keep-alive, DNS cache,
+per-request timeouts, compressed responses) is reused by every crawler in a
+process, so a full `main.py` run keeps its connections warm end to end.
+Requests and received bytes are counted per host.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import aiohttp
+
+from config import config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "thu-course-crawler (+https://github.com/ttymayor/thu-course-crawler)",
+}
+
+
+@dataclass
+class HostStats:
+    """Traffic counters for one host."""
+
+    requests: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+
+
+class HttpClient:
+    """
+    Lazily created aiohttp session with pooled keep-alive connections.
+
+    The session is created on first use inside the running event loop. aiohttp
+    advertises gzip / deflate (and brotli when installed) and decompresses
+    responses transparently; `bytes_received` counts the decoded body bytes.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        keepalive_timeout: float,
+        dns_cache_ttl: int,
+        timeout: float,
+        connect_timeout: float,
+    ) -> None:
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout, sock_connect=connect_timeout
+        )
+        self.stats: defaultdict[str, HostStats] = defaultdict(HostStats)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            enable_cleanup_closed=True,
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        trace_config.on_response_chunk_received.append(self._on_chunk_received)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers=DEFAULT_HEADERS,
+            auto_decompress=True,
+            trace_configs=[trace_config],
+        )
+
+    async def _on_request_end(self, session, context, params) -> None:
+        self.stats[params.url.host or ""].requests += 1
+
+    async def _on_request_exception(self, session, context, params) -> None:
+        host_stats = self.stats[params.url.host or ""]
+        host_stats.requests += 1
+        host_stats.errors += 1
+
+    async def _on_chunk_received(self, session, context, params) -> None:
+        self.stats[params.url.host or ""].bytes_received += len(params.chunk)
+
+    async def fetch_text(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        encoding: Optional[str] = None,
+    ) -> str:
+        """GET `url` and return the decoded body; raises on HTTP errors."""
+        async with self.session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.text(encoding=encoding)
+
+    async def fetch_bytes(
+        self, url: str, params: Optional[dict[str, Any]] = None
+    ) -> tuple[bytes, str]:
+        """GET `url` and return (raw body, encoding); raises on HTTP errors."""
+        async with self.session.get(url, params=params) as response:
+            response.raise_for_status()
+            body = await response.read()
+            return body, response.get_encoding()
+
+    async def fetch_json(
+        self, url: str, params: Optional[dict[str, Any]] = None
+    ) -> Any:
+        """GET `url` and return the parsed JSON body; raises on HTTP errors."""
+        async with self.session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def warm_up(self, url: str) -> None:
+        """
+        Resolve and connect to `url`'s host so the next requests reuse a
+        pooled connection; raises on connection errors.
+        """
+        async with self.session.head(url, allow_redirects=False) as response:
+            await response.read()
+
+    def log_stats(self) -> None:
+        for host, host_stats in sorted(self.stats.items()):
+            logger.info(
+                f"[http_client] {host}: {host_stats.requests} requests, "
+                f"{host_stats.errors} errors, "
+                f"{host_stats.bytes_received / 1024 / 1024:.1f} MiB received"
+            )
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+        if not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self.log_stats()
+
+
+_shared_client: Optional[HttpClient] = None
+
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = HttpClient(
+            pool_size=config.http_pool_size,
+            keepalive_timeout=config.http_keepalive_timeout,
+            dns_cache_ttl=config.http_dns_cache_ttl,
+            timeout=config.http_timeout,
+            connect_timeout=config.http_connect_timeout,
+        )
+    return _shared_client
+
+
+async def close_http_client() -> None:
+    """Close the shared session and log its traffic counters."""
+    if _shared_client is not None:
+        await _shared_client.close()
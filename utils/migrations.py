@@ -0,0 +1,786 @@
+"""
+Versioned MongoDB schema migrations.
+
+Each migration runs once per database and environment and is recorded in
+the `schema_migrations` collection (`schema_migrations_dev` in dev mode).
+The save path only calls `ensure_schema_current`, which compares the
+recorded versions with the registered ones once per process.
+
+Migrations must be idempotent: a crash between applying a migration and
+recording it runs it again on the next start.
+
+    python -m utils.migrations            # apply pending migrations
+    python -m utils.migrations --status   # list applied / pending versions
+    python -m utils.migrations --dry-run  # report what pending ones would change
+"""
+
+import argparse
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from pymongo import DeleteMany, InsertOne, UpdateOne
+from pymongo.database import Database
+
+from config import config
+from utils.course_record import CourseRecord
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_MIGRATIONS_COLLECTION = "schema_migrations"
+COURSE_TERM_COLLECTIONS = ("courses", "course_info", "course_detail")
+COURSE_TERM_INDEX = [("academic_year", 1), ("academic_semester", 1), ("course_code", 1)]
+COURSE_TERM_INDEX_NAME = "academic_term_course_code_unique"
+COURSE_GENERATION_INDEX = [
+    ("academic_year", 1),
+    ("academic_semester", 1),
+    ("crawl_generation", 1),
+]
+COURSE_GENERATION_INDEX_NAME = "academic_term_crawl_generation"
+TERM_GENERATIONS_COLLECTION = "course_term_generations"
+CURRENT_COURSES_VIEW = "courses_current"
+COURSE_CHANGES_COLLECTION = "course_changes"
+COUNTERS_COLLECTION = "counters"
+ENROLLMENT_HISTORY_COLLECTION = "enrollment_history"
+ENROLLMENT_HISTORY_INDEX = [
+    ("course.academic_year", 1),
+    ("course.academic_semester", 1),
+    ("course.course_code", 1),
+    ("date", -1),
+]
+ENROLLMENT_HISTORY_INDEX_NAME = "course_date"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Database], None]
+    dry_run: Optional[Callable[[Database], None]] = None
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(
+    version: int, name: str, dry_run: Optional[Callable[[Database], None]] = None
+):
+    """
+    Register a migration function under a unique, increasing version.
+
+    `dry_run`, when given, reports what the migration would change.
+    """
+
+    def register(apply: Callable[[Database], None]) -> Callable[[Database], None]:
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version: {version}")
+        MIGRATIONS.append(Migration(version, name, apply, dry_run))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return apply
+
+    return register
+
+
+def get_migrations_collection(database: Database):
+    return database[config.get_collection_name(SCHEMA_MIGRATIONS_COLLECTION)]
+
+
+def applied_versions(database: Database) -> set[int]:
+    return {
+        doc["_id"] for doc in get_migrations_collection(database).find({}, {"_id": 1})
+    }
+
+
+def run_migrations(database: Database) -> list[Migration]:
+    """Apply every pending migration in version order; returns those applied."""
+    done = applied_versions(database)
+    pending = [item for item in MIGRATIONS if item.version not in done]
+    collection = get_migrations_collection(database)
+
+    for item in pending:
+        logger.info(f"[migrations] Applying {item.version}: {item.name}")
+        started = time.perf_counter()
+        item.apply(database)
+        duration = time.perf_counter() - started
+        collection.replace_one(
+            {"_id": item.version},
+            {
+                "_id": item.version,
+                "name": item.name,
+                "applied_at": datetime.now(timezone.utc),
+                "duration_seconds": round(duration, 3),
+            },
+            upsert=True,
+        )
+        logger.info(f"[migrations] Applied {item.version} in {duration:.2f}s")
+
+    return pending
+
+
+_verified: set[tuple[str, str]] = set()
+_verify_lock = threading.Lock()
+
+
+def ensure_schema_current(database: Database) -> None:
+    """
+    Make sure all migrations were applied to `database`.
+
+    After the first successful check this is a set lookup, so it is cheap
+    enough to call on every save.
+    """
+    key = (database.name, config.get_collection_name(SCHEMA_MIGRATIONS_COLLECTION))
+    if key in _verified:
+        return
+
+    with _verify_lock:
+        if key in _verified:
+            return
+        if any(item.version not in applied_versions(database) for item in MIGRATIONS):
+            run_migrations(database)
+        _verified.add(key)
+
+
+def parse_numeric_term(value: Any) -> int | None:
+    """Return a normalized academic term value when it is numeric."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if math.isfinite(value) and value.is_integer():
+            return int(value)
+        return None
+    raw_value = str(value).strip()
+    if not raw_value.isdigit():
+        try:
+            float_value = float(raw_value)
+        except ValueError:
+            return None
+        if math.isfinite(float_value) and float_value.is_integer():
+            return int(float_value)
+        return None
+    return int(raw_value)
+
+
+def _numeric_term_expression(field_path: str) -> dict:
+    """
+    Aggregation expression mirroring parse_numeric_term: integral numbers and
+    numeric strings become ints, anything else (bools, dates, ...) becomes null.
+    """
+    return {
+        "$let": {
+            "vars": {
+                "value": {
+                    "$switch": {
+                        "branches": [
+                            {
+                                "case": {"$eq": [{"$type": field_path}, "string"]},
+                                "then": {
+                                    "$convert": {
+                                        "input": {"$trim": {"input": field_path}},
+                                        "to": "double",
+                                        "onError": None,
+                                    }
+                                },
+                            },
+                            {
+                                "case": {"$isNumber": field_path},
+                                "then": {"$toDouble": field_path},
+                            },
+                        ],
+                        "default": None,
+                    }
+                }
+            },
+            "in": {
+                "$cond": [
+                    {
+                        "$and": [
+                            {"$ne": ["$$value", None]},
+                            {"$lt": [{"$abs": "$$value"}, 2**31]},
+                            {"$eq": ["$$value", {"$floor": "$$value"}]},
+                        ]
+                    },
+                    {"$toInt": "$$value"},
+                    None,
+                ]
+            },
+        }
+    }
+
+
+def course_term_cleanup_pipeline() -> list[dict]:
+    """
+    Pipeline returning one document per normalized (year, semester, course)
+    identity that needs fixing, newest `_id` first within each group:
+
+        {"_id": {"academic_year", "academic_semester", "course_code"},
+         "keep": <_id>, "rewrite": bool, "duplicates": [<_id>, ...]}
+
+    Like the original client-side cleanup, the newest canonical (already
+    numeric) document is kept, or the newest document when none is.
+    """
+    return [
+        {
+            "$match": {
+                "academic_year": {"$exists": True},
+                "academic_semester": {"$exists": True},
+                "course_code": {"$exists": True},
+            }
+        },
+        {"$sort": {"_id": -1}},
+        {
+            "$project": {
+                "academic_year": 1,
+                "academic_semester": 1,
+                "normalized_year": _numeric_term_expression("$academic_year"),
+                "normalized_semester": _numeric_term_expression("$academic_semester"),
+                "normalized_code": {
+                    "$trim": {
+                        "input": {
+                            "$convert": {
+                                "input": "$course_code",
+                                "to": "string",
+                                "onError": "",
+                                "onNull": "",
+                            }
+                        }
+                    }
+                },
+            }
+        },
+        {
+            "$match": {
+                "normalized_year": {"$ne": None},
+                "normalized_semester": {"$ne": None},
+                "normalized_code": {"$ne": ""},
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "academic_year": "$normalized_year",
+                    "academic_semester": "$normalized_semester",
+                    "course_code": "$normalized_code",
+                },
+                "ids": {"$push": "$_id"},
+                # Numeric $eq, like the Python check: 114.0 counts as canonical
+                # but the string "114" does not.
+                "canonical_flags": {
+                    "$push": {
+                        "$and": [
+                            {"$eq": ["$academic_year", "$normalized_year"]},
+                            {"$eq": ["$academic_semester", "$normalized_semester"]},
+                        ]
+                    }
+                },
+            }
+        },
+        {
+            "$project": {
+                "ids": 1,
+                "canonical_ids": {
+                    "$map": {
+                        "input": {
+                            "$filter": {
+                                "input": {"$zip": {"inputs": ["$ids", "$canonical_flags"]}},
+                                "cond": {"$arrayElemAt": ["$$this", 1]},
+                            }
+                        },
+                        "in": {"$arrayElemAt": ["$$this", 0]},
+                    }
+                },
+            }
+        },
+        {
+            "$project": {
+                "ids": 1,
+                "canonical_ids": 1,
+                "keep": {
+                    "$ifNull": [
+                        {"$arrayElemAt": ["$canonical_ids", 0]},
+                        {"$arrayElemAt": ["$ids", 0]},
+                    ]
+                },
+            }
+        },
+        {
+            "$project": {
+                "keep": 1,
+                "rewrite": {"$not": [{"$in": ["$keep", "$canonical_ids"]}]},
+                "duplicates": {
+                    "$filter": {"input": "$ids", "cond": {"$ne": ["$$this", "$keep"]}}
+                },
+            }
+        },
+        {"$match": {"$or": [{"rewrite": True}, {"duplicates.0": {"$exists": True}}]}},
+    ]
+
+
+@dataclass
+class CleanupReport:
+    """What a course term cleanup changed, or would change in a dry run."""
+
+    collection: str
+    groups: int = 0
+    rewritten: int = 0
+    duplicates: int = 0
+    samples: list[dict] = field(default_factory=list)
+
+    def log(self, dry_run: bool) -> None:
+        verb = "would update" if dry_run else "updated"
+        logger.info(
+            f"[migrations] {self.collection}: {self.groups} affected courses, "
+            f"{verb} {self.rewritten} documents, "
+            f"{'would remove' if dry_run else 'removed'} {self.duplicates} duplicates"
+        )
+        for sample in self.samples:
+            logger.info(f"[migrations]   e.g. {sample}")
+
+
+def cleanup_course_term_documents(
+    collection, dry_run: bool = False, batch_size: int = 1000, sample_size: int = 5
+) -> CleanupReport:
+    """
+    Normalize legacy course term fields before enforcing the compound unique index.
+
+    Older crawls may have stored academic_year / academic_semester as strings.
+    MongoDB treats "1" and 1 as different unique-index values, so repeated crawls
+    can create logical duplicates. Keep the newest document for each normalized
+    term/course identity and rewrite its term fields as integers.
+
+    Normalization and grouping run on the server (course_term_cleanup_pipeline);
+    only the affected groups reach Python, and fixes are sent as unordered
+    bulk writes of `batch_size` operations. With `dry_run`, nothing is written.
+    """
+    report = CleanupReport(collection=collection.name)
+    ops: list[Any] = []
+
+    def flush() -> None:
+        if ops and not dry_run:
+            collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+    for group in collection.aggregate(course_term_cleanup_pipeline(), allowDiskUse=True):
+        identity = group["_id"]
+        report.groups += 1
+        report.duplicates += len(group["duplicates"])
+        if len(report.samples) < sample_size:
+            report.samples.append(
+                {**identity, "rewrite": group["rewrite"], "duplicates": len(group["duplicates"])}
+            )
+
+        if group["duplicates"]:
+            ops.append(DeleteMany({"_id": {"$in": group["duplicates"]}}))
+        if group["rewrite"]:
+            report.rewritten += 1
+            ops.append(
+                UpdateOne(
+                    {"_id": group["keep"]},
+                    {
+                        "$set": {
+                            "academic_year": identity["academic_year"],
+                            "academic_semester": identity["academic_semester"],
+                        }
+                    },
+                )
+            )
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+
+    if report.groups:
+        report.log(dry_run)
+    return report
+
+
+def cleanup_course_term_documents_reference(collection) -> None:
+    """
+    Original client-side cleanup: streams every document into Python and
+    issues one delete_many / update_one per affected group. Kept as the
+    baseline for benchmarks/term_cleanup.py.
+    """
+    grouped_docs: dict[tuple[int, int, str], list[dict[str, Any]]] = {}
+
+    for doc in collection.find(
+        {
+            "academic_year": {"$exists": True},
+            "academic_semester": {"$exists": True},
+            "course_code": {"$exists": True},
+        },
+        {"_id": 1, "academic_year": 1, "academic_semester": 1, "course_code": 1},
+    ):
+        academic_year = parse_numeric_term(doc.get("academic_year"))
+        academic_semester = parse_numeric_term(doc.get("academic_semester"))
+        course_code = str(doc.get("course_code", "")).strip()
+        if academic_year is None or academic_semester is None or not course_code:
+            continue
+
+        grouped_docs.setdefault(
+            (academic_year, academic_semester, course_code), []
+        ).append(doc)
+
+    normalized_count = 0
+    duplicate_count = 0
+
+    for (academic_year, academic_semester, _course_code), docs in grouped_docs.items():
+        canonical_docs = [
+            doc
+            for doc in docs
+            if doc.get("academic_year") == academic_year
+            and doc.get("academic_semester") == academic_semester
+        ]
+        keep_doc = max(canonical_docs or docs, key=lambda doc: str(doc["_id"]))
+        duplicate_ids = [doc["_id"] for doc in docs if doc["_id"] != keep_doc["_id"]]
+
+        if duplicate_ids:
+            delete_result = collection.delete_many({"_id": {"$in": duplicate_ids}})
+            duplicate_count += delete_result.deleted_count
+
+        if (
+            keep_doc.get("academic_year") != academic_year
+            or keep_doc.get("academic_semester") != academic_semester
+        ):
+            collection.update_one(
+                {"_id": keep_doc["_id"]},
+                {
+                    "$set": {
+                        "academic_year": academic_year,
+                        "academic_semester": academic_semester,
+                    }
+                },
+            )
+            normalized_count += 1
+
+    if duplicate_count or normalized_count:
+        logger.info(
+            f"Normalized course term documents in {collection.name}: "
+            f"{normalized_count} updated, {duplicate_count} duplicates removed"
+        )
+
+
+def report_course_term_fields(database: Database) -> None:
+    for base_name in COURSE_TERM_COLLECTIONS:
+        report = cleanup_course_term_documents(
+            database[config.get_collection_name(base_name)], dry_run=True
+        )
+        if not report.groups:
+            logger.info(f"[migrations] {report.collection}: nothing to normalize")
+
+
+@migration(1, "normalize_course_term_fields", dry_run=report_course_term_fields)
+def normalize_course_term_fields(database: Database) -> None:
+    """Rewrite string-typed terms as integers and drop duplicate courses."""
+    for base_name in COURSE_TERM_COLLECTIONS:
+        cleanup_course_term_documents(database[config.get_collection_name(base_name)])
+
+
+@migration(2, "course_term_unique_index")
+def create_course_term_unique_index(database: Database) -> None:
+    """Replace legacy course_code uniqueness with term-aware uniqueness."""
+    for base_name in COURSE_TERM_COLLECTIONS:
+        collection = database[config.get_collection_name(base_name)]
+        for index_name, index_info in collection.index_information().items():
+            if index_name == "_id_":
+                continue
+            if index_info.get("key") == [("course_code", 1)] and index_info.get("unique"):
+                logger.warning(
+                    f"Dropping legacy unique index '{index_name}' on {collection.name} "
+                    "before creating term-aware index."
+                )
+                collection.drop_index(index_name)
+
+        collection.create_index(
+            COURSE_TERM_INDEX,
+            unique=True,
+            name=COURSE_TERM_INDEX_NAME,
+        )
+
+
+def current_courses_view_pipeline(generations_collection: str) -> list[dict]:
+    """
+    Pipeline of the `courses_current` view: each term's courses as of its
+    last committed crawl generation.
+
+    A course is visible when it existed at the committed generation
+    (created_generation <= committed) and was seen by that crawl or a later
+    running one (crawl_generation >= committed). Courses added by a running
+    crawl stay hidden and stale ones disappear as soon as the crawl commits.
+    Terms without a committed generation are shown as stored.
+
+    Only membership is switched at commit: documents are not versioned, so
+    a changed course is updated in place and its new content is visible as
+    soon as its batch is written, before the term commits.
+    """
+    return [
+        {
+            "$lookup": {
+                "from": generations_collection,
+                "let": {"year": "$academic_year", "semester": "$academic_semester"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {
+                                "$and": [
+                                    {"$eq": ["$academic_year", "$$year"]},
+                                    {"$eq": ["$academic_semester", "$$semester"]},
+                                ]
+                            }
+                        }
+                    },
+                    {"$project": {"_id": 0, "generation": 1}},
+                ],
+                "as": "_committed",
+            }
+        },
+        {
+            "$match": {
+                "$expr": {
+                    "$let": {
+                        "vars": {
+                            "committed": {"$arrayElemAt": ["$_committed.generation", 0]}
+                        },
+                        "in": {
+                            "$or": [
+                                {"$eq": [{"$ifNull": ["$$committed", None]}, None]},
+                                {
+                                    "$and": [
+                                        {
+                                            "$lte": [
+                                                {"$ifNull": ["$created_generation", 0]},
+                                                "$$committed",
+                                            ]
+                                        },
+                                        {
+                                            "$gte": [
+                                                {"$ifNull": ["$crawl_generation", 0]},
+                                                "$$committed",
+                                            ]
+                                        },
+                                    ]
+                                },
+                            ]
+                        },
+                    }
+                }
+            }
+        },
+        {"$project": {"_committed": 0}},
+    ]
+
+
+@migration(3, "course_crawl_generations")
+def create_course_generation_index_and_view(database: Database) -> None:
+    """Index courses by crawl generation and create the courses_current view."""
+    courses = database[config.get_collection_name("courses")]
+    courses.create_index(COURSE_GENERATION_INDEX, name=COURSE_GENERATION_INDEX_NAME)
+
+    view_name = config.get_collection_name(CURRENT_COURSES_VIEW)
+    pipeline = current_courses_view_pipeline(
+        config.get_collection_name(TERM_GENERATIONS_COLLECTION)
+    )
+    if view_name in database.list_collection_names(filter={"name": view_name}):
+        database.command("collMod", view_name, viewOn=courses.name, pipeline=pipeline)
+    else:
+        database.command("create", view_name, viewOn=courses.name, pipeline=pipeline)
+
+
+@migration(4, "course_changes_indexes")
+def create_course_changes_indexes(database: Database) -> None:
+    """
+    Index the course change log by sequence number and expire old entries.
+
+    The TTL comes from COURSE_CHANGES_TTL_DAYS when this migration runs; to
+    change it later, use collMod on the `created_at_ttl` index.
+    """
+    changes = database[config.get_collection_name(COURSE_CHANGES_COLLECTION)]
+    changes.create_index("seq", unique=True, name="seq_unique")
+    changes.create_index(
+        "created_at",
+        expireAfterSeconds=config.course_changes_ttl_days * 24 * 60 * 60,
+        name="created_at_ttl",
+    )
+    changes.create_index(
+        [("academic_year", 1), ("academic_semester", 1), ("course_code", 1), ("seq", 1)],
+        name="course_seq",
+    )
+
+
+def latest_enrollment_dates_pipeline(
+    academic_year: int, academic_semester: int, course_codes: list[str]
+) -> list[dict]:
+    """Pipeline returning {_id: course_code, latest: date} per stored course."""
+    return [
+        {
+            "$match": {
+                "course.academic_year": academic_year,
+                "course.academic_semester": academic_semester,
+                "course.course_code": {"$in": course_codes},
+            }
+        },
+        {"$group": {"_id": "$course.course_code", "latest": {"$max": "$date"}}},
+    ]
+
+
+def create_enrollment_history_collection(database: Database):
+    """Create the enrollment_history time-series collection if missing."""
+    name = config.get_collection_name(ENROLLMENT_HISTORY_COLLECTION)
+    if name not in database.list_collection_names(filter={"name": name}):
+        database.create_collection(
+            name,
+            timeseries={"timeField": "date", "metaField": "course", "granularity": "hours"},
+        )
+    history = database[name]
+    history.create_index(ENROLLMENT_HISTORY_INDEX, name=ENROLLMENT_HISTORY_INDEX_NAME)
+    return history
+
+
+def backfill_enrollment_history(
+    courses, history, batch_size: int = 1000
+) -> tuple[int, int]:
+    """
+    Copy `selection_records` arrays of `courses` into `history`.
+
+    Points are inserted per course in date order and only after the latest
+    stored date, so a re-run after a crash resumes without duplicates.
+    Returns (courses read, points inserted).
+    """
+    def flush(batch: list[CourseRecord]) -> int:
+        ops = []
+        by_term: dict[tuple[int, int], list[CourseRecord]] = {}
+        for record in batch:
+            by_term.setdefault((record.academic_year, record.academic_semester), []).append(
+                record
+            )
+        for (academic_year, academic_semester), records in by_term.items():
+            latest = {
+                item["_id"]: item["latest"]
+                for item in history.aggregate(
+                    latest_enrollment_dates_pipeline(
+                        academic_year,
+                        academic_semester,
+                        [record.course_code for record in records],
+                    )
+                )
+            }
+            for record in records:
+                stored = latest.get(record.course_code)
+                if stored is not None and stored.tzinfo is None:
+                    stored = stored.replace(tzinfo=timezone.utc)
+                ops += [
+                    InsertOne(point)
+                    for point in record.enrollment_points()
+                    if stored is None or point["date"] > stored
+                ]
+        if ops:
+            history.bulk_write(ops, ordered=True)
+        return len(ops)
+
+    course_count = point_count = 0
+    batch: list[CourseRecord] = []
+    cursor = courses.find(
+        {"selection_records.0": {"$exists": True}},
+        {"academic_year": 1, "academic_semester": 1, "course_code": 1, "selection_records": 1},
+    ).sort([("academic_year", 1), ("academic_semester", 1), ("course_code", 1)])
+    for document in cursor:
+        batch.append(CourseRecord.from_row(document))
+        course_count += 1
+        if len(batch) >= batch_size:
+            point_count += flush(batch)
+            batch = []
+    if batch:
+        point_count += flush(batch)
+    return course_count, point_count
+
+
+def report_enrollment_history_backfill(database: Database) -> None:
+    courses = database[config.get_collection_name("courses")]
+    count = courses.count_documents({"selection_records": {"$exists": True}})
+    logger.info(
+        f"[migrations] {courses.name}: {count} documents would move selection_records "
+        f"to {config.get_collection_name(ENROLLMENT_HISTORY_COLLECTION)}"
+    )
+
+
+@migration(
+    5, "enrollment_history_timeseries", dry_run=report_enrollment_history_backfill
+)
+def move_selection_records_to_enrollment_history(database: Database) -> None:
+    """
+    Move course enrollment histories into the enrollment_history time-series
+    collection and keep only the latest snapshot on course documents.
+    """
+    history = create_enrollment_history_collection(database)
+    courses = database[config.get_collection_name("courses")]
+    course_count, point_count = backfill_enrollment_history(courses, history)
+    logger.info(
+        f"[migrations] {history.name}: backfilled {point_count} points "
+        f"from {course_count} courses"
+    )
+
+    result = courses.update_many(
+        {"selection_records": {"$exists": True}},
+        [
+            {
+                "$set": {
+                    "latest_selection": {
+                        "$ifNull": [{"$last": "$selection_records"}, None]
+                    }
+                }
+            },
+            {"$unset": "selection_records"},
+        ],
+    )
+    logger.info(
+        f"[migrations] {courses.name}: replaced selection_records with "
+        f"latest_selection on {result.modified_count} documents"
+    )
+
+
+def main() -> None:
+    from db import get_database
+
+    parser = argparse.ArgumentParser(description="Apply MongoDB schema migrations")
+    parser.add_argument(
+        "--status", action="store_true", help="list migrations without applying them"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report what pending migrations would change without applying them",
+    )
+    args = parser.parse_args()
+
+    database = get_database()
+    if args.dry_run:
+        done = applied_versions(database)
+        for item in MIGRATIONS:
+            if item.version in done:
+                continue
+            logger.info(f"[migrations] Pending {item.version}: {item.name}")
+            if item.dry_run is not None:
+                item.dry_run(database)
+        return
+
+    if args.status:
+        done = applied_versions(database)
+        for item in MIGRATIONS:
+            state = "applied" if item.version in done else "pending"
+            logger.info(f"[migrations] {item.version:>3} {item.name:<40} {state}")
+        return
+
+    applied = run_migrations(database)
+    logger.info(f"[migrations] {len(applied)} migrations applied")
+
+
+if __name__ == "__main__":
+    from utils.logger import setup_logger
+
+    setup_logger()
+    main()
@@ -0,0 +1,259 @@
+"""
+Shared, content-addressed cache of the open-data course CSV.
+
+`/opendatadownload/list/{year}/{semester}/` is the largest file the
+crawlers download, and both crawl_course and crawl_departments need it.
+`get_course_csv` downloads each term's CSV at most once per
+OPEN_DATA_CACHE_TTL seconds and parses it once per process; every caller
+gets a copy of the same typed DataFrame.
+
+Raw bytes are stored on disk under their SHA-256 hash, with a small JSON
+index per term:
+
+    .cache/open_data/blobs/<sha256>.csv
+    .cache/open_data/115-1.json   {"hash": ..., "encoding": ..., "fetched_at": ...}
+
+`CourseCsv.changed` tells whether the content differs from the copy whose
+courses were last saved completely (`mark_course_csv_saved`, called by
+crawl_course once a term is committed). That hash is kept by the storage
+backend next to the term's committed generation, not in this local cache,
+so it survives runs on fresh machines (e.g. CI runners). A crawl that fails
+half-way does not mark its copy, so the next run still sees the change.
+When a download fails, the last stored copy is used.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from config import config
+from utils.http_client import get_http_client
+from utils.logger import get_logger
+from utils.storage import get_storage
+
+logger = get_logger(__name__)
+
+COURSE_CSV_DTYPES = {"選課代碼": str, "開課系所代碼": str}
+
+
+@dataclass
+class CourseCsv:
+    """One term's open-data CSV as stored and parsed."""
+
+    academic_year: str
+    academic_semester: str
+    content_hash: str
+    changed: bool
+    downloaded: bool
+    loaded_at: float
+    table: pd.DataFrame
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """A copy of the parsed table, safe for the caller to modify."""
+        return self.table.copy()
+
+
+def parse_course_csv(body: bytes, encoding: str) -> pd.DataFrame:
+    return pd.read_csv(
+        io.StringIO(body.decode(encoding, errors="replace")),
+        dtype=COURSE_CSV_DTYPES,
+        on_bad_lines="skip",
+    )
+
+
+class CourseCsvStore:
+    """Content-addressed blobs plus a per-term index on local disk."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _index_path(self, term_label: str) -> str:
+        return os.path.join(self.directory, f"{term_label}.json")
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "blobs", f"{content_hash}.csv")
+
+    def read_index(self, term_label: str) -> dict:
+        try:
+            with open(self._index_path(term_label), encoding="utf-8") as index_file:
+                return json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def read_blob(self, content_hash: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(content_hash), "rb") as blob_file:
+                body = blob_file.read()
+        except FileNotFoundError:
+            return None
+        # A truncated or edited blob no longer matches its name.
+        if hashlib.sha256(body).hexdigest() != content_hash:
+            return None
+        return body
+
+    def write(self, term_label: str, body: bytes, encoding: str) -> str:
+        """Store `body` and point the term at it; returns its content hash."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            _write_atomic(blob_path, body)
+
+        index = self.read_index(term_label)
+        previous_hash = index.get("hash")
+        index.update(hash=content_hash, encoding=encoding, fetched_at=time.time())
+        _write_atomic(
+            self._index_path(term_label), json.dumps(index).encode("utf-8")
+        )
+        if previous_hash and previous_hash != content_hash:
+            self._remove_unreferenced(previous_hash)
+        return content_hash
+
+    def _remove_unreferenced(self, content_hash: str) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                if self.read_index(name[: -len(".json")]).get("hash") == content_hash:
+                    return
+        try:
+            os.remove(self._blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as output:
+        output.write(data)
+    os.replace(temp_path, path)
+
+
+_loaded: dict[tuple[str, str], CourseCsv] = {}
+_pending: dict[tuple[str, str], asyncio.Future] = {}
+
+
+async def get_course_csv(academic_year: str, academic_semester: str) -> CourseCsv:
+    """
+    Return the open-data CSV of a term.
+
+    Concurrent callers share one download. Raises when there is neither a
+    successful download nor a stored copy.
+    """
+    key = (academic_year, academic_semester)
+    loaded = _loaded.get(key)
+    if loaded is not None and time.time() - loaded.loaded_at < config.open_data_cache_ttl:
+        return loaded
+
+    pending = _pending.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _pending[key] = future
+    try:
+        course_csv = await _load_course_csv(academic_year, academic_semester)
+    except BaseException as e:
+        future.set_exception(e)
+        # Retrieved here so a failure without other waiters is not logged as unhandled.
+        future.exception()
+        raise
+    else:
+        _loaded[key] = course_csv
+        future.set_result(course_csv)
+        return course_csv
+    finally:
+        del _pending[key]
+
+
+async def mark_course_csv_saved(course_csv: CourseCsv) -> None:
+    """
+    Record that the courses of `course_csv`'s term were saved from it, so
+    later loads of the same content report `changed=False`.
+    """
+    await get_storage().save_course_csv_hash(
+        course_csv.academic_year, course_csv.academic_semester, course_csv.content_hash
+    )
+    loaded = _loaded.get((course_csv.academic_year, course_csv.academic_semester))
+    if loaded is not None and loaded.content_hash == course_csv.content_hash:
+        loaded.changed = False
+    course_csv.changed = False
+
+
+async def _load_course_csv(academic_year: str, academic_semester: str) -> CourseCsv:
+    term_label = f"{academic_year}-{academic_semester}"
+    store = CourseCsvStore(config.open_data_cache_dir)
+    index = await asyncio.to_thread(store.read_index, term_label)
+    previous_hash = index.get("hash")
+
+    body: Optional[bytes] = None
+    encoding = index.get("encoding") or "utf-8"
+    downloaded = False
+    fresh = time.time() - index.get("fetched_at", 0) < config.open_data_cache_ttl
+    if previous_hash and fresh:
+        body = await asyncio.to_thread(store.read_blob, previous_hash)
+
+    if body is None:
+        url = f"{config.base_url}/opendatadownload/list/{academic_year}/{academic_semester}/"
+        started = time.perf_counter()
+        try:
+            body, encoding = await get_http_client().fetch_bytes(url)
+            downloaded = True
+            logger.info(
+                f"[open_data] Downloaded {term_label} CSV ({len(body) / 1024:.0f} KiB) "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        except Exception as e:
+            body = (
+                await asyncio.to_thread(store.read_blob, previous_hash)
+                if previous_hash
+                else None
+            )
+            if body is None:
+                raise
+            logger.warning(
+                f"[open_data] Could not download {term_label} CSV ({e}); "
+                "using the stored copy"
+            )
+
+    if downloaded:
+        content_hash = await asyncio.to_thread(store.write, term_label, body, encoding)
+    else:
+        content_hash = previous_hash
+    changed = content_hash != await _saved_course_csv_hash(
+        academic_year, academic_semester
+    )
+    df = await asyncio.to_thread(parse_course_csv, body, encoding)
+    logger.info(
+        f"[open_data] {term_label} CSV: {len(df)} rows, "
+        f"{'changed' if changed else 'unchanged'} since the last saved crawl"
+        f"{'' if downloaded else ' (stored copy)'}"
+    )
+    return CourseCsv(
+        academic_year=academic_year,
+        academic_semester=academic_semester,
+        content_hash=content_hash,
+        changed=changed,
+        downloaded=downloaded,
+        loaded_at=time.time(),
+        table=df,
+    )
+
+
+async def _saved_course_csv_hash(
+    academic_year: str, academic_semester: str
+) -> Optional[str]:
+    try:
+        return await get_storage().get_course_csv_hash(academic_year, academic_semester)
+    except Exception as e:
+        logger.warning(
+            f"[open_data] Could not read the saved {academic_year}-{academic_semester} "
+            f"CSV hash ({e}); treating the CSV as changed"
+        )
+        return None
@@ -0,0 +1,228 @@
+"""
+Revalidation cache for course detail pages.
+
+Stores the HTTP validators (ETag / Last-Modified) and a hash of the response
+body for every (academic_year, academic_semester, course_code). The course
+crawler sends conditional requests with these validators and skips parsing
+and saving pages that have not changed since the previous run.
+
+Two storage backends are provided: a JSON file per term on local disk, and a
+MongoDB collection for ephemeral runners that lose their disk between runs.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PageValidators:
+    """Validators remembered for one course detail page."""
+
+    etag: str = ""
+    last_modified: str = ""
+    body_hash: str = ""
+    parser_version: int = 0
+
+
+def hash_page_body(body: bytes) -> str:
+    """Return a stable content hash for a raw response body."""
+    return hashlib.sha256(body).hexdigest()
+
+
+class PageCache:
+    """
+    In-memory view of the validators for one academic term.
+
+    `load` reads every stored entry for the term once, lookups are served from
+    memory, and `put` only stages new validators. Staged validators are
+    persisted by `flush`, which the crawler calls after the parsed courses
+    have been saved, so a failed save never marks a page as up to date.
+    """
+
+    def __init__(self, parser_version: int) -> None:
+        self.parser_version = parser_version
+        self._entries: dict[str, PageValidators] = {}
+        self._pending: dict[str, PageValidators] = {}
+        self._term: Optional[tuple[int, int]] = None
+
+    def load(
+        self,
+        academic_year: str,
+        academic_semester: str,
+        known_codes: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Load cached validators for a term.
+
+        Entries for codes missing from `known_codes` are ignored, because a page
+        can only be skipped when its course document already exists.
+        """
+        self._term = (int(academic_year), int(academic_semester))
+        self._pending = {}
+        entries = self._read_term(*self._term)
+        if known_codes is not None:
+            known = set(known_codes)
+            entries = {code: entry for code, entry in entries.items() if code in known}
+        self._entries = {
+            code: entry
+            for code, entry in entries.items()
+            if entry.parser_version == self.parser_version
+        }
+        logger.info(
+            f"[page_cache] Loaded {len(self._entries)} cached validators for "
+            f"{self._term[0]}-{self._term[1]}"
+        )
+
+    def get(self, course_code: str) -> Optional[PageValidators]:
+        return self._entries.get(course_code)
+
+    def put(self, course_code: str, validators: PageValidators) -> None:
+        validators.parser_version = self.parser_version
+        self._pending[course_code] = validators
+
+    def discard(self, course_codes: Iterable[str]) -> None:
+        """Drop staged validators, e.g. for courses that were not saved."""
+        for course_code in course_codes:
+            self._pending.pop(course_code, None)
+
+    def flush(self, course_codes: Optional[Iterable[str]] = None) -> None:
+        """
+        Persist staged validators for the loaded term.
+
+        With `course_codes`, only those codes are persisted, e.g. the courses
+        of one batch that was just written.
+        """
+        if self._term is None or not self._pending:
+            return
+        if course_codes is None:
+            entries, self._pending = self._pending, {}
+        else:
+            entries = {
+                code: self._pending.pop(code)
+                for code in course_codes
+                if code in self._pending
+            }
+        if not entries:
+            return
+        self._write_term(*self._term, entries)
+        logger.debug(f"[page_cache] Stored {len(entries)} page validators")
+        self._entries.update(entries)
+
+    def _read_term(
+        self, academic_year: int, academic_semester: int
+    ) -> dict[str, PageValidators]:
+        return {}
+
+    def _write_term(
+        self,
+        academic_year: int,
+        academic_semester: int,
+        entries: dict[str, PageValidators],
+    ) -> None:
+        return None
+
+
+class DiskPageCache(PageCache):
+    """Stores validators as one JSON file per term under `cache_dir`."""
+
+    def __init__(self, cache_dir: str, parser_version: int) -> None:
+        super().__init__(parser_version)
+        self.cache_dir = cache_dir
+
+    def _term_path(self, academic_year: int, academic_semester: int) -> str:
+        return os.path.join(self.cache_dir, f"{academic_year}-{academic_semester}.json")
+
+    def _read_term(
+        self, academic_year: int, academic_semester: int
+    ) -> dict[str, PageValidators]:
+        path = self._term_path(academic_year, academic_semester)
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                raw_entries: dict[str, dict[str, Any]] = json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"[page_cache] Ignoring unreadable cache file {path}: {e}")
+            return {}
+        return {
+            code: PageValidators(**raw_entry) for code, raw_entry in raw_entries.items()
+        }
+
+    def _write_term(
+        self,
+        academic_year: int,
+        academic_semester: int,
+        entries: dict[str, PageValidators],
+    ) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        merged = self._read_term(academic_year, academic_semester)
+        merged.update(entries)
+
+        path = self._term_path(academic_year, academic_semester)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(
+                {code: asdict(entry) for code, entry in merged.items()},
+                cache_file,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+
+class MongoPageCache(PageCache):
+    """Stores validators in a MongoDB collection, one document per page."""
+
+    def __init__(self, collection, parser_version: int) -> None:
+        super().__init__(parser_version)
+        self.collection = collection
+
+    def _read_term(
+        self, academic_year: int, academic_semester: int
+    ) -> dict[str, PageValidators]:
+        self.collection.create_index(
+            [("academic_year", 1), ("academic_semester", 1), ("course_code", 1)],
+            unique=True,
+        )
+        entries: dict[str, PageValidators] = {}
+        for doc in self.collection.find(
+            {"academic_year": academic_year, "academic_semester": academic_semester},
+            {"_id": 0, "course_code": 1, "etag": 1, "last_modified": 1,
+             "body_hash": 1, "parser_version": 1},
+        ):
+            entries[doc["course_code"]] = PageValidators(
+                etag=doc.get("etag", ""),
+                last_modified=doc.get("last_modified", ""),
+                body_hash=doc.get("body_hash", ""),
+                parser_version=doc.get("parser_version", 0),
+            )
+        return entries
+
+    def _write_term(
+        self,
+        academic_year: int,
+        academic_semester: int,
+        entries: dict[str, PageValidators],
+    ) -> None:
+        from pymongo import UpdateOne
+
+        ops = [
+            UpdateOne(
+                {
+                    "academic_year": academic_year,
+                    "academic_semester": academic_semester,
+                    "course_code": course_code,
+                },
+                {"$set": asdict(entry)},
+                upsert=True,
+            )
+            for course_code, entry in entries.items()
+        ]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
@@ -0,0 +1,41 @@
+"""
+Process-wide pool for parsing course detail pages.
+
+The pool is created on first use and kept between crawls, so a resident
+process (`main.py --daemon`) does not start PARSE_WORKERS new interpreters
+every cycle. Entry points shut it down with `close_parse_pool()`.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from config import config
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> Optional[Executor]:
+    """Return the shared parse pool, or None when PARSE_WORKERS is 0."""
+    global _parse_pool
+    if config.parse_workers <= 0:
+        return None
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=config.parse_workers)
+    return _parse_pool
+
+
+def discard_parse_pool(pool: Executor) -> None:
+    """Drop a broken pool so the next crawl starts a fresh one."""
+    global _parse_pool
+    if pool is _parse_pool:
+        _parse_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def close_parse_pool() -> None:
+    """Shut the shared pool down and wait for its workers to exit."""
+    global _parse_pool
+    if _parse_pool is None:
+        return
+    pool, _parse_pool = _parse_pool, None
+    pool.shutdown(cancel_futures=True)
@@ -0,0 +1,139 @@
+"""
+In-process stage orchestrator.
+
+Stages form a dependency graph and run as tasks on one event loop, so
+stages without a dependency between them overlap and share the pooled HTTP
+client and database clients. A stage starts once all of its selected
+dependencies succeeded; a failed stage skips everything that depends on it
+but leaves independent stages running.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One crawler stage. `run` returning False counts as a failure, like an
+    exception.
+    """
+
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str = "pending"  # ok / failed / skipped
+    seconds: float = 0.0
+    error: str = ""
+
+
+def select_stages(
+    stages: list[Stage],
+    only: Optional[Iterable[str]] = None,
+    skip: Optional[Iterable[str]] = None,
+) -> list[Stage]:
+    """
+    Validate the graph and return the stages to run, in dependency order.
+
+    Dependencies left out by `only` / `skip` are treated as satisfied.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Duplicate stage names")
+    only_names = set(only or ())
+    skip_names = set(skip or ())
+    for name in only_names | skip_names:
+        if name not in by_name:
+            raise ValueError(f"Unknown stage: {name}")
+    for stage in stages:
+        for dependency in stage.depends_on:
+            if dependency not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+
+    ordered: list[Stage] = []
+    visiting: set[str] = set()
+    visited: set[str] = set()
+
+    def visit(stage: Stage) -> None:
+        if stage.name in visited:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Stage dependency cycle through {stage.name}")
+        visiting.add(stage.name)
+        for dependency in stage.depends_on:
+            visit(by_name[dependency])
+        visiting.discard(stage.name)
+        visited.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+
+    return [
+        stage
+        for stage in ordered
+        if (not only_names or stage.name in only_names) and stage.name not in skip_names
+    ]
+
+
+async def run_stages(
+    stages: list[Stage],
+    only: Optional[Iterable[str]] = None,
+    skip: Optional[Iterable[str]] = None,
+) -> dict[str, StageResult]:
+    """Run the selected stages concurrently along the graph; returns their results."""
+    selected = select_stages(stages, only, skip)
+    results = {stage.name: StageResult(stage.name) for stage in selected}
+    tasks: dict[str, asyncio.Task[bool]] = {}
+
+    async def run_stage(stage: Stage) -> bool:
+        result = results[stage.name]
+        dependencies = [tasks[name] for name in stage.depends_on if name in tasks]
+        if dependencies and not all(await asyncio.gather(*dependencies)):
+            result.status = "skipped"
+            result.error = "dependency failed"
+            logger.warning(f"[pipeline] Skipping {stage.name}: a dependency failed")
+            return False
+
+        logger.info(f"[pipeline] Starting {stage.name}")
+        started = time.perf_counter()
+        try:
+            succeeded = await stage.run() is not False
+        except Exception as e:
+            logger.error(f"[pipeline] {stage.name} failed: {e}")
+            result.error = str(e)
+            succeeded = False
+        result.seconds = time.perf_counter() - started
+        result.status = "ok" if succeeded else "failed"
+        logger.info(f"[pipeline] {stage.name} {result.status} in {result.seconds:.2f}s")
+        return succeeded
+
+    # Dependencies come first in `selected`, so their tasks exist already.
+    started = time.perf_counter()
+    for stage in selected:
+        tasks[stage.name] = asyncio.create_task(run_stage(stage), name=stage.name)
+    await asyncio.gather(*tasks.values())
+
+    log_stage_report(results.values(), time.perf_counter() - started)
+    return results
+
+
+def log_stage_report(results: Iterable[StageResult], total_seconds: float) -> None:
+    logger.info(f"[pipeline] {'stage':<20} {'status':<8} {'seconds':>8}")
+    for result in results:
+        logger.info(
+            f"[pipeline] {result.name:<20} {result.status:<8} {result.seconds:>8.2f}"
+            + (f"  ({result.error})" if result.error else "")
+        )
+    logger.info(f"[pipeline] {'total (wall)':<20} {'':<8} {total_seconds:>8.2f}")
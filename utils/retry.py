@@ -0,0 +1,92 @@
+"""
+Retry helpers for crawler requests: jittered exponential backoff and a
+circuit breaker that pauses a whole crawl while the server is failing.
+"""
+
+import asyncio
+import random
+from collections import deque
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Return a "full jitter" exponential backoff delay for a retry attempt.
+
+    `attempt` starts at 1 for the first retry.
+    """
+    ceiling = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Term-wide circuit breaker.
+
+    Tracks the outcome of the last `window_size` requests. When at least
+    `min_samples` were recorded and the error rate reaches `error_threshold`,
+    the breaker opens and every caller of `wait_if_open` is held for `pause`
+    seconds. Consecutive trips double the pause up to `max_pause`.
+    """
+
+    def __init__(
+        self,
+        error_threshold: float = 0.5,
+        window_size: int = 50,
+        min_samples: int = 20,
+        pause: float = 30.0,
+        max_pause: float = 300.0,
+        name: str = "circuit_breaker",
+    ) -> None:
+        self.error_threshold = error_threshold
+        self.min_samples = min(min_samples, window_size)
+        self.pause = pause
+        self.max_pause = max_pause
+        self.name = name
+
+        self.trips = 0
+        self._results: deque[bool] = deque(maxlen=window_size)
+        self._consecutive_trips = 0
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closed.is_set()
+
+    def record(self, success: bool) -> None:
+        """Record one request outcome and open the breaker if needed."""
+        if self.is_open:
+            return
+        self._results.append(success)
+        if success:
+            self._consecutive_trips = 0
+            return
+        if len(self._results) < self.min_samples:
+            return
+
+        error_rate = self._results.count(False) / len(self._results)
+        if error_rate >= self.error_threshold:
+            self._open(error_rate)
+
+    async def wait_if_open(self) -> None:
+        await self._closed.wait()
+
+    def _open(self, error_rate: float) -> None:
+        self.trips += 1
+        self._consecutive_trips += 1
+        pause = min(self.max_pause, self.pause * 2 ** (self._consecutive_trips - 1))
+        logger.warning(
+            f"[{self.name}] Error rate {error_rate:.0%} over the last "
+            f"{len(self._results)} requests; pausing crawl for {pause:.0f}s"
+        )
+        self._closed.clear()
+        asyncio.get_running_loop().call_later(pause, self._close)
+
+    def _close(self) -> None:
+        self._results.clear()
+        self._closed.set()
+        logger.info(f"[{self.name}] Resuming crawl")
@@ -0,0 +1,98 @@
+"""
+Course selection windows and when the daemon crawls around them.
+
+crawl_schedule stores one row per selection stage with ISO 8601
+`start_time` / `end_time` (Asia/Taipei). While a window is open,
+enrollment changes by the minute and the daemon polls every
+DAEMON_ACTIVE_INTERVAL seconds, plus one poll after it closes to catch the
+final numbers. Otherwise it only wakes for the next full sync or for the
+next window to open, whichever comes first.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from utils.datetime_to_timestamp import TAIPEI_TZ
+
+
+@dataclass(frozen=True)
+class SelectionWindow:
+    """One course selection stage, e.g. 第一階段選課."""
+
+    stage: str
+    start: datetime
+    end: datetime
+
+    def is_open(self, now: datetime, grace: timedelta = timedelta(0)) -> bool:
+        return self.start <= now < self.end + grace
+
+
+@dataclass(frozen=True)
+class Wake:
+    """When the daemon should look again, and the window opening then (if any)."""
+
+    at: datetime
+    opening: Optional[SelectionWindow] = None
+
+
+def now_in_taipei() -> datetime:
+    return datetime.now(TAIPEI_TZ)
+
+
+def _parse_time(value: Any) -> datetime:
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=TAIPEI_TZ)
+    return moment
+
+
+def parse_selection_windows(rows: Iterable[dict]) -> list[SelectionWindow]:
+    """
+    Build windows from stored course_schedule rows, ordered by start.
+
+    Rows whose 起迄時間 could not be parsed (start_time / end_time None) are
+    skipped.
+    """
+    windows = []
+    for row in rows:
+        try:
+            start = _parse_time(row["start_time"])
+            end = _parse_time(row["end_time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if end > start:
+            windows.append(SelectionWindow(str(row.get("course_stage", "")), start, end))
+    return sorted(windows, key=lambda window: window.start)
+
+
+def open_window(
+    windows: Iterable[SelectionWindow], now: datetime, grace: timedelta
+) -> Optional[SelectionWindow]:
+    """Return the window open at `now`, counting `grace` after it closes."""
+    for window in windows:
+        if window.is_open(now, grace):
+            return window
+    return None
+
+
+def next_wake(
+    windows: list[SelectionWindow],
+    now: datetime,
+    next_full_sync: datetime,
+    active_interval: timedelta,
+) -> Wake:
+    """
+    Plan the next wake-up after a cycle finished at `now`.
+
+    Inside a window (or its one-interval grace period) that is the next
+    poll; outside, the earlier of the next full sync and the next window
+    opening.
+    """
+    if open_window(windows, now, active_interval) is not None:
+        return Wake(min(now + active_interval, next_full_sync))
+
+    upcoming = next((window for window in windows if window.start > now), None)
+    if upcoming is not None and upcoming.start < next_full_sync:
+        return Wake(upcoming.start, upcoming)
+    return Wake(max(next_full_sync, now))
@@ -0,0 +1,767 @@
+"""
+Storage backends for crawler results.
+
+Crawlers save through the `Storage` returned by `get_storage()`, selected
+by STORAGE_BACKEND:
+
+- mongo: the MongoDB collections managed by `db.py` (default).
+- file: Parquet or JSONL files under STORAGE_DIR, for analytics exports
+  and runs without a MongoDB server.
+- memory: process-local dicts, for tests and benchmarks.
+
+The file and memory backends keep the courses collection semantics
+(content hashes, crawl generations, stale deletion and enrollment history);
+the course_changes log and the courses_current view are MongoDB only.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+
+from config import config
+from utils.course_record import CourseRecord, CourseWriteCounts, compute_content_hash
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STORAGE_BACKENDS = ("mongo", "file", "memory")
+FILE_FORMATS = ("parquet", "jsonl")
+
+Term = tuple[int, int]
+
+
+def _term(academic_year: str, academic_semester: str) -> Term:
+    return int(academic_year), int(academic_semester)
+
+
+class Storage(ABC):
+    """
+    Interface shared by the storage backends.
+
+    A backend missing one of the abstract methods fails when `get_storage()`
+    builds it, not on the first call.
+    """
+
+    name = "storage"
+
+    async def prepare_courses(self) -> None:
+        """Prepare the courses store (schema, indexes) before a term is saved."""
+
+    @abstractmethod
+    async def course_term_exists(self, academic_year: str, academic_semester: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def get_term_content_hashes(
+        self, academic_year: str, academic_semester: str
+    ) -> dict[str, str]:
+        """Return {course_code: content_hash} of the stored courses of a term."""
+
+    @abstractmethod
+    async def get_course_documents(
+        self, academic_year: str, academic_semester: str, course_codes: Iterable[str]
+    ) -> dict[str, dict]:
+        """Return {course_code: document} of the stored courses among `course_codes`."""
+
+    @abstractmethod
+    async def save_course_batch(
+        self,
+        records: list[CourseRecord],
+        existing_hashes: dict[str, str] | None = None,
+        generation: int | None = None,
+    ) -> CourseWriteCounts | None:
+        """
+        Save merged course records; see db.save_merged_course_batch_async.
+        Returns the new / changed / unchanged counts, or None on failure.
+        """
+
+    @abstractmethod
+    async def touch_course_generation(
+        self,
+        academic_year: str,
+        academic_semester: str,
+        course_codes: Iterable[str],
+        generation: int,
+    ) -> int:
+        """Stamp stored courses kept without rewriting with `generation`."""
+
+    @abstractmethod
+    async def commit_term_generation(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_stale_courses(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> int:
+        """Delete courses of a term that the crawl of `generation` did not see."""
+
+    @abstractmethod
+    async def get_course_csv_hash(
+        self, academic_year: str, academic_semester: str
+    ) -> str | None:
+        """Return the hash of the open-data CSV the term's courses were last saved from."""
+
+    @abstractmethod
+    async def save_course_csv_hash(
+        self, academic_year: str, academic_semester: str, content_hash: str
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def get_enrollment_history(
+        self, academic_year: str, academic_semester: str, course_code: str
+    ) -> list[dict]:
+        ...
+
+    @abstractmethod
+    async def save_course_schedule(self, df: pd.DataFrame) -> None:
+        ...
+
+    @abstractmethod
+    async def get_course_schedule(self) -> list[dict]:
+        """Return the saved selection schedule rows (course_stage, start_time, ...)."""
+
+    @abstractmethod
+    async def save_department_categories(self, df: pd.DataFrame) -> None:
+        ...
+
+    @abstractmethod
+    async def save_departments(self, df: pd.DataFrame) -> None:
+        ...
+
+    async def warm_up(self) -> None:
+        """Open connections ahead of a crawl; nothing to do for local backends."""
+
+    async def close(self) -> None:
+        """Release clients and write out anything still buffered."""
+
+
+class MongoStorage(Storage):
+    """The MongoDB collections of `db.py`."""
+
+    name = "mongo"
+
+    def __init__(self) -> None:
+        # Imported here so the other backends run without DB_URI.
+        import db
+
+        self._db = db
+
+    async def prepare_courses(self) -> None:
+        await self._db.prepare_courses_collection_async()
+
+    async def course_term_exists(self, academic_year: str, academic_semester: str) -> bool:
+        return await self._db.course_term_exists_async(academic_year, academic_semester)
+
+    async def get_term_content_hashes(
+        self, academic_year: str, academic_semester: str
+    ) -> dict[str, str]:
+        return await self._db.get_term_content_hashes_async(
+            academic_year, academic_semester
+        )
+
+    async def get_course_documents(
+        self, academic_year: str, academic_semester: str, course_codes: Iterable[str]
+    ) -> dict[str, dict]:
+        return await self._db.get_course_documents_async(
+            academic_year, academic_semester, course_codes
+        )
+
+    async def save_course_batch(
+        self,
+        records: list[CourseRecord],
+        existing_hashes: dict[str, str] | None = None,
+        generation: int | None = None,
+    ) -> CourseWriteCounts | None:
+        return await self._db.save_merged_course_batch_async(
+            records, existing_hashes, generation
+        )
+
+    async def touch_course_generation(
+        self,
+        academic_year: str,
+        academic_semester: str,
+        course_codes: Iterable[str],
+        generation: int,
+    ) -> int:
+        return await self._db.touch_course_generation_async(
+            academic_year, academic_semester, course_codes, generation
+        )
+
+    async def commit_term_generation(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> None:
+        await self._db.commit_term_generation_async(
+            academic_year, academic_semester, generation
+        )
+
+    async def delete_stale_courses(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> int:
+        return await self._db.delete_stale_courses_async(
+            academic_year, academic_semester, generation
+        )
+
+    async def get_course_csv_hash(
+        self, academic_year: str, academic_semester: str
+    ) -> str | None:
+        return await self._db.get_course_csv_hash_async(academic_year, academic_semester)
+
+    async def save_course_csv_hash(
+        self, academic_year: str, academic_semester: str, content_hash: str
+    ) -> None:
+        await self._db.save_course_csv_hash_async(
+            academic_year, academic_semester, content_hash
+        )
+
+    async def get_enrollment_history(
+        self, academic_year: str, academic_semester: str, course_code: str
+    ) -> list[dict]:
+        return await self._db.get_enrollment_history_async(
+            academic_year, academic_semester, course_code
+        )
+
+    async def save_course_schedule(self, df: pd.DataFrame) -> None:
+        await self._db.save_course_schedule_to_db_async(df)
+
+    async def get_course_schedule(self) -> list[dict]:
+        return await self._db.get_course_schedule_async()
+
+    async def save_department_categories(self, df: pd.DataFrame) -> None:
+        await self._db.save_department_categories_to_db_async(df)
+
+    async def save_departments(self, df: pd.DataFrame) -> None:
+        await self._db.save_departments_to_db_async(df)
+
+    async def warm_up(self) -> None:
+        await self._db.ping_async()
+
+    async def close(self) -> None:
+        await self._db.close_async_client()
+
+
+class MemoryStorage(Storage):
+    """
+    Results kept in process memory.
+
+    Courses are stored per term as {course_code: document}, enrollment
+    history per term as {course_code: [point, ...]} in date order, and the
+    schedule / department tables as the last saved DataFrame.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.courses: dict[Term, dict[str, dict]] = {}
+        self.enrollment_history: dict[Term, dict[str, list[dict]]] = {}
+        self.generations: dict[Term, int] = {}
+        self.course_csv_hashes: dict[Term, str] = {}
+        self.tables: dict[str, pd.DataFrame] = {}
+
+    def _term_courses(self, term: Term) -> dict[str, dict]:
+        return self.courses.setdefault(term, {})
+
+    def _term_history(self, term: Term) -> dict[str, list[dict]]:
+        return self.enrollment_history.setdefault(term, {})
+
+    async def course_term_exists(self, academic_year: str, academic_semester: str) -> bool:
+        return bool(self._term_courses(_term(academic_year, academic_semester)))
+
+    async def get_term_content_hashes(
+        self, academic_year: str, academic_semester: str
+    ) -> dict[str, str]:
+        courses = self._term_courses(_term(academic_year, academic_semester))
+        return {code: doc.get("content_hash", "") for code, doc in courses.items()}
+
+    async def get_course_documents(
+        self, academic_year: str, academic_semester: str, course_codes: Iterable[str]
+    ) -> dict[str, dict]:
+        courses = self._term_courses(_term(academic_year, academic_semester))
+        return {code: dict(courses[code]) for code in course_codes if code in courses}
+
+    async def save_course_batch(
+        self,
+        records: list[CourseRecord],
+        existing_hashes: dict[str, str] | None = None,
+        generation: int | None = None,
+    ) -> CourseWriteCounts | None:
+        counts = CourseWriteCounts()
+        if existing_hashes is None:
+            existing_hashes = {}
+        for record in records:
+            term = (record.academic_year, record.academic_semester)
+            courses = self._term_courses(term)
+            document = record.to_document()
+            content_hash = compute_content_hash(document)
+            previous_hash = existing_hashes.get(record.course_code)
+            stored = courses.get(record.course_code)
+            if previous_hash == content_hash:
+                counts.unchanged += 1
+                if stored is not None and generation is not None:
+                    self._set_generation(term, stored, generation)
+                continue
+            if previous_hash is None:
+                counts.new += 1
+            else:
+                counts.changed += 1
+
+            self._add_enrollment_points(term, record)
+            document["content_hash"] = content_hash
+            if generation is not None:
+                document["crawl_generation"] = generation
+                document["created_generation"] = (
+                    stored.get("created_generation", generation)
+                    if stored is not None
+                    else generation
+                )
+            self._put_course(term, document)
+            existing_hashes[record.course_code] = content_hash
+        return counts
+
+    def _put_course(self, term: Term, document: dict) -> None:
+        self._term_courses(term)[document["course_code"]] = document
+
+    def _set_generation(self, term: Term, document: dict, generation: int) -> None:
+        document["crawl_generation"] = generation
+
+    def _add_enrollment_points(self, term: Term, record: CourseRecord) -> list[dict]:
+        """Append points newer than the stored ones; returns those appended."""
+        history = self._term_history(term).setdefault(record.course_code, [])
+        latest = history[-1]["date"] if history else None
+        points = [
+            {
+                "date": point["date"],
+                "enrolled": point["enrolled"],
+                "remaining": point["remaining"],
+                "registered": point["registered"],
+            }
+            for point in record.enrollment_points()
+            if latest is None or point["date"] > latest
+        ]
+        history.extend(points)
+        return points
+
+    async def touch_course_generation(
+        self,
+        academic_year: str,
+        academic_semester: str,
+        course_codes: Iterable[str],
+        generation: int,
+    ) -> int:
+        term = _term(academic_year, academic_semester)
+        courses = self._term_courses(term)
+        touched = 0
+        for code in course_codes:
+            document = courses.get(code)
+            if document is not None:
+                self._set_generation(term, document, generation)
+                touched += 1
+        return touched
+
+    async def commit_term_generation(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> None:
+        self.generations[_term(academic_year, academic_semester)] = generation
+
+    async def get_course_csv_hash(
+        self, academic_year: str, academic_semester: str
+    ) -> str | None:
+        return self.course_csv_hashes.get(_term(academic_year, academic_semester))
+
+    async def save_course_csv_hash(
+        self, academic_year: str, academic_semester: str, content_hash: str
+    ) -> None:
+        self.course_csv_hashes[_term(academic_year, academic_semester)] = content_hash
+
+    async def delete_stale_courses(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> int:
+        courses = self._term_courses(_term(academic_year, academic_semester))
+        stale = [
+            code
+            for code, document in courses.items()
+            if document.get("crawl_generation") != generation
+        ]
+        for code in stale:
+            del courses[code]
+        logger.info(f"[storage] Deleted {len(stale)} stale courses")
+        return len(stale)
+
+    async def get_enrollment_history(
+        self, academic_year: str, academic_semester: str, course_code: str
+    ) -> list[dict]:
+        history = self._term_history(_term(academic_year, academic_semester))
+        return [dict(point) for point in history.get(course_code, [])]
+
+    def _save_table(self, name: str, df: pd.DataFrame) -> None:
+        if df.empty:
+            logger.warning(f"[storage] {name} DataFrame is empty, skipping save.")
+            return
+        self.tables[name] = df.copy()
+        logger.info(f"[storage] Saved {len(df)} rows to {name}")
+
+    async def save_course_schedule(self, df: pd.DataFrame) -> None:
+        self._save_table("course_schedule", df)
+
+    async def get_course_schedule(self) -> list[dict]:
+        schedule = self.tables.get("course_schedule")
+        return [] if schedule is None else schedule.to_dict(orient="records")
+
+    async def save_department_categories(self, df: pd.DataFrame) -> None:
+        self._save_table("department_categories", df)
+
+    async def save_departments(self, df: pd.DataFrame) -> None:
+        self._save_table("departments", df)
+
+
+class FileStorage(MemoryStorage):
+    """
+    Results written as one file per term and table under `directory`:
+
+        courses/115-1.parquet
+        enrollment_history/115-1.parquet
+        course_schedule.parquet, departments.parquet, ...
+        term_generations.json
+
+    A term's files are loaded on first use and rewritten when the term
+    finishes (after its stale courses are deleted). Writes in between are
+    appended to `courses/115-1.pending.jsonl` and replayed on load, so a
+    resumed crawl still sees courses saved before an interruption.
+
+    Parquet files keep scalar fields as typed columns; nested fields
+    (teachers, grading_items, ...) are stored as JSON text, listed in the
+    `json_columns` schema metadata. Parquet needs pyarrow (uv add pyarrow).
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str, file_format: str = "jsonl") -> None:
+        super().__init__()
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown storage file format: {file_format}")
+        if file_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as exc:
+                raise ValueError(
+                    "STORAGE_FILE_FORMAT=parquet requires pyarrow (uv add pyarrow)"
+                ) from exc
+        self.directory = directory
+        self.file_format = file_format
+        self._loaded: set[Term] = set()
+        self._generations_loaded = False
+        self._pending: dict[Term, list[dict]] = {}
+
+    # --- paths -----------------------------------------------------------
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.directory, *parts)
+
+    def _term_path(self, kind: str, term: Term) -> str:
+        return self._path(kind, f"{term[0]}-{term[1]}.{self.file_format}")
+
+    def _pending_path(self, term: Term) -> str:
+        return self._path("courses", f"{term[0]}-{term[1]}.pending.jsonl")
+
+    # --- file formats ----------------------------------------------------
+
+    def _write_rows(self, path: str, rows: list[dict]) -> None:
+        """Atomically replace `path` with `rows`."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        if self.file_format == "jsonl":
+            with open(temp_path, "w", encoding="utf-8") as output:
+                for row in rows:
+                    output.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            df = pd.DataFrame(rows)
+            json_columns = [
+                column
+                for column in df.columns
+                if df[column].map(lambda value: isinstance(value, (list, dict))).any()
+            ]
+            for column in json_columns:
+                df[column] = df[column].map(
+                    lambda value: json.dumps(value, ensure_ascii=False, default=str)
+                )
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata(
+                {
+                    **(table.schema.metadata or {}),
+                    b"json_columns": json.dumps(json_columns).encode(),
+                }
+            )
+            pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+
+    def _read_rows(self, path: str) -> list[dict]:
+        if not os.path.exists(path):
+            return []
+        if self.file_format == "jsonl":
+            with open(path, encoding="utf-8") as source:
+                return [json.loads(line) for line in source if line.strip()]
+
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        json_columns = json.loads(metadata.get(b"json_columns", b"[]"))
+        rows = table.to_pylist()
+        for row in rows:
+            for column in json_columns:
+                if isinstance(row.get(column), str):
+                    row[column] = json.loads(row[column])
+        return rows
+
+    # --- term state ------------------------------------------------------
+
+    def _term_courses(self, term: Term) -> dict[str, dict]:
+        self._load_term(term)
+        return super()._term_courses(term)
+
+    def _term_history(self, term: Term) -> dict[str, list[dict]]:
+        self._load_term(term)
+        return super()._term_history(term)
+
+    def _load_term(self, term: Term) -> None:
+        if term in self._loaded:
+            return
+        self._loaded.add(term)
+        courses = self.courses.setdefault(term, {})
+        history = self.enrollment_history.setdefault(term, {})
+        for document in self._read_rows(self._term_path("courses", term)):
+            courses[document["course_code"]] = document
+        for row in self._read_rows(self._term_path("enrollment_history", term)):
+            code = row.pop("course_code")
+            row["date"] = _parse_date(row["date"])
+            history.setdefault(code, []).append(row)
+
+        pending_path = self._pending_path(term)
+        if os.path.exists(pending_path):
+            with open(pending_path, encoding="utf-8") as pending:
+                for line in pending:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a hard kill; everything before it is valid.
+                        continue
+                    self._replay(term, entry)
+        for points in history.values():
+            points.sort(key=lambda point: point["date"])
+
+    def _replay(self, term: Term, entry: dict) -> None:
+        courses = self.courses[term]
+        if "document" in entry:
+            courses[entry["document"]["course_code"]] = entry["document"]
+        elif "touch" in entry:
+            for code in entry["touch"]:
+                if code in courses:
+                    courses[code]["crawl_generation"] = entry["generation"]
+        elif "points" in entry:
+            history = self.enrollment_history[term].setdefault(entry["course_code"], [])
+            for point in entry["points"]:
+                point["date"] = _parse_date(point["date"])
+                history.append(point)
+
+    def _flush_pending(self) -> None:
+        """Append the entries staged by the last write to the pending logs."""
+        pending, self._pending = self._pending, {}
+        for term, entries in pending.items():
+            path = self._pending_path(term)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as output:
+                for entry in entries:
+                    output.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    # --- writes ----------------------------------------------------------
+
+    def _put_course(self, term: Term, document: dict) -> None:
+        super()._put_course(term, document)
+        self._pending.setdefault(term, []).append({"document": document})
+
+    def _set_generation(self, term: Term, document: dict, generation: int) -> None:
+        super()._set_generation(term, document, generation)
+        self._pending.setdefault(term, []).append(
+            {"touch": [document["course_code"]], "generation": generation}
+        )
+
+    def _add_enrollment_points(self, term: Term, record: CourseRecord) -> list[dict]:
+        points = super()._add_enrollment_points(term, record)
+        if points:
+            self._pending.setdefault(term, []).append(
+                {"course_code": record.course_code, "points": points}
+            )
+        return points
+
+    async def save_course_batch(
+        self,
+        records: list[CourseRecord],
+        existing_hashes: dict[str, str] | None = None,
+        generation: int | None = None,
+    ) -> CourseWriteCounts | None:
+        counts = await super().save_course_batch(records, existing_hashes, generation)
+        try:
+            self._flush_pending()
+        except OSError as e:
+            logger.error(f"[storage] Error saving course batch: {e}")
+            return None
+        return counts
+
+    async def touch_course_generation(
+        self,
+        academic_year: str,
+        academic_semester: str,
+        course_codes: Iterable[str],
+        generation: int,
+    ) -> int:
+        touched = await super().touch_course_generation(
+            academic_year, academic_semester, course_codes, generation
+        )
+        self._flush_pending()
+        return touched
+
+    async def commit_term_generation(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> None:
+        self._load_generations()
+        await super().commit_term_generation(academic_year, academic_semester, generation)
+        self._write_generations()
+
+    async def get_course_csv_hash(
+        self, academic_year: str, academic_semester: str
+    ) -> str | None:
+        self._load_generations()
+        return await super().get_course_csv_hash(academic_year, academic_semester)
+
+    async def save_course_csv_hash(
+        self, academic_year: str, academic_semester: str, content_hash: str
+    ) -> None:
+        self._load_generations()
+        await super().save_course_csv_hash(academic_year, academic_semester, content_hash)
+        self._write_term_map("course_csv_hashes.json", self.course_csv_hashes)
+
+    async def delete_stale_courses(
+        self, academic_year: str, academic_semester: str, generation: int
+    ) -> int:
+        deleted = await super().delete_stale_courses(
+            academic_year, academic_semester, generation
+        )
+        self._write_term(_term(academic_year, academic_semester))
+        return deleted
+
+    def _write_term(self, term: Term) -> None:
+        courses = self.courses.get(term, {})
+        self._write_rows(
+            self._term_path("courses", term),
+            [courses[code] for code in sorted(courses)],
+        )
+        history = self.enrollment_history.get(term, {})
+        self._write_rows(
+            self._term_path("enrollment_history", term),
+            [
+                {"course_code": code, **point}
+                for code in sorted(history)
+                if code in courses
+                for point in history[code]
+            ],
+        )
+        pending_path = self._pending_path(term)
+        if os.path.exists(pending_path):
+            os.remove(pending_path)
+        logger.info(
+            f"[storage] Wrote {len(courses)} courses of {term[0]}-{term[1]} "
+            f"to {self._term_path('courses', term)}"
+        )
+
+    def _load_generations(self) -> None:
+        """Load the per-term generation pointers and CSV hashes once."""
+        if self._generations_loaded:
+            return
+        self._generations_loaded = True
+        self.generations.update(self._read_term_map("term_generations.json"))
+        self.course_csv_hashes.update(self._read_term_map("course_csv_hashes.json"))
+
+    def _write_generations(self) -> None:
+        self._write_term_map("term_generations.json", self.generations)
+
+    def _read_term_map(self, name: str) -> dict[Term, Any]:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as source:
+            return {
+                _term(*term_label.split("-", maxsplit=1)): value
+                for term_label, value in json.load(source).items()
+            }
+
+    def _write_term_map(self, name: str, values: dict[Term, Any]) -> None:
+        path = self._path(name)
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as output:
+            json.dump(
+                {f"{year}-{semester}": value for (year, semester), value in values.items()},
+                output,
+                indent=2,
+            )
+        os.replace(temp_path, path)
+
+    def _save_table(self, name: str, df: pd.DataFrame) -> None:
+        super()._save_table(name, df)
+        if not df.empty:
+            self._write_rows(
+                self._path(f"{name}.{self.file_format}"), df.to_dict(orient="records")
+            )
+
+    async def get_course_schedule(self) -> list[dict]:
+        if "course_schedule" in self.tables:
+            return await super().get_course_schedule()
+        # Saved by an earlier process.
+        return self._read_rows(self._path(f"course_schedule.{self.file_format}"))
+
+
+def _parse_date(value: Any) -> datetime:
+    """Dates come back as datetimes from Parquet and ISO strings from JSONL."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+_storage: Optional[Storage] = None
+
+
+def build_storage(backend: str) -> Storage:
+    if backend == "mongo":
+        return MongoStorage()
+    if backend == "file":
+        return FileStorage(config.storage_dir, config.storage_file_format)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_storage() -> Storage:
+    """Return the process-wide storage selected by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        _storage = build_storage(config.storage_backend)
+        logger.info(f"[storage] Using {_storage.name} storage")
+    return _storage
+
+
+async def close_storage() -> None:
+    """Close the process-wide storage; the next get_storage() builds a new one."""
+    global _storage
+    if _storage is None:
+        return
+    storage, _storage = _storage, None
+    await storage.close()